@@ -1,13 +1,27 @@
 # newapp.py
+import io
+import os
+import tempfile
 import streamlit as st
 import pandas as pd
-import bcrypt
-from kb_manager import load_knowledge_base, search_knowledge_base
+import altair as alt
+from kb_manager import (
+    get_active_kb, watch_knowledge_base, search_knowledge_base, search_knowledge_base_ranked, KB_ROLE
+)
 from database_manager import (
-    get_complaints, save_complaint, get_user,
-    update_complaint_status, register_user, get_user_complaints
+    update_complaint_status,
+    get_user_complaints, get_complaints_page, count_complaints, get_status_counts,
+    append_chat_messages, get_chat_page, get_last_chat_message_id, COMPLAINT_CACHE,
+    COMPLAINT_STATUSES, ISSUE_TYPES, update_complaint_statuses, update_matching_complaints, parse_id_list,
+    export_complaints_csv, export_complaints_parquet, import_complaints, read_complaint_records,
+    get_complaint_rollup, get_chat_outcomes, get_top_unanswered_queries, CHAT_SOURCES, UNANSWERED_REPLIES
 )
-from llm_handler import generate_llm_response
+from chat_handler import stream_answer, ANSWER_CACHE
+from llm_handler import llm_backend_status
+from queue_manager import submit_complaint, count_dead_letters, replay_dead_letters, SPOOL_DIR, DEAD_LETTER_FILE
+from chat_client import ChatClient, ChatServiceError, CHAT_SERVICE_URL
+from auth_manager import authenticate, register_account
+from metrics_manager import METRICS, read_metrics_log, start_metrics_exporter
 
 # Load custom CSS
 try:
@@ -16,12 +30,31 @@ try:
 except FileNotFoundError:
     st.warning("Custom CSS file not found. Continuing without styling.")
 
-# Load KB once
-@st.cache_data
-def load_data():
-    return load_knowledge_base()
+# Load the KB once per process and keep it in sync with the files in kb/.
+# cache_resource shares the index instead of pickling and copying it like cache_data
+# would; reloads swap the active index, so each rerun reads the current one.
+# Workers (KB_ROLE=worker) attach to the builder's published index and follow it instead.
+@st.cache_resource
+def start_kb_watcher():
+    get_active_kb()
+    return None if KB_ROLE == "worker" else watch_knowledge_base()
+
+start_kb_watcher()
+KB_DATA = get_active_kb()
+
+# Periodic snapshots to metrics.jsonl, and /metrics for Prometheus if METRICS_PORT is set
+@st.cache_resource
+def start_metrics():
+    start_metrics_exporter()
+
+start_metrics()
+
+# With CHAT_SERVICE_URL set, questions and complaints go to the chat service instead
+@st.cache_resource
+def get_chat_client():
+    return ChatClient() if CHAT_SERVICE_URL else None
 
-KB_DATA = load_data()
+CHAT_CLIENT = get_chat_client()
 
 # Session defaults
 if "logged_in" not in st.session_state:
@@ -30,11 +63,12 @@ if "logged_in" not in st.session_state:
     st.session_state.username = None
     st.session_state.page = "home"
 
-if "messages" not in st.session_state:
-    st.session_state.messages = {}
+# Chat messages live in the database; a session only remembers where its active chat starts
+if "chat_start_ids" not in st.session_state:
+    st.session_state.chat_start_ids = {}
 
-def check_password(password, hashed_password):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+ADMIN_PAGE_SIZE = 20
+CHAT_PAGE_SIZE = 20
 
 # ---------------- Homepage ----------------
 def homepage():
@@ -73,15 +107,15 @@ def user_login_page():
             student_password = st.text_input("Password", type="password", key="s_pass")
             submit_student = st.form_submit_button("Log In as Student")
             if submit_student:
-                user = get_user(student_username)
-                if user and check_password(student_password, user["password_hash"]) and user["role"] == "student":
+                user, login_error = authenticate(student_username, student_password, "student")
+                if user:
                     st.session_state.logged_in = True
                     st.session_state.role = "student"
                     st.session_state.username = student_username
                     st.session_state.page = "student"
                     st.rerun()
                 else:
-                    st.error("Invalid username or password.")
+                    st.error(login_error)
 
     with col2:
         st.header("✨ New Student Sign Up")
@@ -91,12 +125,15 @@ def user_login_page():
             new_password = st.text_input("Choose Password", type="password")
             signup_submit = st.form_submit_button("Create Student Account")
             if signup_submit:
-                if not new_email.endswith('@pvpsit.ac.in'):
-                    st.error("Invalid email domain. Use @pvpsit.ac.in")
-                elif register_user(new_username, new_email, new_password, "student"):
-                    st.success("Account created! Please log in.")
-                else:
-                    st.error("Username or email already exists.")
+                try:
+                    if not new_email.endswith('@pvpsit.ac.in'):
+                        st.error("Invalid email domain. Use @pvpsit.ac.in")
+                    elif register_account(new_username, new_email, new_password, "student"):
+                        st.success("Account created! Please log in.")
+                    else:
+                        st.error("Username or email already exists.")
+                except TimeoutError as e:
+                    st.error(str(e))
 
 # ---------------- Admin Login ----------------
 def admin_login_page():
@@ -110,15 +147,15 @@ def admin_login_page():
             admin_password = st.text_input("Password", type="password", key="a_pass")
             submit_admin = st.form_submit_button("Log In as Admin")
             if submit_admin:
-                user = get_user(admin_username)
-                if user and check_password(admin_password, user["password_hash"]) and user["role"] == "admin":
+                user, login_error = authenticate(admin_username, admin_password, "admin")
+                if user:
                     st.session_state.logged_in = True
                     st.session_state.role = "admin"
                     st.session_state.username = admin_username
                     st.session_state.page = "admin"
                     st.rerun()
                 else:
-                    st.error("Invalid username or password.")
+                    st.error(login_error)
     with col2:
         st.header("🔧 Admin Sign Up")
         with st.form("admin_signup"):
@@ -127,12 +164,15 @@ def admin_login_page():
             admin_new_password = st.text_input("Admin Password", type="password")
             admin_signup_submit = st.form_submit_button("Create Admin Account")
             if admin_signup_submit:
-                if not admin_new_email.endswith('@pvpsiddhartha.ac.in'):
-                    st.error("Invalid email domain. Use @pvpsiddhartha.ac.in")
-                elif register_user(admin_new_username, admin_new_email, admin_new_password, "admin"):
-                    st.success("Admin account created! Please log in.")
-                else:
-                    st.error("Username or email exists.")
+                try:
+                    if not admin_new_email.endswith('@pvpsiddhartha.ac.in'):
+                        st.error("Invalid email domain. Use @pvpsiddhartha.ac.in")
+                    elif register_account(admin_new_username, admin_new_email, admin_new_password, "admin"):
+                        st.success("Admin account created! Please log in.")
+                    else:
+                        st.error("Username or email exists.")
+                except TimeoutError as e:
+                    st.error(str(e))
 def student_page():
     # Header and logout/new chat buttons
     col1, col2 = st.columns([3,1])
@@ -142,8 +182,7 @@ def student_page():
     with col2:
         if st.button("🔄 New Chat", key="new_chat"):
             # Only clear the active chat, keep history
-            if st.session_state.username in st.session_state.messages:
-                st.session_state.messages[st.session_state.username] = []
+            st.session_state.chat_start_ids[st.session_state.username] = get_last_chat_message_id(st.session_state.username)
             st.rerun()
         if st.button("🚪 Logout", key="logout"):
             st.session_state.clear()
@@ -164,9 +203,10 @@ def student_page():
                     update_complaint_status(complaint[0], "read", complaint[5])
                     st.experimental_rerun()
 
-    # Ensure messages container exists
-    if st.session_state.username not in st.session_state.messages:
-        st.session_state.messages[st.session_state.username] = []
+    # A new session starts a fresh chat; earlier ones stay in the history tab
+    username = st.session_state.username
+    if username not in st.session_state.chat_start_ids:
+        st.session_state.chat_start_ids[username] = get_last_chat_message_id(username)
 
     # Tabs for Chatbot, Complaints, and History
     tab_chatbot, tab_complaint, tab_history = st.tabs(["🤖 Chatbot", "📝 Complaint Box", "📜 Chat History"])
@@ -175,92 +215,336 @@ def student_page():
     with tab_chatbot:
         st.header("💬 Chat with HelpBot")
 
-        # Static search box at top
-        query = st.text_input("Ask me anything about the college...", key="chat_input")
+        # Static search box at top; the form hands over each question exactly once
+        with st.form("chat_form", clear_on_submit=True):
+            query = st.text_input("Ask me anything about the college...", key="chat_input")
+            asked = st.form_submit_button("Ask")
 
         # Handle user query submission
-        if query:
-            # Append user query to active chat
-            st.session_state.messages[st.session_state.username].append({"role":"user","content":query})
-
-            with st.spinner("🤔 Thinking..."):
-                try:
-                    answer = search_knowledge_base(query, KB_DATA)
-                    if answer and "I'm still learning" not in answer:
-                        response = answer
-                    else:
-                        response = generate_llm_response(query, KB_DATA)
-                except Exception as e:
-                    print(f"LLM Error: {e}")
-                    answer = search_knowledge_base(query, KB_DATA)
-                    response = answer if answer else "Sorry, I could not find an answer."
-
-            # Append assistant response
-            st.session_state.messages[st.session_state.username].append({"role":"assistant","content":response})
-
-        # Display chat: left=assistant, right=user
-        for msg in st.session_state.messages[st.session_state.username]:
+        if asked and query.strip():
+            # Stream the answer as it is generated, then let the history below render it
+            live_answer = st.empty()
+            outcome = {}
+            try:
+                with live_answer.container():
+                    chunks = CHAT_CLIENT.stream(query, outcome) if CHAT_CLIENT else stream_answer(query, KB_DATA, outcome)
+                    response = st.write_stream(chunks)
+            except Exception as e:
+                print(f"LLM Error: {e}")
+                answer = search_knowledge_base(query, KB_DATA)
+                response = answer if answer else "Sorry, I could not find an answer."
+                outcome["source"] = "kb"
+            live_answer.empty()
+
+            # Save the question and its answer together; the source feeds the analytics rollups
+            source = "unanswered" if response in UNANSWERED_REPLIES else outcome.get("source")
+            append_chat_messages(username, [{"role":"user","content":query},
+                                            {"role":"assistant","content":response,"source":source}])
+
+        # Display the latest page of the active chat: left=assistant, right=user
+        active_chat = get_chat_page(username, after_id=st.session_state.chat_start_ids[username], limit=CHAT_PAGE_SIZE)
+        if len(active_chat) == CHAT_PAGE_SIZE:
+            st.caption("Earlier messages are in the Chat History tab.")
+        for _, role, content, _ in reversed(active_chat):
             left, right = st.columns([3,3])
-            if msg["role"] == "assistant":
+            if role == "assistant":
                 with left:
-                    st.markdown(f"**Assistant:** {msg['content']}")
+                    st.markdown(f"**Assistant:** {content}")
             else:
                 with right:
-                    st.markdown(f"**You:** {msg['content']}")
+                    st.markdown(f"**You:** {content}")
 
     # --- Complaint Box ---
     with tab_complaint:
         st.header("📋 Submit Complaint")
         with st.form("complaint_form", clear_on_submit=True):
             student_name = st.text_input("Your Name (Optional)", value=st.session_state.username)
-            issue_type = st.selectbox("Type of Issue", ["Ragging", "Harassment", "Infrastructure", "Academics", "Other"])
+            issue_type = st.selectbox("Type of Issue", ISSUE_TYPES)
             description = st.text_area("Describe the issue", placeholder="Details...")
             submitted = st.form_submit_button("Submit Complaint")
             if submitted:
                 if description.strip():
-                    save_complaint(student_name, issue_type, description)
-                    st.success("✅ Complaint submitted securely.")
+                    # Spooled and acknowledged now; the background writer stores it moments later
+                    submit = CHAT_CLIENT.submit_complaint if CHAT_CLIENT else submit_complaint
+                    try:
+                        ticket_id = submit(student_name, issue_type, description)
+                        st.success(f"✅ Complaint submitted securely. Ticket ID: {ticket_id}")
+                    except ChatServiceError as e:
+                        st.error(f"Could not submit the complaint, please try again. ({e})")
                 else:
                     st.error("Please provide a description.")
 
     # --- Chat History ---
     with tab_history:
         st.header("📜 Your Chat History")
-        full_history = get_user_complaints(st.session_state.username)
-        # Display chat messages (active + past)
-        if st.session_state.messages[st.session_state.username]:
-            for i, message in enumerate(st.session_state.messages[st.session_state.username]):
-                with st.expander(f"Message {i+1}: {message['content'][:50]}...", expanded=False):
-                    st.write(f"**Role:** {message['role']}")
-                    st.write(f"**Content:** {message['content']}")
+        # Keyset pagination over every chat of this user, newest page first
+        cursors = st.session_state.setdefault("chat_history_cursors", [None])
+        history = get_chat_page(username, before_id=cursors[-1], limit=CHAT_PAGE_SIZE)
+        if history:
+            for message_id, role, content, created_at in history:
+                with st.expander(f"{created_at} · {content[:50]}...", expanded=False):
+                    st.write(f"**Role:** {role}")
+                    st.write(f"**Content:** {content}")
+
+            prev_col, next_col = st.columns(2)
+            with prev_col:
+                if len(cursors) > 1 and st.button("← Newer", key="chat_history_prev"):
+                    cursors.pop()
+                    st.rerun()
+            with next_col:
+                if len(history) == CHAT_PAGE_SIZE and st.button("Older →", key="chat_history_next"):
+                    cursors.append(history[-1][0])
+                    st.rerun()
         else:
             st.info("No chat history yet.")
 
 
 # ---------------- Admin Page ----------------
+def discard_export():
+    """Delete the session's prepared export file, if any."""
+    export = st.session_state.pop("bulk_export_file", None)
+    if export:
+        try:
+            os.remove(export[0])
+        except FileNotFoundError:
+            pass
+
 def admin_page():
     st.title("📊 Admin Dashboard")
     st.subheader("Complaint Management System")
     col1, col2 = st.columns([3,1])
     with col2:
         if st.button("🚪 Logout", key="admin_logout"):
+            discard_export()
             st.session_state.clear()
             st.session_state.page = "home"
             st.rerun()
 
     st.markdown("---")
-    complaints = get_complaints()
-    active_complaints = [c for c in complaints if c[5] != "read"]
+    # O(1) metrics from the trigger-maintained summary table
+    status_counts = get_status_counts()
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Active Complaints", sum(status_counts.values()) - status_counts.get("read", 0))
+    m2.metric("Pending", status_counts.get("pending", 0))
+    m3.metric("In Progress", status_counts.get("in progress", 0))
+    m4.metric("Resolved", status_counts.get("resolved", 0))
+    dead_letters = count_dead_letters()
+    if dead_letters:
+        d1, d2 = st.columns([3,1])
+        d1.error(f"{dead_letters} submitted complaints could not be stored and were moved to "
+                 f"{os.path.join(SPOOL_DIR, DEAD_LETTER_FILE)}.")
+        # e.g. after fixing the rows in that file or the schema
+        if d2.button("Retry storing them", key="replay_dead_letters"):
+            stored, failed = replay_dead_letters()
+            if failed:
+                st.warning(f"Stored {stored}; {failed} failed again and stay in the dead-letter file.")
+            else:
+                st.success(f"Stored {stored} complaints.")
+
+    with st.expander("🔎 Knowledge Base Lookup"):
+        kb_query = st.text_input("Test a student question", key="admin_kb_query")
+        if kb_query:
+            results = search_knowledge_base_ranked(kb_query, KB_DATA, k=5, threshold=0.0)
+            if results:
+                st.dataframe(pd.DataFrame(results)[["score", "path", "answer"]], use_container_width=True)
+            else:
+                st.info("No KB record shares a term with this question.")
+
+    with st.expander("⚡ Caches"):
+        cache_stats = ANSWER_CACHE.stats()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Answer Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+        c2.metric("Cached Answers", f"{cache_stats['size']} / {cache_stats['maxsize']}")
+        c3.metric("Hits / Misses", f"{cache_stats['hits']} / {cache_stats['misses']}")
+        complaint_stats = COMPLAINT_CACHE.stats()
+        c1, c2, c3 = st.columns(3)
+        c1.metric("Complaint Read Hit Rate", f"{complaint_stats['hit_rate']:.0%}")
+        c2.metric("Cached Reads", f"{complaint_stats['size']} / {complaint_stats['maxsize']}")
+        c3.metric("Invalidated by Writes", complaint_stats["invalidations"])
+        if st.button("Clear answer cache", key="clear_answer_cache"):
+            ANSWER_CACHE.clear()
+            st.rerun()
 
-    if active_complaints:
-        st.metric("Active Complaints", len(active_complaints))
-        for complaint in active_complaints:
+    with st.expander("🩺 LLM Backends"):
+        # "open" means the backend is being skipped and questions go straight to the KB fallback
+        st.dataframe(llm_backend_status(), use_container_width=True, hide_index=True)
+
+    with st.expander("📈 Metrics"):
+        fast_hits = METRICS.counter("kb_lookups_total", result="fast_path")
+        kb_hits = METRICS.counter("kb_lookups_total", result="hit") + fast_hits
+        kb_lookups = METRICS.counter_total("kb_lookups_total")
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Questions Answered", METRICS.counter_total("chat_queries_total"))
+        c2.metric("KB Hit Rate", f"{kb_hits / kb_lookups:.0%}" if kb_lookups else "–",
+                  help=f"{fast_hits / kb_lookups:.0%} by exact lookup" if kb_lookups else None)
+        c3.metric("LLM Errors", METRICS.counter_total("llm_errors_total"))
+        c4.metric("KB Fallbacks", METRICS.counter_total("fallback_total"))
+        snapshot = METRICS.snapshot()
+        if snapshot["histograms"]:
+            latency = pd.DataFrame([
+                {"metric": h["name"], "labels": ", ".join(f"{k}={v}" for k, v in h["labels"].items()),
+                 "count": h["count"], "p50 ms": h["p50_ms"], "p95 ms": h["p95_ms"], "p99 ms": h["p99_ms"]}
+                for h in snapshot["histograms"]
+            ])
+            st.dataframe(latency.round(1), use_container_width=True, hide_index=True)
+        # p95 per stage from the snapshot log, to spot regressions after a KB or model change
+        trend = [
+            {"time": pd.to_datetime(s["ts"], unit="s"), h["labels"]["stage"]: h["p95_ms"]}
+            for s in read_metrics_log(limit=500) for h in s["histograms"] if h["name"] == "chat_stage_seconds"
+        ]
+        if trend:
+            st.caption("p95 stage latency (ms) over time")
+            st.line_chart(pd.DataFrame(trend).groupby("time").max())
+        st.download_button("Download Prometheus metrics", METRICS.render_prometheus(),
+                           file_name="metrics.prom", mime="text/plain", key="metrics_download")
+
+    # Read from the trigger-maintained rollup tables: one row per day and category, never a scan
+    with st.expander("📊 Analytics"):
+        days = st.selectbox("Period", [30, 90, 365], format_func=lambda d: f"Last {d} days", key="analytics_days")
+        since = (pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=days)).date()
+
+        complaints = pd.DataFrame(get_complaint_rollup(since=since), columns=["day", "issue_type", "status", "count"])
+        if complaints.empty:
+            st.info("No complaints filed in this period.")
+        else:
+            complaints["day"] = pd.to_datetime(complaints["day"])
+            st.caption("Complaints filed per day")
+            st.altair_chart(alt.Chart(complaints).mark_bar().encode(
+                x=alt.X("day:T", title=None),
+                y=alt.Y("sum(count):Q", title="Complaints"),
+                color=alt.Color("issue_type:N", title="Issue Type"),
+                tooltip=["day:T", "issue_type:N", "sum(count):Q"],
+            ), use_container_width=True)
+            st.caption("Current status by issue type")
+            st.altair_chart(alt.Chart(complaints).mark_bar().encode(
+                x=alt.X("sum(count):Q", title="Complaints"),
+                y=alt.Y("issue_type:N", title=None),
+                color=alt.Color("status:N", title="Status", scale=alt.Scale(domain=list(COMPLAINT_STATUSES))),
+                tooltip=["issue_type:N", "status:N", "sum(count):Q"],
+            ), use_container_width=True)
+
+        outcomes = pd.DataFrame(get_chat_outcomes(since=since), columns=["day", "source", "count"])
+        daily = outcomes.pivot_table(index="day", columns="source", values="count", aggfunc="sum", fill_value=0)
+        daily = daily.reindex(columns=list(CHAT_SOURCES), fill_value=0)
+        answered = daily.sum(axis=1)
+        daily = daily[answered > 0]
+        if daily.empty:
+            st.info("No chat questions answered in this period.")
+        else:
+            c1, c2, c3 = st.columns(3)
+            total = daily.to_numpy().sum()
+            c1.metric("Questions", int(total))
+            c2.metric("KB Hit Rate", f"{daily['kb'].sum() / total:.0%}")
+            c3.metric("Unanswered", f"{daily['unanswered'].sum() / total:.0%}")
+            trend = (daily.div(daily.sum(axis=1), axis=0).reset_index()
+                     .melt(id_vars="day", var_name="source", value_name="share"))
+            trend["day"] = pd.to_datetime(trend["day"])
+            st.caption("Where answers came from, per day")
+            st.altair_chart(alt.Chart(trend).mark_line(point=True).encode(
+                x=alt.X("day:T", title=None),
+                y=alt.Y("share:Q", title="Share of questions", axis=alt.Axis(format="%")),
+                color=alt.Color("source:N", title="Source", scale=alt.Scale(domain=list(CHAT_SOURCES))),
+                tooltip=["day:T", "source:N", alt.Tooltip("share:Q", format=".0%")],
+            ), use_container_width=True)
+
+        unanswered = get_top_unanswered_queries(limit=10)
+        if unanswered:
+            st.caption("Most asked questions without an answer (all time): candidates for new KB entries")
+            st.dataframe(pd.DataFrame(unanswered, columns=["question", "times asked", "last asked"]),
+                         use_container_width=True, hide_index=True)
+
+    # Filters
+    f1, f2, f3 = st.columns(3)
+    with f1:
+        status_filter = st.selectbox("Status", ["active", "pending", "in progress", "resolved", "read", "all"], key="admin_status_filter")
+    with f2:
+        type_filter = st.selectbox("Issue Type", ["All", *ISSUE_TYPES], key="admin_type_filter")
+    with f3:
+        date_range = st.date_input("Filed between", value=(), key="admin_date_filter")
+    filters = {
+        "status": status_filter if status_filter not in ("active", "all") else None,
+        "exclude_status": "read" if status_filter == "active" else None,
+        "issue_type": type_filter if type_filter != "All" else None,
+        "since": date_range[0] if len(date_range) > 0 else None,
+        "until": date_range[1] if len(date_range) > 1 else None,
+    }
+
+    # Keyset pagination: a stack of before_id cursors, reset whenever filters change
+    if st.session_state.get("admin_filters") != filters:
+        st.session_state.admin_filters = filters
+        st.session_state.admin_cursors = [None]
+    cursors = st.session_state.admin_cursors
+    total = count_complaints(**filters)
+
+    with st.expander("📦 Bulk Actions"):
+        b1, b2 = st.columns(2)
+        with b1:
+            with st.form("bulk_update_form", clear_on_submit=True):
+                st.write(f"Update the {total} complaints matching the filters, or only the IDs listed.")
+                bulk_ids = st.text_input("Complaint IDs (optional)", placeholder="e.g. 12, 15-20")
+                bulk_status = st.selectbox("New Status", COMPLAINT_STATUSES)
+                bulk_response = st.text_area("Response", placeholder="Applied to every complaint updated")
+                confirm_all = st.checkbox(f"Without IDs, update all {total} matching complaints")
+                if st.form_submit_button("Apply"):
+                    try:
+                        if bulk_ids.strip():
+                            updated = update_complaint_statuses(
+                                (i, bulk_status, bulk_response) for i in parse_id_list(bulk_ids))
+                            st.success(f"Updated {updated} complaints.")
+                        elif not confirm_all:
+                            st.warning(f"Enter complaint IDs, or tick the box to update all {total} matching complaints.")
+                        else:
+                            updated = update_matching_complaints(bulk_status, bulk_response, **filters)
+                            st.success(f"Updated {updated} complaints.")
+                    except ValueError as e:
+                        st.error(f"Invalid input: {e}")
+        with b2:
+            export_format = st.radio("Export format", ["CSV", "Parquet"], horizontal=True, key="bulk_export_format")
+            if st.button("Prepare export", key="bulk_export"):
+                discard_export()
+                # Written to a temp file in batches; the session keeps only its path
+                if export_format == "CSV":
+                    suffix, mime, export = ".csv", "text/csv", export_complaints_csv
+                else:
+                    suffix, mime, export = ".parquet", "application/octet-stream", export_complaints_parquet
+                fd, path = tempfile.mkstemp(prefix="complaints-", suffix=suffix)
+                os.close(fd)
+                try:
+                    export(path, **filters)
+                except Exception:
+                    os.remove(path)
+                    raise
+                st.session_state.bulk_export_file = (path, f"complaints{suffix}", mime)
+            if "bulk_export_file" in st.session_state:
+                path, file_name, mime = st.session_state.bulk_export_file
+                try:
+                    with open(path, "rb") as f:
+                        st.download_button(f"Download {file_name}", f, file_name=file_name, mime=mime)
+                except FileNotFoundError:
+                    del st.session_state.bulk_export_file
+
+            upload = st.file_uploader("Import legacy complaints", type=["csv", "parquet"], key="bulk_import_file")
+            if upload is not None and st.button("Import", key="bulk_import"):
+                try:
+                    if upload.name.lower().endswith(".parquet"):
+                        records = read_complaint_records(upload, "parquet")
+                    else:
+                        records = read_complaint_records(io.TextIOWrapper(upload, encoding="utf-8", newline=""), "csv")
+                    st.success(f"Imported {import_complaints(records)} complaints.")
+                except (ValueError, KeyError) as e:
+                    st.error(f"Import failed, nothing was saved: {e}")
+
+    complaints = get_complaints_page(before_id=cursors[-1], limit=ADMIN_PAGE_SIZE, **filters)
+
+    if complaints:
+        st.caption(f"Page {len(cursors)} of {max(1, -(-total // ADMIN_PAGE_SIZE))} · {total} matching complaints")
+        for complaint in complaints:
             col1, col2 = st.columns([3,1])
             with col1:
                 st.subheader(f"Complaint ID: {complaint[0]}")
                 st.write(f"**Student:** {complaint[1] if complaint[1] else 'Anonymous'}")
                 st.write(f"**Type:** {complaint[2]}")
-                st.write(f"**Status:** {complaint[5]}")
+                st.write(f"**Status:** {complaint[4]}")
                 st.text_area("Description", value=complaint[3], height=100, key=f"desc_{complaint[0]}", disabled=True)
             with col2:
                 with st.form(key=f"form_{complaint[0]}"):
@@ -274,6 +558,16 @@ def admin_page():
                             st.success("Complaint updated.")
                             st.rerun()
             st.markdown("---")
+
+        prev_col, next_col = st.columns(2)
+        with prev_col:
+            if len(cursors) > 1 and st.button("← Newer", key="admin_prev_page"):
+                cursors.pop()
+                st.rerun()
+        with next_col:
+            if len(complaints) == ADMIN_PAGE_SIZE and st.button("Older →", key="admin_next_page"):
+                cursors.append(complaints[-1][0])
+                st.rerun()
     else:
         st.success("🎉 All complaints addressed.")
         st.info("No active complaints found.")
@@ -0,0 +1,148 @@
+# auth_manager.py
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+import bcrypt
+from database_manager import get_user, register_user, BCRYPT_ROUNDS
+
+# --- SETTINGS ---
+# bcrypt releases the GIL, so a few pool threads hash in parallel while Streamlit script
+# threads only wait; the pool size caps how many cores logins can take at once.
+AUTH_WORKERS = int(os.getenv("AUTH_WORKERS", str(min(4, os.cpu_count() or 1))))
+AUTH_TIMEOUT_SECONDS = float(os.getenv("AUTH_TIMEOUT_SECONDS", "10"))
+# Auth jobs admitted at once, running or queued; beyond this callers are told the server is busy
+AUTH_MAX_PENDING = int(os.getenv("AUTH_MAX_PENDING", str(AUTH_WORKERS * 4)))
+LOGIN_MAX_FAILURES = int(os.getenv("LOGIN_MAX_FAILURES", "5"))
+LOGIN_WINDOW_SECONDS = float(os.getenv("LOGIN_WINDOW_SECONDS", "300"))
+
+BUSY_MESSAGE = "The server is busy, please try again in a moment."
+INVALID_MESSAGE = "Invalid username or password."
+REGISTRATION_PENDING_MESSAGE = "Your account is still being created. Try logging in in a moment."
+
+_executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="auth")
+_admission = threading.BoundedSemaphore(AUTH_MAX_PENDING)
+
+
+@lru_cache(maxsize=1)
+def _dummy_hash():
+    """Checked against when the username does not exist, so unknown and known usernames take as long to reject."""
+    return bcrypt.hashpw(b"not-a-password", bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("utf-8")
+
+
+class RateLimiter:
+    """
+    Per-key sliding window: after max_failures failures within window seconds the key
+    is refused until the oldest of them ages out. A success clears the key.
+    """
+
+    def __init__(self, max_failures=LOGIN_MAX_FAILURES, window=LOGIN_WINDOW_SECONDS, clock=time.monotonic):
+        self.max_failures = max_failures
+        self.window = window
+        self._clock = clock
+        self._failures = {}
+        self._lock = threading.Lock()
+        self.blocked = 0
+
+    def _recent(self, key, now):
+        failures = self._failures.get(key)
+        if failures is None:
+            return None
+        while failures and failures[0] <= now - self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+            return None
+        return failures
+
+    def retry_after(self, key):
+        """Seconds until key may try again; 0 if it may try now."""
+        with self._lock:
+            now = self._clock()
+            failures = self._recent(key, now)
+            if failures is None or len(failures) < self.max_failures:
+                return 0.0
+            self.blocked += 1
+            return failures[-self.max_failures] + self.window - now
+
+    def record_failure(self, key):
+        with self._lock:
+            now = self._clock()
+            failures = self._recent(key, now)
+            if failures is None:
+                failures = self._failures[key] = deque()
+            failures.append(now)
+
+    def reset(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def __len__(self):
+        return len(self._failures)
+
+
+LOGIN_LIMITER = RateLimiter()
+
+
+def _run(fn, *args, running_message=BUSY_MESSAGE):
+    """
+    Run fn on the auth pool and wait for it. Raises TimeoutError(BUSY_MESSAGE) at once when
+    AUTH_MAX_PENDING jobs are already admitted, or when fn has not started within
+    AUTH_TIMEOUT_SECONDS (it is then cancelled). If fn is running by then it cannot be
+    stopped and may still finish, so the TimeoutError carries running_message instead.
+    """
+    if not _admission.acquire(blocking=False):
+        raise TimeoutError(BUSY_MESSAGE)
+    try:
+        future = _executor.submit(fn, *args)
+    except BaseException:
+        _admission.release()
+        raise
+    future.add_done_callback(lambda _: _admission.release())
+    try:
+        return future.result(timeout=AUTH_TIMEOUT_SECONDS)
+    except FutureTimeoutError:
+        if future.cancel():
+            raise TimeoutError(BUSY_MESSAGE) from None
+        raise TimeoutError(running_message) from None
+
+
+def _check(password, password_hash):
+    return bcrypt.checkpw(password.encode("utf-8"), password_hash.encode("utf-8"))
+
+
+def check_password(password, hashed_password):
+    """bcrypt.checkpw on the auth pool."""
+    return _run(_check, password, hashed_password)
+
+
+def authenticate(username, password, role):
+    """
+    Verify a login for the given role. Returns (user, None) on success or (None, message)
+    with a message to show: invalid credentials, too many attempts, or a busy server.
+    """
+    key = (username or "").strip().lower()
+    wait = LOGIN_LIMITER.retry_after(key)
+    if wait > 0:
+        return None, f"Too many failed attempts. Try again in {int(wait) + 1} seconds."
+
+    user = get_user(username)
+    try:
+        valid = check_password(password, user["password_hash"] if user else _dummy_hash())
+    except TimeoutError as e:
+        return None, str(e)
+    if user and valid and user["role"] == role:
+        LOGIN_LIMITER.reset(key)
+        return user, None
+    LOGIN_LIMITER.record_failure(key)
+    return None, INVALID_MESSAGE
+
+
+def register_account(username, email, password, role="student"):
+    """
+    register_user() with its bcrypt hashing on the auth pool. True if the account was created.
+    A registration that times out while running may still succeed, and says so rather than failing.
+    """
+    return _run(register_user, username, email, password, role, running_message=REGISTRATION_PENDING_MESSAGE)
@@ -0,0 +1,94 @@
+# benchmarks/bench_analytics.py
+"""
+Analytics rollups vs scanning: time to read the dashboard's aggregates (complaints
+per day, issue type and status; chat answers per day and source; top unanswered
+questions) from the trigger-maintained rollup tables and by GROUP BY over the
+source tables, the cost the rollup triggers add to complaint inserts, and the
+time of the backfill job that rebuilds the rollups from existing data.
+
+    python benchmarks/bench_analytics.py --sizes 10000,100000,1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+
+from common import percentiles, timed
+
+import database_manager as dm
+from cache_manager import TTLCache
+
+SCAN_QUERIES = (
+    "SELECT date(created_at), issue_type, status, COUNT(*) FROM complaints "
+    "WHERE created_at >= ? GROUP BY 1, 2, 3",
+    "SELECT date(created_at), source, COUNT(*) FROM chat_messages "
+    "WHERE role = 'assistant' AND created_at >= ? GROUP BY 1, 2",
+)
+ROLLUP_TRIGGERS = ("trg_complaints_rollup_insert", "trg_complaints_rollup_update", "trg_complaints_rollup_delete")
+
+
+def complaint_rows(start, n, rng):
+    return [(f"T{start + i:010d}", f"student{rng.randrange(500)}", rng.choice(dm.ISSUE_TYPES),
+             f"Synthetic complaint {start + i}", f"2026-{rng.randint(1, 9):02d}-{rng.randint(10, 28)} 10:00:00")
+            for i in range(n)]
+
+
+def chat_rows(n, rng):
+    rows = []
+    for i in range(n):
+        question = f"question {rng.randrange(2000)}"
+        answer, source = rng.choice([("from the kb", "kb"), ("from the llm", "llm"), (dm.UNANSWERED_REPLIES[0], "unanswered")])
+        day = f"2026-{rng.randint(1, 9):02d}-{rng.randint(10, 28)} 10:00:00"
+        rows += [(f"student{i % 500}", "user", question, None, day), (f"student{i % 500}", "assistant", answer, source, day)]
+    return rows
+
+
+def insert_rate(rows):
+    _, elapsed = timed(lambda: [dm.save_complaints_batch(rows[i:i + dm.BULK_BATCH_SIZE])
+                                for i in range(0, len(rows), dm.BULK_BATCH_SIZE)])
+    return len(rows) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="complaints (and half as many chats)")
+    parser.add_argument("--reads", type=int, default=20, help="dashboard reads per measurement")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print(f"{'rows':>9}{'scan p50 ms':>13}{'rollup p50 ms':>15}{'insert/s':>10}{'no-trigger/s':>14}"
+          f"{'backfill s':>12}{'rollup rows':>13}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        with tempfile.TemporaryDirectory() as tmp:
+            dm.close_connections()
+            dm.DB_NAME = os.path.join(tmp, "analytics.db")
+            dm.init_db()
+            dm.COMPLAINT_CACHE = TTLCache(maxsize=0)   # measure the queries, not the read cache
+            conn = dm.get_connection()
+            with conn:
+                conn.executemany("INSERT INTO chat_messages (username, role, content, source, created_at) "
+                                 "VALUES (?, ?, ?, ?, ?)", chat_rows(size // 2, rng))
+            rate = insert_rate(complaint_rows(0, size, rng))
+
+            since = "2026-01-01"
+            scan = [timed(lambda: [conn.execute(sql, (since,)).fetchall() for sql in SCAN_QUERIES])[1]
+                    for _ in range(args.reads)]
+            rollup = [timed(lambda: (dm.get_complaint_rollup(since=since), dm.get_chat_outcomes(since=since),
+                                     dm.get_top_unanswered_queries()))[1] for _ in range(args.reads)]
+            _, backfill_s = timed(dm.rebuild_rollups)
+            rollup_rows = sum(conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                              for t in ("complaint_daily_counts", "chat_daily_outcomes", "chat_unanswered_queries"))
+
+            # The same inserts without the rollup triggers
+            with conn:
+                for name in ROLLUP_TRIGGERS:
+                    conn.execute(f"DROP TRIGGER {name}")
+            bare_rate = insert_rate(complaint_rows(size, min(size, 100000), rng))
+            dm.close_connections()
+
+        print(f"{size:>9}{percentiles(scan)['p50']:>13.1f}{percentiles(rollup)['p50']:>15.2f}{rate:>10.0f}"
+              f"{bare_rate:>14.0f}{backfill_s:>12.2f}{rollup_rows:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_auth.py
+"""
+Login storm: many sessions logging in at once. Compares the old inline path
+(uncached user lookup + bcrypt.checkpw on the script thread) with
+auth_manager.authenticate() at several pool sizes, and measures how late a
+"render" thread that does pure-Python work every 5 ms wakes up meanwhile.
+
+    python benchmarks/bench_auth.py --clients 32 --logins 4 --rounds 10 --workers 1,2,4,8
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import percentiles
+
+import bcrypt
+import database_manager as dm
+import auth_manager
+
+HEARTBEAT_SECONDS = 0.005
+
+
+def inline_login(username, password, role):
+    """The pre-pool login path: a database read and checkpw on the calling thread."""
+    row = dm.get_connection().execute(dm.SQL_GET_USER, (username,)).fetchone()
+    ok = row is not None and bcrypt.checkpw(password.encode("utf-8"), row[2].encode("utf-8")) and row[3] == role
+    return (row, None) if ok else (None, "invalid")
+
+
+def heartbeat(stop, lateness):
+    """Stand-in for a Streamlit script rerun: small bits of Python work on a fixed tick."""
+    while not stop.is_set():
+        due = time.perf_counter() + HEARTBEAT_SECONDS
+        sum(i * i for i in range(200))
+        time.sleep(max(0.0, due - time.perf_counter()))
+        lateness.append(max(0.0, time.perf_counter() - due))
+
+
+def storm(login, clients, logins, users):
+    latencies, lock = [], threading.Lock()
+    barrier = threading.Barrier(clients)
+
+    def client(idx):
+        local = []
+        barrier.wait()
+        for i in range(logins):
+            username = users[(idx + i) % len(users)]
+            start = time.perf_counter()
+            user, error = login(username, "pw-" + username, "student")
+            local.append(time.perf_counter() - start)
+            assert user is not None, error
+        with lock:
+            latencies.extend(local)
+
+    stop, lateness = threading.Event(), []
+    beat = threading.Thread(target=heartbeat, args=(stop, lateness))
+    beat.start()
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    elapsed = time.perf_counter() - start
+    stop.set()
+    beat.join()
+    return latencies, elapsed, lateness
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--logins", type=int, default=4, help="logins per client")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt cost factor for the test accounts")
+    parser.add_argument("--workers", default="1,2,4,8")
+    args = parser.parse_args()
+    total = args.clients * args.logins
+    print(f"{os.cpu_count()} CPU(s), bcrypt cost {args.rounds}, {args.clients} clients x {args.logins} logins")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dm.close_connections()
+        dm.DB_NAME = os.path.join(tmp, "auth.db")
+        dm.init_db()
+        dm.BCRYPT_ROUNDS = auth_manager.BCRYPT_ROUNDS = args.rounds
+        users = [f"user{i}" for i in range(args.users)]
+        for username in users:
+            dm.register_user(username, f"{username}@pvpsit.ac.in", "pw-" + username)
+
+        print(f"{'path':<14}{'logins/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'tick late p95 ms':>18}")
+        paths = [("inline", inline_login)]
+        paths += [(f"pool x{n}", int(n)) for n in args.workers.split(",")]
+        for label, login in paths:
+            if isinstance(login, int):
+                auth_manager._executor.shutdown()
+                auth_manager._executor = ThreadPoolExecutor(max_workers=login, thread_name_prefix="auth")
+                dm.USER_CACHE.clear()
+                login = auth_manager.authenticate
+            latencies, elapsed, lateness = storm(login, args.clients, args.logins, users)
+            stats, late = percentiles(latencies), percentiles(lateness)
+            print(f"{label:<14}{total / elapsed:>10.1f}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{late['p95']:>18.2f}")
+
+        user_cache = dm.USER_CACHE.stats()
+        print(f"user cache: {user_cache['hits']} hits, {user_cache['misses']} misses")
+        dm.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+# benchmarks/bench_chat_history.py
+"""
+Chat history store: append throughput (one transaction per question/answer pair)
+and the cost of rendering one page vs the whole history as it grows.
+
+    python benchmarks/bench_chat_history.py --users 200 --turns 500
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from common import percentiles, timed
+
+import database_manager as dm
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=500, help="question/answer pairs per user")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dm.close_connections()
+        dm.DB_NAME = os.path.join(tmp, "chat.db")
+        dm.init_db()
+
+        start = time.perf_counter()
+        for turn in range(args.turns):
+            for user in range(args.users):
+                dm.append_chat_messages(f"student{user}", [
+                    {"role": "user", "content": f"question {turn}"},
+                    {"role": "assistant", "content": f"answer {turn} " * 20},
+                ])
+        elapsed = time.perf_counter() - start
+        turns = args.users * args.turns
+        print(f"appended {turns} turns ({2 * turns} messages) at {turns / elapsed:.0f} turns/s")
+
+        conn = dm.get_connection()
+        full, page, older = [], [], []
+        for user in range(0, args.users, max(1, args.users // 50)):
+            name = f"student{user}"
+            full.append(timed(lambda: conn.execute(
+                "SELECT id, role, content, created_at FROM chat_messages WHERE username = ? ORDER BY id",
+                (name,)).fetchall())[1])
+            rows, elapsed = timed(dm.get_chat_page, name)
+            page.append(elapsed)
+            older.append(timed(dm.get_chat_page, name, before_id=rows[-1][0])[1])
+        dm.close_connections()
+
+    print(f"{'query':<22}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, samples in (("whole history", full), ("latest page", page), ("older page", older)):
+        stats = percentiles(samples)
+        print(f"{label:<22}{stats['p50']:>10.3f}{stats['p95']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
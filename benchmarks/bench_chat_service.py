@@ -0,0 +1,147 @@
+# benchmarks/bench_chat_service.py
+"""
+Closed-loop load test of chat_service.py. The service runs in a child process
+on a synthetic KB with the mock LLM server behind it; N concurrent clients
+each send their next question as soon as the previous answer arrives. The
+mix is KB questions, repeats (answer cache) and off-topic questions (LLM).
+Reports requests per second, tail latency, errors and 503s per concurrency
+level, for each KB batching window, with the mean KB batch size.
+
+    python benchmarks/bench_chat_service.py --concurrency 1,16,64 --windows 0,2
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import random
+import time
+
+from common import percentiles, synthetic_kb
+
+from tornado.httpclient import AsyncHTTPClient, HTTPClientError
+
+import chat_service
+import kb_manager
+import llm_handler
+from mock_llm_server import start_mock_server
+
+
+def serve(records, window_ms, max_inflight, llm_ms, port_conn):
+    server, url = start_mock_server(base_ms=llm_ms, per_token_ms=0, chunk_ms=5)
+    llm_handler.GEMINI_API_URL = url
+    llm_handler.GEMINI_STREAM_URL = url.replace("generate", "streamGenerate")
+    llm_handler.LLM_BACKENDS = ["gemini"]
+    kb_data = kb_manager.build_knowledge_base(synthetic_kb(records)[0])
+    service = chat_service.ChatService(get_kb=lambda: kb_data, batch_window=window_ms / 1000,
+                                       max_inflight=max_inflight, token="")
+
+    async def run():
+        http_server = chat_service.make_app(service).listen(0, address="127.0.0.1")
+        port_conn.send(next(iter(http_server._sockets.values())).getsockname()[1])
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.shutdown()
+
+
+def question_mix(targets, n, llm_share, repeat_share, run=0):
+    """
+    KB questions, repeats of earlier questions and nonsense the KB cannot answer (LLM calls).
+    Questions carry a tag for the run, unknown to the KB, so each run starts with a cold cache.
+    """
+    rng = random.Random(run)
+    asked = []
+    for _ in range(n):
+        r = rng.random()
+        if asked and r < repeat_share:
+            query = rng.choice(asked)
+        elif r < repeat_share + llm_share:
+            query = f"zqx{rng.randrange(10**9)} vrk{rng.randrange(10**9)}"
+        else:
+            query = f"{rng.choice(targets)[0]} run{run}"
+        asked.append(query)
+    return asked
+
+
+async def batch_counters(port):
+    """(batches, questions batched) so far, from the service's /metrics."""
+    response = await AsyncHTTPClient().fetch(f"http://127.0.0.1:{port}/metrics")
+    values = dict(line.split() for line in response.body.decode().splitlines()
+                  if line.startswith(("kb_batches_total ", "kb_batched_queries_total ")))
+    return float(values.get("kb_batches_total", 0)), float(values.get("kb_batched_queries_total", 0))
+
+
+async def load(port, queries, concurrency):
+    client = AsyncHTTPClient(max_clients=concurrency)
+    url = f"http://127.0.0.1:{port}/v1/chat"
+    latencies, sources = [], {}
+    errors = rejected = 0
+    next_query = iter(queries)
+
+    async def user():
+        nonlocal errors, rejected
+        for query in next_query:
+            start = time.perf_counter()
+            try:
+                response = await client.fetch(url, method="POST", body=json.dumps({"query": query}),
+                                              request_timeout=60)
+            except HTTPClientError as e:
+                rejected += e.code == 503
+                errors += e.code != 503
+                continue
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+            result = json.loads(response.body)
+            source = "cache" if result["cached"] else result["source"]
+            sources[source] = sources.get(source, 0) + 1
+
+    batches, batched = await batch_counters(port)
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    client.close()
+    batches_after, batched_after = await batch_counters(port)
+    batch_size = (batched_after - batched) / max(batches_after - batches, 1)
+    return len(latencies) / elapsed, percentiles(latencies), errors, rejected, batch_size, sources
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=2000, help="questions per concurrency level")
+    parser.add_argument("--concurrency", default="1,16,64,256")
+    parser.add_argument("--windows", default="0,2", help="KB batch windows in ms")
+    parser.add_argument("--llm-share", type=float, default=0.05, help="share of questions the KB cannot answer")
+    parser.add_argument("--repeat-share", type=float, default=0.3, help="share of questions asked before")
+    parser.add_argument("--llm-ms", type=float, default=200, help="mock LLM latency")
+    parser.add_argument("--max-inflight", type=int, default=chat_service.CHAT_SERVICE_MAX_INFLIGHT)
+    args = parser.parse_args()
+    ctx = multiprocessing.get_context("spawn")
+    _, targets = synthetic_kb(args.records)
+
+    print(f"{args.records} records, {args.requests} questions per run, LLM {args.llm_ms:.0f} ms, "
+          f"max in flight {args.max_inflight}")
+    print(f"{'window':>7}{'clients':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'503s':>6}{'batch':>7}  sources")
+    for window in [float(w) for w in args.windows.split(",")]:
+        parent, child = ctx.Pipe()
+        proc = ctx.Process(target=serve, args=(args.records, window, args.max_inflight, args.llm_ms, child), daemon=True)
+        proc.start()
+        port = parent.recv()
+        try:
+            for i, concurrency in enumerate(int(c) for c in args.concurrency.split(",")):
+                queries = question_mix(targets, args.requests, args.llm_share, args.repeat_share, run=i)
+                rps, stats, errors, rejected, batch_size, sources = asyncio.run(load(port, queries, concurrency))
+                mix = " ".join(f"{k}={v}" for k, v in sorted(sources.items()))
+                print(f"{window:>7g}{concurrency:>8}{rps:>9.0f}{stats['p50']:>9.1f}{stats['p95']:>9.1f}"
+                      f"{stats['p99']:>9.1f}{errors:>8}{rejected:>6}{batch_size:>7.1f}  {mix}")
+        finally:
+            proc.terminate()
+            proc.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_complaint_bulk.py
+"""
+Bulk complaint operations: closing out complaints one update_complaint_status()
+call at a time vs one batched transaction, bulk import throughput, and peak
+Python memory of streaming exports as the table grows.
+
+    python benchmarks/bench_complaint_bulk.py --close 2000 --sizes 50000,200000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from common import timed
+
+import database_manager as dm
+
+
+def legacy_records(n, offset=0):
+    for i in range(offset, offset + n):
+        yield {"student_name": f"student{i % 500}", "issue_type": "Infrastructure",
+               "description": f"Legacy complaint {i}: projector in room {i % 90} is broken",
+               "status": "pending", "created_at": "2024-03-01 09:00:00"}
+
+
+def peak_memory(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--close", type=int, default=2000, help="complaints to close out")
+    parser.add_argument("--sizes", default="50000,200000", help="table sizes for the export runs")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dm.close_connections()
+        dm.DB_NAME = os.path.join(tmp, "bulk.db")
+        dm.init_db()
+
+        _, elapsed = timed(dm.import_complaints, legacy_records(2 * args.close))
+        print(f"import {2 * args.close} records: {elapsed:.2f}s ({2 * args.close / elapsed:.0f} rows/s)")
+
+        ids = [row[0] for row in dm.get_connection().execute("SELECT id FROM complaints ORDER BY id")]
+        start = time.perf_counter()
+        for complaint_id in ids[:args.close]:
+            dm.update_complaint_status(complaint_id, "resolved", "Semester close-out")
+        one_by_one = time.perf_counter() - start
+        start = time.perf_counter()
+        dm.update_complaint_statuses((i, "resolved", "Semester close-out") for i in ids[args.close:])
+        batched = time.perf_counter() - start
+        print(f"close {args.close}: one at a time {one_by_one:.2f}s, batched {batched:.3f}s "
+              f"({one_by_one / batched:.0f}x)")
+
+        # Warm up pyarrow, whose one-time initialization is not export memory
+        dm.export_complaints_parquet(os.path.join(tmp, "warmup.parquet"))
+        print(f"{'rows':>8}{'format':>9}{'seconds':>9}{'peak MiB':>10}")
+        total = len(ids)
+        for size in (int(s) for s in args.sizes.split(",")):
+            dm.import_complaints(legacy_records(size - total, total))
+            total = size
+            for fmt, export in (("csv", dm.export_complaints_csv), ("parquet", dm.export_complaints_parquet)):
+                out = os.path.join(tmp, f"export.{fmt}")
+                _, elapsed, peak = peak_memory(export, out)
+                print(f"{size:>8}{fmt:>9}{elapsed:>9.2f}{peak:>10.2f}")
+        dm.close_connections()
+
+
+if __name__ == "__main__":
+    main()
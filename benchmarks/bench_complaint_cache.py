@@ -0,0 +1,108 @@
+# benchmarks/bench_complaint_cache.py
+"""
+500 concurrent student sessions rerendering their page (the resolved-complaints
+read) while students file complaints and admins resolve them, with and without
+the shared complaint read cache. Also checks that writes show up immediately.
+
+    python benchmarks/bench_complaint_cache.py --sessions 500 --reruns 40
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+from common import percentiles
+
+import database_manager as dm
+from cache_manager import TTLCache
+
+
+def seed(students, per_student):
+    for s in range(students):
+        for i in range(per_student):
+            dm.save_complaint(f"student{s}", "Academics", f"issue {i}")
+    ids = [row[0] for row in dm.get_connection().execute("SELECT id FROM complaints")]
+    for complaint_id in ids[::3]:
+        dm.update_complaint_status(complaint_id, "resolved", "Done")
+    return ids
+
+
+def run(sessions, reruns, write_rate, ids):
+    latencies, lock = [], threading.Lock()
+    barrier = threading.Barrier(sessions + 1)
+
+    def student(idx):
+        rng = random.Random(idx)
+        name = f"student{idx}"
+        local = []
+        barrier.wait()
+        for _ in range(reruns):
+            start = time.perf_counter()
+            dm.get_user_complaints(name, status="resolved")
+            local.append(time.perf_counter() - start)
+            if rng.random() < write_rate:
+                dm.save_complaint(name, "Other", "new issue")
+        with lock:
+            latencies.extend(local)
+
+    def admin():
+        rng = random.Random(-1)
+        barrier.wait()
+        for _ in range(reruns):
+            dm.get_status_counts()
+            dm.count_complaints(exclude_status="read")
+            dm.get_complaints_page(exclude_status="read")
+            dm.update_complaint_status(rng.choice(ids), "in progress", "Looking into it")
+
+    threads = [threading.Thread(target=student, args=(i,)) for i in range(sessions)]
+    threads.append(threading.Thread(target=admin))
+    for t in threads:
+        t.start()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, percentiles(latencies)
+
+
+def check_write_through():
+    """A resolved complaint must appear in the student's cached view at once."""
+    dm.save_complaint("fresh_student", "Other", "lights out")
+    assert dm.get_user_complaints("fresh_student", status="resolved") == []
+    complaint_id = dm.get_user_complaints("fresh_student")[0][0]
+    dm.update_complaint_status(complaint_id, "resolved", "Fixed")
+    assert [row[0] for row in dm.get_user_complaints("fresh_student", status="resolved")] == [complaint_id]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--reruns", type=int, default=40)
+    parser.add_argument("--write-rate", type=float, default=0.02, help="chance a rerun files a complaint")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dm.close_connections()
+        dm.DB_NAME = os.path.join(tmp, "cache.db")
+        dm.init_db()
+        ids = seed(args.sessions, 6)
+
+        print(f"{'reads':<10}{'reads/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'hit rate':>10}")
+        cache = dm.COMPLAINT_CACHE
+        for label, replacement in (("uncached", TTLCache(maxsize=0)), ("cached", cache)):
+            dm.COMPLAINT_CACHE = replacement
+            replacement.clear()
+            replacement.hits = replacement.misses = 0
+            rate, stats = run(args.sessions, args.reruns, args.write_rate, ids)
+            hit_rate = replacement.stats()["hit_rate"] if replacement is cache else 0.0
+            print(f"{label:<10}{rate:>12.0f}{stats['p50']:>10.3f}{stats['p99']:>10.3f}{hit_rate:>10.0%}")
+
+        check_write_through()
+        print("write-through check passed")
+        dm.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# benchmarks/bench_complaint_queue.py
+"""
+Burst of complaint submissions: per-row save_complaint() commits vs the spooled
+group-commit writer in queue_manager (acknowledgement latency, throughput until
+everything is stored), plus a crash check: a process killed right after
+submitting must lose nothing once the spool is replayed.
+
+    python benchmarks/bench_complaint_queue.py --threads 32 --per-thread 200
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from common import ROOT, percentiles
+
+import database_manager as dm
+import queue_manager
+
+CRASH_SCRIPT = """
+import json, os, sys
+sys.path.insert(0, {root!r})
+import database_manager as dm
+dm.close_connections()
+dm.DB_NAME = {db!r}
+dm.init_db()
+import queue_manager
+writer = queue_manager.ComplaintWriter({spool!r}).start()
+tickets = [writer.submit("crash{{}}".format(i % 7), "Other", "burst {{}}".format(i)) for i in range({n})]
+print(json.dumps(tickets), flush=True)
+os._exit(1)  # no flush, no atexit: whatever was still queued only exists in the spool
+"""
+
+
+def burst(submit, threads, per_thread):
+    latencies, lock = [], threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(idx):
+        local = []
+        barrier.wait()
+        for i in range(per_thread):
+            start = time.perf_counter()
+            submit(f"student{idx}", "Infrastructure", f"Burst complaint {i} from {idx}")
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return latencies, start
+
+
+def crash_check(tmp, n):
+    db, spool = os.path.join(tmp, "crash.db"), os.path.join(tmp, "crash_spool")
+    script = CRASH_SCRIPT.format(root=ROOT, db=db, spool=spool, n=n)
+    out = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, cwd=tmp)
+    tickets = json.loads(out.stdout.strip().splitlines()[-1])
+
+    dm.close_connections()
+    dm.DB_NAME = db
+    dm.init_db()
+    stored_before = sum(dm.get_complaint_by_ticket(t) is not None for t in tickets)
+    writer = queue_manager.ComplaintWriter(spool).start()
+    writer.stop()
+    missing = [t for t in tickets if dm.get_complaint_by_ticket(t) is None]
+    print(f"crash check: {stored_before}/{n} stored at crash, {writer.replayed} replayed, "
+          f"{len(missing)} missing -> {'OK' if not missing else 'LOST WRITES'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--per-thread", type=int, default=200)
+    args = parser.parse_args()
+    total = args.threads * args.per_thread
+
+    print(f"{'path':<16}{'ack p50 ms':>12}{'ack p99 ms':>12}{'stored/s':>10}{'commits':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in ("per-row commit", "queued", "queued+fsync"):
+            dm.close_connections()
+            dm.DB_NAME = os.path.join(tmp, f"{label.replace(' ', '_').replace('+', '_')}.db")
+            dm.init_db()
+            if label == "per-row commit":
+                latencies, start = burst(dm.save_complaint, args.threads, args.per_thread)
+                commits = total
+            else:
+                writer = queue_manager.ComplaintWriter(os.path.join(tmp, f"spool_{label}"),
+                                                       fsync=label.endswith("fsync")).start()
+                latencies, start = burst(writer.submit, args.threads, args.per_thread)
+                writer.flush()
+                commits = writer.stats()["batches"]
+                writer.stop()
+            elapsed = time.perf_counter() - start
+            assert dm.count_complaints() == total
+            stats = percentiles(latencies)
+            print(f"{label:<16}{stats['p50']:>12.3f}{stats['p99']:>12.3f}{total / elapsed:>10.0f}{commits:>9}")
+
+        crash_check(tmp, 2000)
+        dm.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# benchmarks/bench_db_pool.py
+"""
+Concurrent writers/readers against the complaints table, comparing the old
+connect-per-call path with the pooled WAL connections in database_manager.
+
+    python benchmarks/bench_db_pool.py --writers 8 --readers 8 --ops 200
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database_manager as dm
+
+
+# --- Old path: one connection per call, rollback journal ---
+
+def legacy_save_complaint(db_name, student_name, issue_type, description):
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute(
+        "INSERT INTO complaints (student_name, issue_type, description, status) VALUES (?, ?, ?, 'pending')",
+        (student_name, issue_type, description)
+    )
+    conn.commit()
+    conn.close()
+
+def legacy_get_user_complaints(db_name, username):
+    conn = sqlite3.connect(db_name)
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM complaints WHERE student_name = ? ORDER BY id DESC", (username,))
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def run_workload(save, read, writers, readers, ops):
+    errors = []
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(fn, idx):
+        local = []
+        for i in range(ops):
+            start = time.perf_counter()
+            try:
+                fn(idx, i)
+            except sqlite3.OperationalError as e:
+                with lock:
+                    errors.append(str(e))
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(lambda w, i: save(f"student{w}", "Academics", f"issue {i}"), w))
+               for w in range(writers)]
+    threads += [threading.Thread(target=worker, args=(lambda r, i: read(f"student{r % max(writers, 1)}"), r))
+                for r in range(readers)]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    total = len(latencies)
+    return {
+        "elapsed_s": elapsed,
+        "ops_per_s": total / elapsed if elapsed else 0.0,
+        "p50_ms": latencies[total // 2] * 1000 if total else 0.0,
+        "p99_ms": latencies[min(total - 1, int(total * 0.99))] * 1000 if total else 0.0,
+        "errors": len(errors),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--ops", type=int, default=200, help="operations per thread")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Old path gets its own file: journal_mode=WAL is persistent once set.
+        legacy_db = os.path.join(tmp, "legacy.db")
+        dm.close_connections()
+        dm.DB_NAME = legacy_db
+        dm.init_db()
+        dm.get_connection().execute("PRAGMA journal_mode=DELETE")
+        dm.close_connections()
+
+        legacy = run_workload(
+            lambda *a: legacy_save_complaint(legacy_db, *a),
+            lambda u: legacy_get_user_complaints(legacy_db, u),
+            args.writers, args.readers, args.ops,
+        )
+
+        dm.DB_NAME = os.path.join(tmp, "pooled.db")
+        dm.init_db()
+        pooled = run_workload(dm.save_complaint, dm.get_user_complaints,
+                              args.writers, args.readers, args.ops)
+        dm.close_connections()
+
+    print(f"{'path':<10}{'ops/s':>12}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, res in (("legacy", legacy), ("pooled", pooled)):
+        print(f"{name:<10}{res['ops_per_s']:>12.0f}{res['p50_ms']:>10.2f}{res['p99_ms']:>10.2f}{res['errors']:>8}")
+    if legacy["ops_per_s"]:
+        print(f"speedup: {pooled['ops_per_s'] / legacy['ops_per_s']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
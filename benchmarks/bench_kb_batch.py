@@ -0,0 +1,64 @@
+# benchmarks/bench_kb_batch.py
+"""
+Batched KB search against looping over single-query search, on a synthetic KB.
+
+    python benchmarks/bench_kb_batch.py --records 50000 --queries 20000
+"""
+import argparse
+import time
+
+from common import synthetic_kb
+
+from sklearn.metrics.pairwise import cosine_similarity
+
+import kb_manager
+
+
+def dense_search_knowledge_base(query, kb_data):
+    """The pre-engine search: one transform and a full cosine scan per query."""
+    query_vec = kb_data["vectorizer"].transform([query])
+    similarities = cosine_similarity(query_vec, kb_data["tfidf_matrix"]).flatten()
+    best_idx = similarities.argmax()
+    if similarities[best_idx] > kb_manager.SIMILARITY_THRESHOLD:
+        return kb_data["mapping"][best_idx]
+    return kb_manager.KB_MISS_MESSAGE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--k", type=int, default=1)
+    args = parser.parse_args()
+
+    kb_dict, targets = synthetic_kb(args.records)
+    kb_data = kb_manager.build_knowledge_base(kb_dict)
+    queries = [targets[i % len(targets)][0] for i in range(args.queries)]
+
+    start = time.perf_counter()
+    batched = kb_manager.search_knowledge_base_batch(queries, kb_data, k=args.k)
+    batch_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    # The scored search the batch replaces; the exact-lookup fast path returns a single field
+    looped = [kb_manager.search_knowledge_base(q, kb_data, fast_path=False) for q in queries]
+    loop_s = time.perf_counter() - start
+
+    # The dense loop is slow, so time it on a sample and extrapolate
+    sample = queries[:min(len(queries), 500)]
+    start = time.perf_counter()
+    for q in sample:
+        dense_search_knowledge_base(q, kb_data)
+    dense_s = (time.perf_counter() - start) * len(queries) / len(sample)
+
+    agree = sum(1 for b, a in zip(batched, looped) if (b[0]["answer"] if b else kb_manager.KB_MISS_MESSAGE) == a)
+    print(f"{len(queries)} queries against {kb_data['tfidf_matrix'].shape[0]} records, agreement {agree / len(queries):.1%}")
+    if agree != len(queries):
+        raise SystemExit(f"batch and single-query search disagree on {len(queries) - agree} queries")
+    print(f"{'mode':<22}{'seconds':>10}{'queries/s':>12}{'vs dense':>10}")
+    for name, seconds in (("dense loop (est.)", dense_s), ("sparse loop", loop_s), ("batch", batch_s)):
+        print(f"{name:<22}{seconds:>10.2f}{len(queries) / seconds:>12.0f}{dense_s / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
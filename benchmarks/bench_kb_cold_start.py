@@ -0,0 +1,58 @@
+# benchmarks/bench_kb_cold_start.py
+"""
+Cold start of a fresh process: import kb_manager and load the KB index, with and
+without a prebuilt artifact.
+
+    python benchmarks/bench_kb_cold_start.py --records 50000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT, synthetic_kb
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+import kb_manager
+with open({kb_path!r}) as f:
+    kb_dict = json.load(f)
+loaded = time.perf_counter()
+kb_data = kb_manager.load_knowledge_base(kb_dict, index_dir={index_dir!r})
+kb_manager.search_knowledge_base("exam fee", kb_data)
+print(json.dumps({{"import_s": loaded - start, "load_s": time.perf_counter() - loaded,
+                  "sklearn_imported": "sklearn" in sys.modules}}))
+"""
+
+
+def run_child(kb_path, index_dir):
+    code = CHILD.format(root=ROOT, kb_path=kb_path, index_dir=index_dir)
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=50000)
+    args = parser.parse_args()
+
+    kb_dict, _ = synthetic_kb(args.records)
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = os.path.join(tmp, "kb.json")
+        with open(kb_path, "w") as f:
+            json.dump(kb_dict, f)
+        index_dir = os.path.join(tmp, "kb_index")
+
+        print(f"{'start':<22}{'import s':>10}{'load s':>10}{'sklearn':>9}")
+        for name, directory in (("refit (no artifact)", None), ("first run (writes)", index_dir),
+                                ("prebuilt artifact", index_dir)):
+            res = run_child(kb_path, directory)
+            print(f"{name:<22}{res['import_s']:>10.3f}{res['load_s']:>10.3f}{str(res['sklearn_imported']):>9}")
+
+
+if __name__ == "__main__":
+    main()
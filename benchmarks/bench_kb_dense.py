@@ -0,0 +1,125 @@
+# benchmarks/bench_kb_dense.py
+"""
+Lexical TF-IDF search vs hybrid TF-IDF + dense search: embedding build time and
+memory, query latency, KB hit rate on exact, misspelled and paraphrased
+questions, false answers to off-topic questions, and IVF recall against a full
+scan. Every KB miss here is an LLM call in production.
+
+    python benchmarks/bench_kb_dense.py --sizes 1000,10000,100000
+"""
+import argparse
+import random
+
+from common import percentiles, synthetic_kb, timed
+
+import kb_manager
+
+OFF_TOPIC = [
+    "what is the capital of france", "tell me a joke", "how do i cook rice", "who won the world cup",
+    "what is the weather today", "recommend a good movie", "how old is the universe", "translate hello to french",
+    "what is bitcoin price", "write a poem about rain", "best pizza near me", "how to lose weight fast",
+]
+
+# Questions about the real KB in kb/, with the record each should find
+REAL_KB_QUESTIONS = [
+    ("when do holidays start for Dasara", "Dasara Vacation"),
+    ("when is the sankranthi break", "Pongal Vacation"),
+    ("pongal holidays", "Pongal Vacation"),
+    ("when do classes begin", "Classwork Start"),
+    ("dasara vacation", "Dasara Vacation"),
+    ("vacaton dates for dasara", "Dasara Vacation"),
+    ("when are the end exams", "End Exams"),
+    ("second sem mid 2 dates", "Second Sem Mid 2"),
+    ("exam fee", "Exam Fee"),
+    ("management quota fees", "Management Quota"),
+    ("internship dates", "Internship"),
+    ("hackathon eligibility", "Hackathon"),
+]
+
+
+def misspell(query, rng):
+    """Drop or swap one inner letter in up to two longer words, like a hurried student."""
+    words = query.split()
+    long_words = [i for i, w in enumerate(words) if len(w) > 4 and w.isalpha()]
+    for i in rng.sample(long_words, min(2, len(long_words))):
+        w = words[i]
+        j = rng.randrange(1, len(w) - 2)
+        words[i] = w[:j] + w[j + 1:] if rng.random() < 0.5 else w[:j] + w[j + 1] + w[j] + w[j + 2:]
+    return " ".join(words)
+
+
+def rephrase(query):
+    """Same question in other words (the synthetic KB records say 'credits', 'phone', 'date')."""
+    for old, new in (("credits for ", "how many credits is "), ("phone number of ", "contact of "),
+                     ("when is ", "what date is ")):
+        if query.startswith(old):
+            return new + query[len(old):]
+    return query
+
+
+def hit_rate(kb_data, questions):
+    hits = 0
+    for query, expected in questions:
+        results = kb_manager.search_knowledge_base_ranked(query, kb_data, k=1)
+        hits += bool(results) and expected in results[0]["answer"]
+    return hits / len(questions)
+
+
+def answered(kb_data, queries):
+    return sum(bool(kb_manager.search_knowledge_base_ranked(q, kb_data, k=1)) for q in queries) / len(queries)
+
+
+def latency(kb_data, queries):
+    samples = [timed(kb_manager.search_knowledge_base_ranked, q, kb_data, 1)[1] for q in queries]
+    return percentiles(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    args = parser.parse_args()
+    rng = random.Random(0)
+
+    print(f"{'records':>8}{'embed s':>9}{'dense MB':>10}{'f32 MB':>8}{'lex p50':>9}{'hyb p50':>9}{'hyb p95':>9}"
+          f"{'exact':>13}{'misspelt':>13}{'rephrased':>13}{'off-topic':>13}{'IVF recall':>12}")
+    for size in [int(s) for s in args.sizes.split(",")]:
+        kb_dict, targets = synthetic_kb(size)
+        lexical = kb_manager.build_knowledge_base(kb_dict, dense=False)
+        dense, embed_s = timed(kb_manager.build_dense_index, lexical["corpus"])
+        hybrid = dict(lexical, dense=dense)
+        exact = targets
+        typos = [(misspell(q, rng), e) for q, e in targets]
+        rephrased = [(rephrase(q), e) for q, e in targets]
+        queries = [q for q, _ in exact + typos]
+
+        rates = {}
+        for label, questions in (("exact", exact), ("misspelt", typos), ("rephrased", rephrased)):
+            rates[label] = f"{hit_rate(lexical, questions):.0%}->{hit_rate(hybrid, questions):.0%}"
+        rates["off-topic"] = f"{answered(lexical, OFF_TOPIC):.0%}->{answered(hybrid, OFF_TOPIC):.0%}"
+
+        recall = "-"
+        if dense["lists"] is not None:
+            scan = dict(hybrid, dense=dict(dense, lists=None))
+            agree = sum(kb_manager.search_knowledge_base_ranked(q, hybrid, k=1)[:1] ==
+                        kb_manager.search_knowledge_base_ranked(q, scan, k=1)[:1] for q in queries)
+            recall = f"{agree / len(queries):.1%}"
+
+        lex_lat, hyb_lat = latency(lexical, queries), latency(hybrid, queries)
+        dense_mb, float32_mb = kb_manager.dense_index_bytes(dense) / 2**20, size * kb_manager.DENSE_DIM * 4 / 2**20
+        print(f"{size:>8}{embed_s:>9.2f}{dense_mb:>10.1f}{float32_mb:>8.1f}"
+              f"{lex_lat['p50']:>9.2f}{hyb_lat['p50']:>9.2f}{hyb_lat['p95']:>9.2f}"
+              f"{rates['exact']:>13}{rates['misspelt']:>13}{rates['rephrased']:>13}{rates['off-topic']:>13}{recall:>12}")
+
+    real = kb_manager.KB_DICT
+    if real:
+        lexical = kb_manager.build_knowledge_base(real, dense=False)
+        hybrid = kb_manager.build_knowledge_base(real, dense=True)
+        lex_hits, hyb_hits = hit_rate(lexical, REAL_KB_QUESTIONS), hit_rate(hybrid, REAL_KB_QUESTIONS)
+        n = len(REAL_KB_QUESTIONS)
+        print(f"\nkb/ questions answered from the KB: lexical {lex_hits:.0%}, hybrid {hyb_hits:.0%} "
+              f"-> LLM calls {round(n * (1 - lex_hits))}/{n} -> {round(n * (1 - hyb_hits))}/{n}; "
+              f"off-topic answered: {answered(lexical, OFF_TOPIC):.0%} -> {answered(hybrid, OFF_TOPIC):.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/bench_kb_fallback.py
+"""
+Offline fallback matcher: the old linear substring scan against the indexed BM25 +
+trigram matcher, on exact and misspelled questions. A hit means the returned line
+belongs to the record the question is about.
+
+    python benchmarks/bench_kb_fallback.py --sizes 1000,10000,50000
+"""
+import argparse
+import random
+import time
+
+from common import synthetic_kb, percentiles, timed
+
+import kb_manager
+import llm_handler
+
+
+def legacy_fallback_kb_response(query, kb_lines):
+    """The pre-index fallback: first line containing the whole query."""
+    query_lower = query.lower()
+    matches = [line for line in kb_lines if query_lower in line.lower()]
+    return matches[0] if matches else llm_handler.FALLBACK_MISS_MESSAGE
+
+
+def misspell(query, rng):
+    """Swap two adjacent letters in the longest word, e.g. 'credits' -> 'cerdits'."""
+    words = query.split()
+    i = max(range(len(words)), key=lambda j: len(words[j]))
+    word = words[i]
+    if len(word) > 4:
+        k = rng.randrange(1, len(word) - 2)
+        words[i] = word[:k] + word[k + 1] + word[k] + word[k + 2:]
+    return " ".join(words)
+
+
+def record_prefix(line):
+    return line.split(": ", 1)[0].rsplit(".", 1)[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,50000")
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'records':>8}{'matcher':>9}{'queries':>11}{'hit rate':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        kb_dict, targets = synthetic_kb(size)
+        kb_data = kb_manager.build_knowledge_base(kb_dict)
+        kb_lines = llm_handler.get_kb_lines(kb_data)[0]
+        start = time.perf_counter()
+        index = llm_handler.get_fallback_index(kb_data)
+        print(f"{size:>8}  index build {time.perf_counter() - start:.2f} s for {len(kb_lines)} lines")
+
+        expected = {line.split(": ", 1)[1]: record_prefix(line) for line in kb_lines if ".name: " in line}
+        targets = targets[:args.queries]
+        for label, queries in (("exact", targets), ("typos", [(misspell(q, rng), name) for q, name in targets])):
+            for matcher in ("legacy", "indexed"):
+                hits, latencies = 0, []
+                for query, name in queries:
+                    if matcher == "legacy":
+                        answer, elapsed = timed(legacy_fallback_kb_response, query, kb_lines)
+                    else:
+                        answer, elapsed = timed(llm_handler.fallback_kb_response, query, kb_lines, index)
+                    latencies.append(elapsed)
+                    hits += answer != llm_handler.FALLBACK_MISS_MESSAGE and record_prefix(answer) == expected[name]
+                stats = percentiles(latencies)
+                print(f"{size:>8}{matcher:>9}{label:>11}{hits / len(queries):>10.0%}"
+                      f"{stats['p50']:>10.2f}{stats['p95']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# benchmarks/bench_kb_fast_path.py
+"""
+Fast-path exact lookups vs TF-IDF scoring on a replay of student questions: the
+share of questions the fast path answers, whether it picks the same record as
+scoring, the misses it turns into KB answers (LLM calls saved) and latency with
+and without it. Questions come from the chat log in --db when it has any, else
+from a built-in replay; synthetic KBs show how it scales.
+
+    python benchmarks/bench_kb_fast_path.py --db helpdesk.db --sizes 1000,100000
+"""
+import argparse
+import os
+import random
+import sqlite3
+
+from common import WORDS, percentiles, synthetic_kb, timed
+
+import kb_manager
+
+# Questions students ask about the real KB in kb/, as typed
+REPLAY = [
+    "credits for 23BS1101", "23ES1104", "what is 23ES1153", "Exam_Fee_Sem", "exam fee", "exam fee per sem",
+    "phone number of Janakiramaiah", "email of Mrs.P.Naga Mani", "Anil Kumar designation",
+    "experience of Dr.B.Janakiramaiah", "contact of hema venkata ramana", "who is the head of department",
+    "when is SecondSem_Mid1", "when is mid 1", "mid2 dates", "when are the end exams",
+    "when do second sem end exams start", "dasara vacation", "when do holidays start for Dasara",
+    "pongal vacation dates", "when is the sankranthi break", "internship dates", "when do classes begin",
+    "classwork start", "management quota fees", "counseling quota fee", "hackathon eligibility",
+    "hackathon team size", "when is the hackathon", "Story Fragmentation Challenge venue",
+    "expressive on spot time", "credits of Engineering Graphics", "IT workshop credits",
+    "marks for engineering physics", "introduction to programming 23ES1103", "list of labs in first sem",
+    "what is the capital of france", "tell me a joke", "how do i apply for a bonafide certificate",
+    "library timings", "bus fee", "is there a dress code",
+]
+
+OFF_TOPIC = ["what is the weather today", "recommend a good movie", "how to lose weight fast", "tell me a joke"]
+
+
+def chat_log_questions(db_path):
+    """User messages from the app's chat log, oldest first."""
+    if not db_path or not os.path.exists(db_path):
+        return []
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return [row[0] for row in conn.execute("SELECT content FROM chat_messages WHERE role = 'user' ORDER BY id")]
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
+
+def replay(label, kb_data, queries):
+    served = agree = rescued = 0
+    scoring, combined, saved = [], [], []
+    for query in queries * 3:
+        kb_manager.search_knowledge_base(query, kb_data)  # warm-up
+    for query in queries:
+        ranked, scoring_s = timed(kb_manager.search_knowledge_base_ranked, query, kb_data, 1)
+        _, combined_s = timed(kb_manager.search_knowledge_base, query, kb_data, True)
+        hit, lookup_s = timed(kb_manager.resolve_fast_path, query, kb_data)
+        scoring.append(scoring_s)
+        combined.append(combined_s)
+        if hit is not None:
+            served += 1
+            saved.append(scoring_s - lookup_s)
+            if ranked:
+                agree += ranked[0]["index"] == hit["index"]
+            else:
+                rescued += 1
+    n = len(queries)
+    before, after = percentiles(scoring), percentiles(combined)
+    print(f"{label:<22}{n:>8}{served / n:>9.0%}{agree / max(served - rescued, 1):>9.0%}{rescued:>9}"
+          f"{before['p50']:>11.3f}{after['p50']:>11.3f}{sum(scoring) / n * 1000:>11.3f}{sum(combined) / n * 1000:>11.3f}"
+          f"{(sum(saved) / len(saved) * 1000 if saved else 0):>11.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--db", default=os.getenv("DB_NAME", "helpdesk.db"), help="chat log to replay")
+    parser.add_argument("--sizes", default="1000,100000", help="synthetic KB sizes")
+    args = parser.parse_args()
+
+    print(f"{'replay':<22}{'queries':>8}{'served':>9}{'agree':>9}{'rescued':>9}"
+          f"{'score p50':>11}{'+fast p50':>11}{'score mean':>11}{'+fast mean':>11}{'saved/hit':>11}  (ms)")
+    kb_data = kb_manager.build_knowledge_base(kb_manager.KB_DICT)
+    logged = chat_log_questions(args.db)
+    if logged:
+        replay(f"chat log ({os.path.basename(args.db)})", kb_data, logged)
+    replay("kb/ replay", kb_data, REPLAY)
+
+    rng = random.Random(0)
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        kb_dict, targets = synthetic_kb(size)
+        kb_data = kb_manager.build_knowledge_base(kb_dict)
+        # Mostly questions naming a record, some free text about a record, some off-topic
+        queries = [q for q, _ in targets]
+        queries += [f"tell me about {rng.choice(WORDS)} courses" for _ in range(len(targets) // 3)]
+        queries += OFF_TOPIC * (len(targets) // 40)
+        replay(f"synthetic {size}", kb_data, queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/bench_kb_reload.py
+"""
+Hot reload of the file-based KB: a single-record edit must become searchable
+through an incremental reindex (one record tokenized, not a full rebuild), score
+exactly like a full rebuild, also when it removes the last use of a word, and be
+picked up by the file watcher.
+
+    python benchmarks/bench_kb_reload.py --records 50000
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from common import synthetic_kb
+
+import kb_manager
+
+
+def write_kb_dir(kb_dir, kb_dict):
+    for section, value in kb_dict.items():
+        with open(os.path.join(kb_dir, f"{section}.json"), "w", encoding="utf-8") as f:
+            json.dump(value, f)
+
+
+def edit_record(kb_dir, kb_dict, new_name):
+    """Rename the first event and rewrite only the EVENTS file."""
+    kb_dict["EVENTS"]["Club"][0]["name"] = new_name
+    with open(os.path.join(kb_dir, "EVENTS.json"), "w", encoding="utf-8") as f:
+        json.dump(kb_dict["EVENTS"], f)
+
+
+def assert_scores_match(active, kb_dir, queries):
+    """Incremental scores must equal a full rebuild of the same content."""
+    rebuilt = kb_manager.build_knowledge_base(kb_manager.read_kb_dir(kb_dir))
+    for query in queries:
+        got = [(r["path"], round(r["score"], 9)) for r in kb_manager.search_knowledge_base_ranked(query, active)]
+        want = [(r["path"], round(r["score"], 9)) for r in kb_manager.search_knowledge_base_ranked(query, rebuilt)]
+        assert got == want, (query, got, want)
+    assert sorted(active["vectorizer"].vocabulary_) == sorted(rebuilt["vectorizer"].vocabulary_)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=50000)
+    args = parser.parse_args()
+
+    kb_dict, targets = synthetic_kb(args.records)
+    with tempfile.TemporaryDirectory() as kb_dir:
+        write_kb_dir(kb_dir, kb_dict)
+        start = time.perf_counter()
+        kb_manager.reload_knowledge_base(kb_dir, index_dir=None)
+        full_s = time.perf_counter() - start
+
+        # Direct reload after a one-record edit
+        edit_record(kb_dir, kb_dict, "Zyxwvut Quiz Night")
+        start = time.perf_counter()
+        stats = kb_manager.reload_knowledge_base(kb_dir, index_dir=None)
+        incremental_s = time.perf_counter() - start
+        active = kb_manager.get_active_kb()
+        answer = kb_manager.search_knowledge_base("when is Zyxwvut Quiz Night", active)
+        assert stats["tokenized"] == 1 and stats["changed"] == 1, stats
+        assert answer.startswith("Zyxwvut Quiz Night"), answer
+
+        assert_scores_match(active, kb_dir, [q for q, _ in targets[:100]] + ["when is Zyxwvut Quiz Night"])
+
+        # Renaming again removes the only use of "zyxwvut": it must leave the vocabulary,
+        # or its IDF weight would still count in the norm of queries that mention it
+        edit_record(kb_dir, kb_dict, "Plughbert Quiz Night")
+        kb_manager.reload_knowledge_base(kb_dir, index_dir=None)
+        active = kb_manager.get_active_kb()
+        assert "zyxwvut" not in active["vectorizer"].vocabulary_
+        assert_scores_match(active, kb_dir, [q for q, _ in targets[:100]] + [
+            "when is Zyxwvut Quiz Night", "zyxwvut plughbert", "plughbert quiz night date"])
+
+        # Same edit through the watchdog observer
+        observer = kb_manager.watch_knowledge_base(kb_dir, index_dir=None)
+        try:
+            before = kb_manager.get_active_kb()["version"]
+            edit_record(kb_dir, kb_dict, "Qwertyuiop Film Screening")
+            start = time.perf_counter()
+            while kb_manager.get_active_kb()["version"] == before and time.perf_counter() - start < 30:
+                time.sleep(0.01)
+            watched_s = time.perf_counter() - start
+            answer = kb_manager.search_knowledge_base("when is Qwertyuiop Film Screening", kb_manager.get_active_kb())
+            assert answer.startswith("Qwertyuiop Film Screening"), answer
+        finally:
+            observer.stop()
+            observer.join()
+
+    print(f"records: {len(active['paths'])}, update: {stats}")
+    print(f"full build:          {full_s:.3f}s")
+    print(f"incremental reload:  {incremental_s:.3f}s ({full_s / incremental_s:.1f}x faster)")
+    print(f"watcher edit -> searchable: {watched_s:.3f}s (includes {kb_manager.KB_RELOAD_DEBOUNCE_SECONDS}s debounce)")
+    print("OK: single-record edit searchable without a full rebuild; scores match a full rebuild")
+
+
+if __name__ == "__main__":
+    main()
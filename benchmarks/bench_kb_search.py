@@ -0,0 +1,81 @@
+# benchmarks/bench_kb_search.py
+"""
+Retrieval quality and latency of KB search on a synthetic KB shaped like KB_DICT:
+the old whole-value flatten, per-record indexing with a dense cosine scan, and
+per-record indexing with the inverted-index top-k engine.
+
+    python benchmarks/bench_kb_search.py --records 50000
+"""
+import argparse
+
+from common import synthetic_kb, percentiles, timed
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+import kb_manager
+
+
+# --- Old path: dict-only flatten, one document per list ---
+
+def legacy_load_knowledge_base(kb_dict):
+    corpus = []
+    mapping = []
+
+    def flatten(d, prefix=""):
+        for k, v in d.items():
+            if isinstance(v, dict):
+                flatten(v, f"{prefix}{k}.")
+            else:
+                corpus.append(f"{prefix}{k}: {v}")
+                mapping.append(v)
+
+    flatten(kb_dict)
+    vectorizer = TfidfVectorizer()
+    return {"mapping": mapping, "vectorizer": vectorizer, "tfidf_matrix": vectorizer.fit_transform(corpus)}
+
+def legacy_search_knowledge_base(query, kb_data):
+    query_vec = kb_data["vectorizer"].transform([query])
+    similarities = cosine_similarity(query_vec, kb_data["tfidf_matrix"]).flatten()
+    best_idx = similarities.argmax()
+    if similarities[best_idx] > 0.3:
+        return kb_data["mapping"][best_idx]
+    return "I'm still learning about the college."
+
+def dense_search_knowledge_base(query, kb_data):
+    """Per-record index, but scored with a full cosine_similarity scan."""
+    return legacy_search_knowledge_base(query, kb_data)
+
+
+def evaluate(name, load, search, kb_dict, targets):
+    kb_data, build_s = timed(load, kb_dict)
+    latencies, correct, payload = [], 0, 0
+    for query, expected in targets:
+        answer, elapsed = timed(search, query, kb_data)
+        latencies.append(elapsed)
+        text = str(answer)
+        payload += len(text)
+        # Correct only if the answer is the one record asked about, not a list containing it
+        if text.startswith(expected) or (isinstance(answer, dict) and answer.get("name") == expected):
+            correct += 1
+    stats = percentiles(latencies)
+    print(f"{name:<10}{kb_data['tfidf_matrix'].shape[0]:>9}{build_s:>10.2f}"
+          f"{correct / len(targets):>10.1%}{payload / len(targets):>14.0f}"
+          f"{stats['p50']:>9.2f}{stats['p95']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=50000)
+    args = parser.parse_args()
+
+    kb_dict, targets = synthetic_kb(args.records)
+    print(f"{len(targets)} queries against a {args.records}-record KB")
+    print(f"{'index':<10}{'docs':>9}{'build s':>10}{'top-1':>10}{'answer chars':>14}{'p50 ms':>9}{'p95 ms':>9}")
+    evaluate("legacy", legacy_load_knowledge_base, legacy_search_knowledge_base, kb_dict, targets)
+    evaluate("dense", kb_manager.build_knowledge_base, dense_search_knowledge_base, kb_dict, targets)
+    evaluate("sparse", kb_manager.build_knowledge_base, kb_manager.search_knowledge_base, kb_dict, targets)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+# benchmarks/bench_kb_shared.py
+"""
+Several app processes sharing one KB index. A builder publishes a synthetic KB,
+N processes started with KB_ROLE=worker attach to it and touch every page, and
+their proportional set sizes (PSS: each shared page is split between the
+processes mapping it) are summed while all are attached. The builder then
+publishes an update and each worker reports when it first serves it.
+Exits 1 if the workers hold more than --max-copies copies of the index or any
+worker misses the update.
+
+    python benchmarks/bench_kb_shared.py --workers 4 --records 100000
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+from common import ROOT, synthetic_kb
+
+import kb_manager
+
+UPDATE_QUERY = "when is Zyxwvut Quiz Night"
+
+
+def memory_mb():
+    """Rss and Pss of this process in MB, from /proc/self/smaps_rollup (Linux)."""
+    usage = {}
+    with open("/proc/self/smaps_rollup", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ("Rss:", "Pss:"):
+                usage[parts[0][:-1]] = int(parts[1]) / 1024
+    return usage
+
+
+def touch(kb_data):
+    """Fault in every page of the index, as a long-running worker eventually would."""
+    for name in ("tfidf_matrix", "inverted_index"):
+        matrix = kb_data[name]
+        for array in (matrix.data, matrix.indices, matrix.indptr):
+            array.sum()
+    for name in ("idf", "term_max_weight"):
+        kb_data[name].sum()
+    for array in kb_data["fast_path"].values():
+        array.sum()
+    for name in ("mapping", "paths", "corpus", "records"):
+        table = kb_data[name]
+        for i in range(len(table)):
+            table[i]
+
+
+def worker(queries, conn):
+    before = memory_mb()
+    start = time.perf_counter()
+    kb_data = kb_manager.get_active_kb()
+    attach_s = time.perf_counter() - start
+    for query in queries:
+        kb_manager.search_knowledge_base(query, kb_data)
+    touch(kb_data)
+    conn.send(("ready", kb_data["version"], attach_s))
+    conn.recv()
+    after = memory_mb()
+    conn.send(("memory", after["Pss"] - before["Pss"], after["Rss"] - before["Rss"]))
+
+    # Keep serving queries; report the first one answered from the new version
+    version = kb_data["version"]
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        kb_data = kb_manager.get_active_kb()
+        if kb_data["version"] != version:
+            conn.send(("updated", time.time(), kb_manager.search_knowledge_base(UPDATE_QUERY, kb_data)))
+            return
+        kb_manager.search_knowledge_base(queries[0], kb_data)
+        time.sleep(0.001)
+    conn.send(("updated", None, None))
+
+
+def standalone(records, conn):
+    """The pre-sharing setup: every process reads the KB and builds its own index."""
+    before = memory_mb()
+    start = time.perf_counter()
+    kb_dict, _ = synthetic_kb(records)
+    kb_manager.load_knowledge_base(kb_dict, index_dir=None)
+    conn.send((time.perf_counter() - start, memory_mb()["Rss"] - before["Rss"]))
+
+
+def directory_mb(path):
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--records", type=int, default=100000)
+    parser.add_argument("--max-copies", type=float, default=1.5,
+                        help="fail if the workers' summed PSS exceeds this many copies of the index")
+    args = parser.parse_args()
+    ctx = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory(dir=ROOT) as index_dir:
+        kb_dict, targets = synthetic_kb(args.records)
+        kb_data = kb_manager.build_knowledge_base(kb_dict)
+        version_dir = kb_manager.write_index_artifact(kb_data, index_dir)
+        kb_manager.publish_index_version(version_dir, index_dir)
+        index_mb = directory_mb(version_dir)
+        queries = [q for q, _ in targets]
+
+        # Spawned workers import kb_manager with these settings
+        os.environ.update(KB_ROLE="worker", KB_INDEX_DIR=index_dir)
+        pipes, procs = [], []
+        for _ in range(args.workers):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=worker, args=(queries, child))
+            proc.start()
+            pipes.append(parent)
+            procs.append(proc)
+        ready = [conn.recv() for conn in pipes]
+        for conn in pipes:
+            conn.send("measure")
+        usage = [conn.recv() for conn in pipes]
+
+        # Publish an update while every worker is serving
+        quiz = {"name": "Zyxwvut Quiz Night", "date": "01-02-2026", "venue": "Library"}
+        kb_dict = dict(kb_dict, EVENTS={"Club": kb_dict["EVENTS"]["Club"] + [quiz]})
+        updated, _ = kb_manager.update_knowledge_base(kb_data, kb_dict)
+        new_version_dir = kb_manager.write_index_artifact(updated, index_dir)
+        published_at = time.time()
+        kb_manager.publish_index_version(new_version_dir, index_dir)
+        seen = [conn.recv() for conn in pipes]
+        for proc in procs:
+            proc.join()
+        del os.environ["KB_ROLE"], os.environ["KB_INDEX_DIR"]
+
+        parent, child = ctx.Pipe()
+        proc = ctx.Process(target=standalone, args=(args.records, child))
+        proc.start()
+        standalone_s, standalone_mb = parent.recv()
+        proc.join()
+
+    pss_total = sum(pss for _, pss, _ in usage)
+    copies = pss_total / index_mb
+    lags = [(at - published_at) * 1000 for _, at, _ in seen if at is not None]
+    answered = sum(bool(answer) and "Zyxwvut Quiz Night" in answer for _, _, answer in seen)
+
+    print(f"{args.records} records, index artifact {index_mb:.1f} MB, {args.workers} workers")
+    print(f"{'worker':<8}{'attach ms':>10}{'PSS MB':>9}{'RSS MB':>9}")
+    for i, ((_, _, attach_s), (_, pss, rss)) in enumerate(zip(ready, usage)):
+        print(f"{i:<8}{attach_s * 1000:>10.1f}{pss:>9.1f}{rss:>9.1f}")
+    print(f"workers together: {pss_total:.1f} MB PSS = {copies:.2f} copies of the index")
+    print(f"standalone processes (own build, as after any KB reload): {standalone_mb:.1f} MB and "
+          f"{standalone_s:.1f}s each, {standalone_mb * args.workers:.1f} MB for {args.workers}")
+    print(f"update: {answered}/{args.workers} workers serving it, "
+          f"{min(lags, default=0):.1f}-{max(lags, default=0):.1f} ms after publish")
+
+    failures = []
+    if copies > args.max_copies:
+        failures.append(f"workers hold {copies:.2f} copies of the index (limit {args.max_copies})")
+    if answered != args.workers:
+        failures.append(f"only {answered} of {args.workers} workers answered from the update")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_llm_breaker.py
+"""
+Chat latency during a Gemini outage, with and without the circuit breaker, and
+recovery once the upstream comes back. A mock Ollama server stands in for the
+local backend.
+
+    python benchmarks/bench_llm_breaker.py --queries 20
+"""
+import argparse
+import time
+
+from common import percentiles, timed
+from mock_llm_server import start_mock_server
+
+import llm_client
+import llm_handler
+
+QUERY = "what is the fee for the hostel"
+
+
+def run(queries):
+    latencies = []
+    for _ in range(queries):
+        _, elapsed = timed(llm_handler.generate_llm_response, QUERY)
+        latencies.append(elapsed)
+    return percentiles(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--reset-seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    gemini, gemini_url = start_mock_server(base_ms=50, per_token_ms=0, chunk_ms=0, error_rate=1.0)
+    ollama, ollama_url = start_mock_server(base_ms=50, per_token_ms=0, chunk_ms=0)
+    llm_handler.GEMINI_API_URL = gemini_url
+    llm_handler.OLLAMA_URL = ollama_url.replace("/generate", "/api/generate")
+    llm_handler.LLM_BACKENDS[:] = ["gemini", "ollama"]
+
+    for label, threshold in (("no breaker", 10 ** 9), ("breaker", llm_client.BREAKER_FAILURE_THRESHOLD)):
+        for backend in llm_handler.BACKENDS.values():
+            backend["breaker"] = llm_client.CircuitBreaker(backend["breaker"].name, threshold, args.reset_seconds)
+        gemini.requests = 0
+        stats = run(args.queries)
+        print(f"gemini down, {label:>10}: p50 {stats['p50']:8.1f} ms  p95 {stats['p95']:8.1f} ms  "
+              f"gemini hits {gemini.requests}  {llm_handler.llm_backend_status()[0]['state']}")
+
+    # Upstream recovers: after reset_seconds one half-open probe closes the circuit again
+    gemini.error_rate = 0.0
+    time.sleep(args.reset_seconds)
+    stats = run(args.queries)
+    status = llm_handler.llm_backend_status()[0]
+    print(f"gemini back up:           p50 {stats['p50']:8.1f} ms  state {status['state']}  "
+          f"trips {status['trips']}  rejected {status['rejected']}")
+    gemini.shutdown()
+    ollama.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_llm_client.py
+"""
+LLM client behaviour against the local mock server: time to first token for
+streamed vs blocking answers, keep-alive reuse, retries on injected 503s and
+the in-flight cap under a burst of concurrent chats.
+
+    python benchmarks/bench_llm_client.py
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from common import percentiles, timed
+from mock_llm_server import start_mock_server
+
+import llm_client
+import llm_handler
+
+QUERY = "what is the fee for the hostel"
+
+
+def time_to_first_token(stream):
+    start = time.perf_counter()
+    first = None
+    for _ in stream:
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=32)
+    args = parser.parse_args()
+
+    # --- Time to first token ---
+    server, url = start_mock_server(base_ms=150, per_token_ms=0, chunk_ms=40)
+    llm_handler.GEMINI_API_URL = url
+    llm_handler.GEMINI_STREAM_URL = url.replace("generate", "streamGenerate")
+    blocking = [timed(llm_handler.generate_llm_response, QUERY)[1] for _ in range(5)]
+    streamed = [time_to_first_token(llm_handler.stream_llm_response(QUERY)) for _ in range(5)]
+    print(f"blocking answer        p50 {percentiles(blocking)['p50']:8.1f} ms")
+    print(f"streamed first token   p50 {percentiles([f for f, _ in streamed])['p50']:8.1f} ms"
+          f"  (complete {percentiles([t for _, t in streamed])['p50']:.1f} ms)")
+    server.shutdown()
+
+    # --- Keep-alive ---
+    server, url = start_mock_server(base_ms=0, per_token_ms=0, chunk_ms=0)
+    payload = {"prompt": QUERY}
+    fresh = [timed(lambda: requests.post(url, json=payload, timeout=5).json())[1] for _ in range(args.requests)]
+    pooled = [timed(llm_client.post_json, url, payload)[1] for _ in range(args.requests)]
+    print(f"new connection/request p50 {percentiles(fresh)['p50']:8.2f} ms")
+    print(f"pooled session         p50 {percentiles(pooled)['p50']:8.2f} ms")
+    server.shutdown()
+
+    # --- Retries with jittered backoff ---
+    server, url = start_mock_server(base_ms=0, per_token_ms=0, chunk_ms=0, error_rate=0.3)
+    ok = 0
+    for _ in range(args.requests):
+        try:
+            llm_client.post_json(url, payload)
+            ok += 1
+        except llm_client.LLMError:
+            pass
+    print(f"30% upstream 503s      {ok}/{args.requests} succeeded in {server.requests} attempts "
+          f"(max {llm_client.LLM_MAX_ATTEMPTS} per call)")
+    server.shutdown()
+
+    # --- Bounded concurrency ---
+    server, url = start_mock_server(base_ms=100, per_token_ms=0, chunk_ms=0)
+    with ThreadPoolExecutor(args.burst) as pool:
+        list(pool.map(lambda _: llm_client.post_json(url, payload), range(args.burst)))
+    print(f"burst of {args.burst} chats         max {server.max_in_flight} in flight "
+          f"(LLM_MAX_CONCURRENCY={llm_client.LLM_MAX_CONCURRENCY})")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_llm_prompt.py
+"""
+Prompt size and end-to-end generate_llm_response latency as the KB grows:
+whole-KB prompts against retrieval-scoped prompts, served by the local mock LLM.
+
+    python benchmarks/bench_llm_prompt.py --sizes 100,1000,10000
+"""
+import argparse
+
+import requests
+
+from common import synthetic_kb, percentiles, timed
+from mock_llm_server import start_mock_server
+
+import kb_manager
+import llm_handler
+
+
+def legacy_generate_llm_response(query, kb_data):
+    """The pre-retrieval path: flatten the whole KB into every prompt."""
+    kb_lines = llm_handler.flatten_for_prompt(kb_data.get("kb_dict", {}))
+    prompt_text = "\n".join(kb_lines) + "\n\nUser Query: " + query
+    response = requests.post(llm_handler.GEMINI_API_URL, json={"prompt": prompt_text}, timeout=60)
+    return response.json()["candidates"][0]["content"], prompt_text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--queries", type=int, default=5)
+    parser.add_argument("--base-ms", type=float, default=200.0)
+    parser.add_argument("--per-token-ms", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server, url = start_mock_server(base_ms=args.base_ms, per_token_ms=args.per_token_ms)
+    llm_handler.GEMINI_API_URL = url
+
+    print(f"{'records':>8}{'mode':>10}{'prompt tokens':>15}{'p50 ms':>10}{'p95 ms':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        kb_dict, targets = synthetic_kb(size)
+        kb_data = kb_manager.build_knowledge_base(kb_dict)
+        llm_handler.get_kb_lines(kb_data)  # precomputed once per KB version, not per request
+        queries = [q for q, _ in targets[:args.queries]]
+
+        for mode in ("whole-kb", "scoped"):
+            latencies, tokens = [], []
+            for query in queries:
+                if mode == "whole-kb":
+                    (_, prompt), elapsed = timed(legacy_generate_llm_response, query, kb_data)
+                else:
+                    prompt = llm_handler.build_prompt(query, kb_data)
+                    _, elapsed = timed(llm_handler.generate_llm_response, query, kb_data)
+                latencies.append(elapsed)
+                tokens.append(llm_handler.estimate_tokens(prompt))
+            stats = percentiles(latencies)
+            print(f"{size:>8}{mode:>10}{sum(tokens) // len(tokens):>15}{stats['p50']:>10.1f}{stats['p95']:>10.1f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# benchmarks/bench_metrics.py
+"""
+Cost of the chat pipeline instrumentation: ns per counter increment, histogram
+observation and timer block (single- and multi-threaded), and the cached
+answer_query() path with the real registry vs a no-op one.
+
+    python benchmarks/bench_metrics.py --ops 200000 --threads 8
+"""
+import argparse
+import threading
+import time
+from contextlib import nullcontext
+
+from common import synthetic_kb
+
+import chat_handler
+from kb_manager import build_knowledge_base
+from metrics_manager import MetricsRegistry
+
+
+class NullRegistry:
+    def inc(self, *args, **kwargs):
+        pass
+
+    def observe(self, *args, **kwargs):
+        pass
+
+    def set_info(self, **kwargs):
+        pass
+
+    def timer(self, *args, **kwargs):
+        return nullcontext()
+
+
+def per_op_ns(fn, ops, threads):
+    per_thread = ops // threads
+
+    def work():
+        for _ in range(per_thread):
+            fn()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return (time.perf_counter() - start) / (per_thread * threads) * 1e9
+
+
+def timed_block(registry):
+    with registry.timer("chat_stage_seconds", stage="kb_search"):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ops", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    ops = {
+        "inc": lambda: registry.inc("kb_lookups_total", result="hit"),
+        "observe": lambda: registry.observe("chat_query_seconds", 0.0123, source="kb"),
+        "timer": lambda: timed_block(registry),
+    }
+    print(f"{'operation':<12}{'1 thread ns':>14}{f'{args.threads} threads ns':>16}")
+    for name, fn in ops.items():
+        print(f"{name:<12}{per_op_ns(fn, args.ops, 1):>14.0f}{per_op_ns(fn, args.ops, args.threads):>16.0f}")
+    print(f"render_prometheus: {len(registry.render_prometheus())} bytes")
+
+    kb_dict, targets = synthetic_kb(1000)
+    kb_data = build_knowledge_base(kb_dict)
+    queries = [query for query, _ in targets[:50]]
+    for query in queries:
+        chat_handler.answer_query(query, kb_data)  # fill the answer cache
+    for label, metrics in (("no-op metrics", NullRegistry()), ("instrumented", registry)):
+        chat_handler.METRICS = metrics
+        n = args.ops // 10
+        start = time.perf_counter()
+        for i in range(n):
+            chat_handler.answer_query(queries[i % len(queries)], kb_data)
+        print(f"cached answer_query, {label:<14}{(time.perf_counter() - start) / n * 1e6:>8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
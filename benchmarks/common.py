@@ -0,0 +1,108 @@
+# benchmarks/common.py
+"""Shared helpers for the benchmark scripts: synthetic KBs and latency stats."""
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+WORDS = (
+    "advanced applied basic data digital discrete electrical embedded engineering environmental "
+    "financial graph human industrial information machine management mathematical mechanical "
+    "modern network numerical object operating optical organic physical power principles "
+    "probability quantum robotic signal social software statistical structural systems technical "
+    "thermal wireless analysis algorithms biology chemistry circuits communication compilers "
+    "computing control design dynamics economics electronics ethics graphics intelligence "
+    "learning logic materials mechanics methods modelling optimization physics processing "
+    "programming security simulation statistics structures theory vision workshop"
+).split()
+ROLES = ["Professor", "Associate Professor", "Assistant Professor", "Lab Assistant", "Office Assistant"]
+VENUES = ["Seminar Hall", "247 Lab, First Floor", "Auditorium", "Library", "TBD"]
+
+
+def _name(rng, n_words=3):
+    return " ".join(rng.choice(WORDS).capitalize() for _ in range(n_words))
+
+
+def synthetic_kb(n_records, seed=0):
+    """
+    Build a KB with roughly n_records records in the same shape as kb_manager.KB_DICT:
+    semester course lists, staff lists, events, calendar entries and fees.
+    Returns (kb_dict, targets) where targets is a list of (query, expected_answer_name).
+    """
+    rng = random.Random(seed)
+    n_courses = int(n_records * 0.7)
+    n_staff = int(n_records * 0.2)
+    n_events = max(1, n_records - n_courses - n_staff - 20)
+
+    semesters = {}
+    per_sem = max(1, n_courses // 40)
+    for i in range(n_courses):
+        sem = f"SEM_{i // per_sem + 1}"
+        semesters.setdefault(sem, []).append({
+            "code": f"23XX{i:06d}",
+            "name": f"{_name(rng)} {i}",
+            "credits": rng.choice([0.5, 1, 1.5, 2, 3, 4]),
+            "marks": 100,
+        })
+
+    teaching = [{
+        "name": f"Dr.{_name(rng, 2)} {i}",
+        "role": rng.choice(ROLES),
+        "exp": f"{rng.randint(1, 30)} Years",
+        "phone": f"+91 9{rng.randint(100000000, 999999999)}",
+        "email": f"staff{i}@example.ac.in",
+    } for i in range(n_staff)]
+
+    events = [{
+        "name": f"{_name(rng, 2)} Challenge {i}",
+        "date": f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2025",
+        "venue": rng.choice(VENUES),
+        "eligibility": "Open to all",
+        "fee": "Free",
+    } for i in range(n_events)]
+
+    kb_dict = {
+        "COURSE_DETAILS": semesters,
+        "ACADEMIC_CALENDAR": {"GENERATED": {f"Event_{i}": f"{i + 1:02d}-01-2026" for i in range(17)}},
+        "FEE_STRUCTURE": {"Management_Quota": 200000, "Counseling_Quota": 77000, "Exam_Fee_Sem": 1200},
+        "STAFF_DETAILS": {"Teaching": teaching},
+        "EVENTS": {"Club": events},
+    }
+
+    courses = [c for sem in semesters.values() for c in sem]
+    targets = []
+    for course in rng.sample(courses, min(200, len(courses))):
+        targets.append((f"credits for {course['name']}", course["name"]))
+    for staff in rng.sample(teaching, min(50, len(teaching))):
+        targets.append((f"phone number of {staff['name']}", staff["name"]))
+    for event in rng.sample(events, min(50, len(events))):
+        targets.append((f"when is {event['name']}", event["name"]))
+    return kb_dict, targets
+
+
+def count_records(kb_dict):
+    """Number of leaf records (list items and scalar leaves) in a KB dict."""
+    if isinstance(kb_dict, dict) and "name" not in kb_dict:
+        return sum(count_records(v) for v in kb_dict.values())
+    if isinstance(kb_dict, list):
+        return len(kb_dict)
+    return 1
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    """Return {'p50': ..., ...} in milliseconds for a list of durations in seconds."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {f"p{p}": 0.0 for p in points}
+    return {f"p{p}": ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] * 1000 for p in points}
+
+
+def timed(fn, *args, **kwargs):
+    """Call fn and return (result, elapsed_seconds)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
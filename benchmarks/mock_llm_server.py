@@ -0,0 +1,123 @@
+# benchmarks/mock_llm_server.py
+"""
+Local stand-in for the Gemini endpoint. Responds in the same JSON shape as the
+real API after a latency that grows with prompt size, like a hosted model.
+Paths containing "stream" reply with one JSON chunk per line, /api/generate
+answers in the Ollama format instead, and --error-rate makes a share of
+requests fail with HTTP 503.
+
+    python benchmarks/mock_llm_server.py --port 8765 --base-ms 200 --per-token-ms 0.05
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _body(text, ollama):
+    return {"response": text, "done": False} if ollama else {"candidates": [{"content": text}]}
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        payload = json.loads(body or b"{}")
+        prompt = payload.get("prompt", "")
+        with server.stats_lock:
+            server.requests += 1
+            server.prompt_chars += len(prompt)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            failed = server.rng.random() < server.error_rate
+        try:
+            self._respond(payload, failed)
+        finally:
+            with server.stats_lock:
+                server.in_flight -= 1
+
+    def _respond(self, payload, failed):
+        server = self.server
+        prompt = payload.get("prompt", "")
+        ollama = self.path.endswith("/api/generate")
+        if failed:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        # ~4 characters per token, like llm_handler.estimate_tokens()
+        time.sleep(server.base_latency + server.per_token_latency * len(prompt) / 4)
+
+        answer = f"Mock answer to: {prompt[-80:]}"
+        streamed = payload.get("stream", True) if ollama else "stream" in self.path
+        if streamed:
+            self._stream(answer, ollama)
+            return
+        # A non-streamed reply is only sent once the whole answer has been generated
+        time.sleep(server.chunk_delay * -(-len(answer) // server.chunk_chars))
+        data = json.dumps(_body(answer, ollama)).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, answer, ollama):
+        """Chunked transfer of ~chunk_chars pieces, chunk_delay apart."""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        size = self.server.chunk_chars
+        for start in range(0, len(answer), size):
+            line = json.dumps(_body(answer[start:start + size], ollama)).encode() + b"\n"
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+            time.sleep(self.server.chunk_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_mock_server(port=0, base_ms=200.0, per_token_ms=0.05, error_rate=0.0,
+                      chunk_chars=16, chunk_ms=20.0, seed=0):
+    """Start the server on a background thread; returns (server, url)."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockLLMHandler)
+    server.daemon_threads = True
+    server.base_latency = base_ms / 1000
+    server.per_token_latency = per_token_ms / 1000
+    server.error_rate = error_rate
+    server.chunk_chars = chunk_chars
+    server.chunk_delay = chunk_ms / 1000
+    server.rng = random.Random(seed)
+    server.stats_lock = threading.Lock()
+    server.requests = 0
+    server.prompt_chars = 0
+    server.in_flight = 0
+    server.max_in_flight = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/generate"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--base-ms", type=float, default=200.0)
+    parser.add_argument("--per-token-ms", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--chunk-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    server, url = start_mock_server(args.port, args.base_ms, args.per_token_ms,
+                                    args.error_rate, chunk_ms=args.chunk_ms)
+    print(f"Mock LLM listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,275 @@
+# benchmarks/run_suite.py
+"""
+Reproducible benchmark suite: KB index build/load and search, the LLM path
+against the local mock server, and complaint inserts and queries at several
+table sizes. Results are written as flat JSON and can be compared against a
+stored baseline; the exit status is 1 if any metric regressed.
+
+    python benchmarks/run_suite.py --output results.json
+    python benchmarks/run_suite.py --kb-sizes 1000,1000000 --only kb
+    python benchmarks/run_suite.py --baseline baseline.json --tolerance 0.15
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from common import ROOT, percentiles, synthetic_kb, timed
+from mock_llm_server import start_mock_server
+
+import numpy as np
+
+import database_manager as dm
+import kb_manager
+import llm_handler
+from cache_manager import TTLCache
+
+SEED = 0
+SUITES = ("kb", "llm", "db")
+ISSUE_TYPES = ["Ragging", "Harassment", "Infrastructure", "Academics", "Other"]
+STATUSES = ["pending", "in progress", "resolved", "read"]
+
+
+def latency_metrics(prefix, samples):
+    """p50/p95/p99 in ms plus operations per second for a list of durations in seconds."""
+    stats = percentiles(samples)
+    metrics = {f"{prefix}.{p}_ms": round(v, 4) for p, v in stats.items()}
+    metrics[f"{prefix}.ops_per_s"] = round(len(samples) / sum(samples), 1) if sum(samples) else 0.0
+    return metrics
+
+
+def query_stream(targets, n, seed=SEED):
+    rng = random.Random(seed)
+    return [rng.choice(targets) for _ in range(n)]
+
+
+# --- KB ---
+def bench_kb(size, n_queries, tmp):
+    kb_dict, targets = synthetic_kb(size, seed=SEED)
+    prefix = f"kb.{size}"
+    index_dir = os.path.join(tmp, f"kb_index_{size}")
+
+    # Cold: build the index and write the artifact; warm: memory-map the artifact
+    kb_data, build_s = timed(kb_manager.load_knowledge_base, kb_dict, index_dir)
+    _, load_s = timed(kb_manager.load_knowledge_base, kb_dict, index_dir)
+    metrics = {
+        f"{prefix}.records": kb_data["tfidf_matrix"].shape[0],
+        f"{prefix}.build_s": round(build_s, 3),
+        f"{prefix}.artifact_load_s": round(load_s, 3),
+    }
+
+    # Peak traced allocations of an in-memory build, measured separately so tracing does not skew build_s
+    tracemalloc.start()
+    kb_manager.build_knowledge_base(kb_dict)
+    metrics[f"{prefix}.build_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+    tracemalloc.stop()
+
+    queries = query_stream(targets, n_queries)
+    for query, _ in queries[:20]:
+        kb_manager.search_knowledge_base(query, kb_data)  # warm-up
+    latencies, correct = [], 0
+    for query, expected in queries:
+        answer, elapsed = timed(kb_manager.search_knowledge_base, query, kb_data)
+        latencies.append(elapsed)
+        correct += expected in answer
+    metrics.update(latency_metrics(f"{prefix}.search", latencies))
+    metrics[f"{prefix}.search.accuracy"] = round(correct / len(queries), 4)
+
+    _, batch_s = timed(kb_manager.search_knowledge_base_batch, [q for q, _ in queries], kb_data, 1)
+    metrics[f"{prefix}.search_batch.ops_per_s"] = round(len(queries) / batch_s, 1)
+
+    # Optional dense mode: embedding cost and size, and hybrid search on the same queries
+    dense, embed_s = timed(kb_manager.build_dense_index, kb_data["corpus"])
+    hybrid = dict(kb_data, dense=dense)
+    metrics[f"{prefix}.dense_embed_s"] = round(embed_s, 3)
+    metrics[f"{prefix}.dense_mb"] = round(kb_manager.dense_index_bytes(dense) / 2**20, 2)
+    latencies, correct = [], 0
+    for query, expected in queries:
+        results, elapsed = timed(kb_manager.search_knowledge_base_ranked, query, hybrid, 1)
+        latencies.append(elapsed)
+        correct += bool(results) and expected in results[0]["answer"]
+    metrics.update(latency_metrics(f"{prefix}.hybrid_search", latencies))
+    metrics[f"{prefix}.hybrid_search.accuracy"] = round(correct / len(queries), 4)
+    return metrics
+
+
+# --- LLM ---
+def bench_llm(n_requests):
+    kb_dict, targets = synthetic_kb(1000, seed=SEED)
+    kb_data = kb_manager.build_knowledge_base(kb_dict)
+    queries = [q for q, _ in query_stream(targets, n_requests)]
+    server, url = start_mock_server(base_ms=50, per_token_ms=0.01, chunk_ms=5, seed=SEED)
+    llm_handler.GEMINI_API_URL = url
+    llm_handler.GEMINI_STREAM_URL = url.replace("generate", "streamGenerate")
+    llm_handler.LLM_BACKENDS = ["gemini"]
+    try:
+        llm_handler.build_prompt(queries[0], kb_data)  # builds the cached prompt lines
+        prompts = [timed(llm_handler.build_prompt, q, kb_data)[1] for q in queries]
+        blocking = [timed(llm_handler.generate_llm_response, q, kb_data)[1] for q in queries]
+        first_chunk = []
+        for q in queries:
+            start = time.perf_counter()
+            stream = llm_handler.stream_llm_response(q, kb_data)
+            next(stream)
+            first_chunk.append(time.perf_counter() - start)
+            for _ in stream:
+                pass
+        # Every backend down: the offline KB fallback answers
+        server.error_rate = 1.0
+        llm_handler.LLM_BACKENDS = []
+        llm_handler.get_fallback_index(kb_data)
+        fallback = [timed(llm_handler.generate_llm_response, q, kb_data)[1] for q in queries]
+    finally:
+        server.shutdown()
+    metrics = latency_metrics("llm.build_prompt", prompts)
+    metrics.update(latency_metrics("llm.generate", blocking))
+    metrics.update({f"llm.stream_first_chunk.{p}_ms": round(v, 4) for p, v in percentiles(first_chunk).items()})
+    metrics.update(latency_metrics("llm.fallback", fallback))
+    return metrics
+
+
+# --- DATABASE ---
+def complaint_rows(start, n, rng):
+    return [(f"T{start + i:010d}", f"student{rng.randrange(500)}", rng.choice(ISSUE_TYPES),
+             f"Synthetic complaint {start + i}", f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00:00")
+            for i in range(n)]
+
+
+def bench_db(sizes, n_queries, tmp):
+    rng = random.Random(SEED)
+    dm.close_connections()
+    dm.DB_NAME = os.path.join(tmp, "suite.db")
+    dm.init_db()
+    # Measure the queries themselves, not the shared read cache
+    dm.COMPLAINT_CACHE = TTLCache(maxsize=0)
+    metrics, stored = {}, 0
+    try:
+        for size in sorted(sizes):
+            prefix = f"db.{size}"
+            rows = complaint_rows(stored, size - stored, rng)
+            _, insert_s = timed(lambda: [dm.save_complaints_batch(rows[i:i + dm.BULK_BATCH_SIZE])
+                                         for i in range(0, len(rows), dm.BULK_BATCH_SIZE)])
+            stored = size
+            metrics[f"{prefix}.batch_insert.rows_per_s"] = round(len(rows) / insert_s, 1) if rows else 0.0
+            with dm.get_connection() as conn:
+                conn.executemany("UPDATE complaints SET status = ? WHERE id = ?",
+                                 [(rng.choice(STATUSES), i) for i in range(1, size + 1, 3)])
+
+            singles = [timed(dm.save_complaint, "bench", "Other", "single insert")[1] for _ in range(n_queries)]
+            stored += n_queries
+            metrics.update(latency_metrics(f"{prefix}.insert", singles))
+
+            queries = {
+                "first_page": lambda: dm.get_complaints_page(exclude_status="read"),
+                "deep_page": lambda: dm.get_complaints_page(before_id=rng.randrange(1, size)),
+                "filtered_page": lambda: dm.get_complaints_page(status="pending", issue_type=rng.choice(ISSUE_TYPES)),
+                "count_filtered": lambda: dm.count_complaints(status="resolved", issue_type=rng.choice(ISSUE_TYPES)),
+                "status_counts": dm.get_status_counts,
+                "user_complaints": lambda: dm.get_user_complaints(f"student{rng.randrange(500)}"),
+            }
+            for name, query in queries.items():
+                metrics.update(latency_metrics(f"{prefix}.{name}", [timed(query)[1] for _ in range(n_queries)]))
+    finally:
+        dm.close_connections()
+    return metrics
+
+
+# --- RESULTS ---
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "dense_dim": kb_manager.DENSE_DIM,
+    }
+
+
+def higher_is_better(name):
+    return name.endswith(("ops_per_s", "rows_per_s", "accuracy"))
+
+
+def compare(results, baseline, tolerance):
+    """Print each shared metric's change against the baseline; returns the regressed names."""
+    regressions = []
+    print(f"\n{'metric':<44}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name in sorted(set(results) & set(baseline)):
+        old, new = baseline[name], results[name]
+        if name.endswith(".records") or not old:
+            continue
+        change = (new - old) / old
+        worse = -change if higher_is_better(name) else change
+        flag = ""
+        if worse > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSED"
+        elif worse < -tolerance:
+            flag = "  improved"
+        print(f"{name:<44}{old:>12g}{new:>12g}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def parse_sizes(text):
+    return [int(float(s)) for s in text.split(",") if s.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", default=",".join(SUITES), help="comma-separated subset of kb,llm,db")
+    parser.add_argument("--kb-sizes", default="1000,10000,100000", help="KB records, up to 1000000")
+    parser.add_argument("--db-sizes", default="1000,10000,100000", help="complaint table sizes")
+    parser.add_argument("--queries", type=int, default=500, help="searches / queries per measurement")
+    parser.add_argument("--llm-requests", type=int, default=20)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="relative change counted as a regression")
+    args = parser.parse_args()
+    suites = [s for s in args.only.split(",") if s in SUITES]
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        # Imports and first-call setup would otherwise land in the first measurement
+        kb_manager.build_knowledge_base(synthetic_kb(100, seed=SEED)[0])
+        if "kb" in suites:
+            for size in parse_sizes(args.kb_sizes):
+                print(f"kb: {size} records...", file=sys.stderr)
+                results.update(bench_kb(size, args.queries, tmp))
+        if "llm" in suites:
+            print("llm: mock server...", file=sys.stderr)
+            results.update(bench_llm(args.llm_requests))
+        if "db" in suites:
+            print("db: complaints...", file=sys.stderr)
+            results.update(bench_db(parse_sizes(args.db_sizes), min(args.queries, 200), tmp))
+
+    report = {"environment": environment(), "args": vars(args), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    else:
+        print(json.dumps(report, indent=2, sort_keys=True))
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], args.tolerance)
+        print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}"
+              + (f" (baseline {baseline['environment'].get('commit')})" if regressions else ""))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
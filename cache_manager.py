@@ -0,0 +1,136 @@
+# cache_manager.py
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire ttl seconds after being set.
+    Entries can carry tags so a write can drop every entry it affects at once.
+    Keeps hit/miss/eviction counters for monitoring.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._tagged = {}        # tag -> keys of live entries carrying it
+        self._entry_tags = {}    # key -> its tags
+        self._generations = {}   # tag -> number of times it was invalidated
+        self._epoch = 0          # number of clear() calls, which invalidate every tag
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        """Return the cached value (refreshing its LRU position) or default."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None, tags=(), generation=None):
+        """
+        Store value, evicting the least recently used entries beyond maxsize.
+        If generation (from generation(tags)) is given and any of the tags has been
+        invalidated, or the cache cleared, since, the value may be stale and is not stored.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation(tags):
+                return
+            self._drop(key)
+            self._data[key] = (value, self._clock() + (self.ttl if ttl is None else ttl))
+            if tags:
+                self._entry_tags[key] = tags
+                for tag in tags:
+                    self._tagged.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def get_or_load(self, key, loader, ttl=None, tags=()):
+        """
+        Cached value for key, calling loader() on a miss. A write that invalidates one
+        of the tags, or a clear(), while loader() runs keeps the possibly stale result
+        out of the cache.
+        """
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        generation = self.generation(tags)
+        value = loader()
+        self.set(key, value, ttl, tags, generation)
+        return value
+
+    def generation(self, tags):
+        """Snapshot of the tags' invalidation counts, to pass to set()."""
+        with self._lock:
+            return self._generation(tags)
+
+    def _generation(self, tags):
+        return (self._epoch,) + tuple(self._generations.get(tag, 0) for tag in tags)
+
+    def _drop(self, key):
+        if self._data.pop(key, None) is None:
+            return
+        for tag in self._entry_tags.pop(key, ()):
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def invalidate(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def invalidate_tags(self, *tags):
+        """Drop every entry carrying any of the tags."""
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] = self._generations.get(tag, 0) + 1
+                for key in list(self._tagged.get(tag, ())):
+                    self._drop(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        """Drop every entry; loads already running will not store their results."""
+        with self._lock:
+            self._epoch += 1
+            self._data.clear()
+            self._tagged.clear()
+            self._entry_tags.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Counters plus current size and hit rate, for the admin dashboard."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
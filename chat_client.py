@@ -0,0 +1,78 @@
+# chat_client.py
+import json
+import os
+import requests
+
+# --- SETTINGS ---
+# e.g. http://localhost:8600; unset, the app answers in-process
+CHAT_SERVICE_URL = os.getenv("CHAT_SERVICE_URL", "")
+CHAT_SERVICE_TOKEN = os.getenv("CHAT_SERVICE_TOKEN", "")
+CHAT_CLIENT_CONNECT_TIMEOUT = float(os.getenv("CHAT_CLIENT_CONNECT_TIMEOUT", "3"))
+# Long enough for an LLM answer, which the service may retry across backends
+CHAT_CLIENT_READ_TIMEOUT = float(os.getenv("CHAT_CLIENT_READ_TIMEOUT", "60"))
+
+
+class ChatServiceError(Exception):
+    """The chat service refused or failed the request."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class ChatClient:
+    """
+    Thin client of chat_service.py for the Streamlit app and bots.
+    One keep-alive session per client; safe to share between threads.
+    """
+
+    def __init__(self, base_url=CHAT_SERVICE_URL, token=CHAT_SERVICE_TOKEN,
+                 timeout=(CHAT_CLIENT_CONNECT_TIMEOUT, CHAT_CLIENT_READ_TIMEOUT)):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+
+    def _request(self, method, path, payload=None, stream=False):
+        try:
+            response = self.session.request(method, self.base_url + path, json=payload,
+                                            timeout=self.timeout, stream=stream)
+        except requests.RequestException as e:
+            raise ChatServiceError(f"Chat service unreachable: {e}") from e
+        if response.status_code >= 400:
+            try:
+                message = response.json().get("error")
+            except ValueError:
+                message = None
+            raise ChatServiceError(message or f"HTTP {response.status_code}", response.status_code)
+        return response
+
+    def ask(self, query):
+        """{"answer", "source", "cached"} for a question."""
+        return self._request("POST", "/v1/chat", {"query": query}).json()
+
+    def stream(self, query, outcome=None):
+        """
+        Yield the answer in chunks as the service produces them (for st.write_stream).
+        If given, the outcome dict receives the answer's "source" once the stream ends.
+        """
+        with self._request("POST", "/v1/chat/stream", {"query": query}, stream=True) as response:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                message = json.loads(line)
+                if "error" in message:
+                    raise ChatServiceError(message["error"])
+                if "chunk" in message:
+                    yield message["chunk"]
+                if "source" in message and outcome is not None:
+                    outcome["source"] = message["source"]
+
+    def submit_complaint(self, student_name, issue_type, description):
+        """Queue a complaint; returns its ticket id."""
+        payload = {"student_name": student_name, "issue_type": issue_type, "description": description}
+        return self._request("POST", "/v1/complaints", payload).json()["ticket_id"]
+
+    def health(self):
+        return self._request("GET", "/v1/health").json()
@@ -0,0 +1,162 @@
+# chat_handler.py
+import os
+import re
+import threading
+import time
+from cache_manager import TTLCache
+from kb_manager import (
+    search_knowledge_base, search_knowledge_base_batch, search_knowledge_base_ranked, resolve_fast_path,
+    FAST_PATH_ENABLED, KB_MISS_MESSAGE
+)
+from llm_handler import generate_llm_response, stream_llm_response, FALLBACK_MISS_MESSAGE
+from metrics_manager import METRICS
+
+# Process-wide cache of final answers, shared by every Streamlit session.
+# Keys include the KB version, and a KB reload clears it.
+ANSWER_CACHE = TTLCache(
+    maxsize=int(os.getenv("ANSWER_CACHE_SIZE", "2048")),
+    ttl=float(os.getenv("ANSWER_CACHE_TTL", "600")),
+)
+
+_cache_version = None
+_cache_version_lock = threading.Lock()
+
+def normalize_query(query):
+    """'  When is MID 1?? ' -> 'when is mid 1', so trivially different questions share an entry."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+def _sync_cache_version(kb_version):
+    """Drop every cached answer as soon as a query arrives for a new KB version."""
+    global _cache_version
+    if _cache_version != kb_version:
+        with _cache_version_lock:
+            if _cache_version != kb_version:
+                ANSWER_CACHE.clear()
+                _cache_version = kb_version
+                METRICS.set_info(kb_version=kb_version)
+
+def _record_query(start, source):
+    METRICS.inc("chat_queries_total", source=source)
+    METRICS.observe("chat_query_seconds", time.perf_counter() - start, source=source)
+
+def _cached_answer(key):
+    cached = ANSWER_CACHE.get(key)
+    METRICS.inc("answer_cache_total", result="miss" if cached is None else "hit")
+    return cached
+
+def lookup_answer(query, kb_data, start):
+    """(cache key, cached result or None) for a question; a hit is recorded as answered from cache."""
+    kb_version = kb_data.get("version")
+    _sync_cache_version(kb_version)
+    key = (normalize_query(query), kb_version)
+    cached = _cached_answer(key)
+    if cached is not None:
+        _record_query(start, "cache")
+    return key, cached
+
+def store_answer(key, result, start, complete=True):
+    """
+    Cache a final {"answer", "source"} result and record the question. Dead ends, answers cut
+    short (complete=False) and offline fallback answers are not cached, so the next ask tries
+    the LLM again.
+    """
+    if complete and result["source"] != "fallback" and result["answer"] != FALLBACK_MISS_MESSAGE:
+        ANSWER_CACHE.set(key, result)
+    _record_query(start, result["source"])
+
+def _search_kb(query, kb_data):
+    """KB answer for the query, or None if the KB has none. Exact lookups skip TF-IDF scoring."""
+    if FAST_PATH_ENABLED:
+        with METRICS.timer("chat_stage_seconds", stage="fast_path"):
+            hit = resolve_fast_path(query, kb_data)
+        if hit is not None:
+            METRICS.inc("kb_lookups_total", result="fast_path")
+            return hit["answer"]
+    with METRICS.timer("chat_stage_seconds", stage="kb_search"):
+        answer = search_knowledge_base(query, kb_data, fast_path=False)
+    found = bool(answer) and answer != KB_MISS_MESSAGE
+    METRICS.inc("kb_lookups_total", result="hit" if found else "miss")
+    return answer if found else None
+
+def search_kb_batch(queries, kb_data):
+    """
+    _search_kb() for many questions at once: fast-path lookups first, then one batched
+    TF-IDF search for the rest (hybrid search per question when the KB has embeddings).
+    Returns one answer or None per question.
+    """
+    answers = [None] * len(queries)
+    rest = []
+    for i, query in enumerate(queries):
+        if FAST_PATH_ENABLED:
+            with METRICS.timer("chat_stage_seconds", stage="fast_path"):
+                hit = resolve_fast_path(query, kb_data)
+            if hit is not None:
+                METRICS.inc("kb_lookups_total", result="fast_path")
+                answers[i] = hit["answer"]
+                continue
+        rest.append(i)
+    if not rest:
+        return answers
+    with METRICS.timer("chat_stage_seconds", stage="kb_search_batch"):
+        if kb_data.get("dense") is None:
+            ranked = search_knowledge_base_batch([queries[i] for i in rest], kb_data, k=1)
+        else:
+            ranked = [search_knowledge_base_ranked(queries[i], kb_data, k=1) for i in rest]
+    for i, results in zip(rest, ranked):
+        METRICS.inc("kb_lookups_total", result="hit" if results else "miss")
+        if results:
+            answers[i] = results[0]["answer"]
+    return answers
+
+def answer_query(query, kb_data):
+    """
+    Answer a student question: KB search first, then the LLM.
+    Returns {"answer", "source", "cached"} where source is "kb", "llm" or "fallback"
+    (the offline KB fallback, when no LLM backend answered).
+    """
+    start = time.perf_counter()
+    key, cached = lookup_answer(query, kb_data, start)
+    if cached is not None:
+        return {**cached, "cached": True}
+
+    answer = _search_kb(query, kb_data)
+    if answer:
+        result = {"answer": answer, "source": "kb"}
+    else:
+        llm = {}
+        with METRICS.timer("chat_stage_seconds", stage="llm"):
+            answer = generate_llm_response(query, kb_data, llm)
+        result = {"answer": answer, "source": llm["source"]}
+    store_answer(key, result, start)
+    return {**result, "cached": False}
+
+def stream_answer(query, kb_data, outcome=None):
+    """
+    answer_query() for the chat window: yields the answer in chunks so the LLM's first
+    tokens show up immediately. Cached and KB answers arrive as a single chunk.
+    If given, the outcome dict receives the answer's "source" ("kb", "llm" or "fallback"),
+    and for LLM answers "complete": False if the backend broke off mid-answer.
+    """
+    outcome = {} if outcome is None else outcome
+    start = time.perf_counter()
+    key, cached = lookup_answer(query, kb_data, start)
+    if cached is not None:
+        outcome["source"] = cached["source"]
+        yield cached["answer"]
+        return
+
+    answer = _search_kb(query, kb_data)
+    if answer:
+        outcome["source"] = "kb"
+        store_answer(key, {"answer": answer, "source": "kb"}, start)
+        yield answer
+        return
+
+    chunks = []
+    with METRICS.timer("chat_stage_seconds", stage="llm"):
+        for chunk in stream_llm_response(query, kb_data, outcome):
+            if not chunks:
+                METRICS.observe("chat_first_chunk_seconds", time.perf_counter() - start)
+            chunks.append(chunk)
+            yield chunk
+    store_answer(key, {"answer": "".join(chunks), "source": outcome["source"]}, start, outcome["complete"])
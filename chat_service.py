@@ -0,0 +1,388 @@
+# chat_service.py
+#
+# The chat pipeline (KB -> LLM -> offline fallback) and complaint submission over HTTP/JSON,
+# so the Streamlit app, bots and load tests can ask questions without a page rerun.
+#
+#   python chat_service.py --port 8600
+#
+#   POST /v1/chat         {"query"} -> {"answer", "source", "cached"}
+#   POST /v1/chat/stream  {"query"} -> one JSON object per line: {"chunk"} ... {"done", "source"}
+#   POST /v1/complaints   {"student_name", "issue_type", "description"} -> 202 {"ticket_id"}
+#   GET  /v1/health       KB version, chat requests in flight, LLM backend circuits
+#   GET  /metrics         Prometheus text format
+import argparse
+import asyncio
+import contextlib
+import hmac
+import ipaddress
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.iostream
+import tornado.web
+
+from chat_handler import lookup_answer, store_answer, search_kb_batch
+from database_manager import ISSUE_TYPES
+from kb_manager import get_active_kb, watch_knowledge_base, KB_ROLE
+from llm_client import LLM_MAX_CONCURRENCY
+from llm_handler import generate_llm_response, stream_llm_response, llm_backend_status
+from metrics_manager import METRICS, start_metrics_exporter
+from queue_manager import submit_complaint
+
+# --- SETTINGS ---
+CHAT_SERVICE_PORT = int(os.getenv("CHAT_SERVICE_PORT", "8600"))
+# When set, every request must carry "Authorization: Bearer <token>"
+CHAT_SERVICE_TOKEN = os.getenv("CHAT_SERVICE_TOKEN", "")
+# Chat requests admitted at once; beyond this the service answers 503 with Retry-After
+CHAT_SERVICE_MAX_INFLIGHT = int(os.getenv("CHAT_SERVICE_MAX_INFLIGHT", "256"))
+CHAT_SERVICE_RETRY_AFTER = 1
+# KB searches arriving within the window are scored together, up to CHAT_BATCH_MAX at a time
+CHAT_BATCH_WINDOW_MS = float(os.getenv("CHAT_BATCH_WINDOW_MS", "2"))
+CHAT_BATCH_MAX = int(os.getenv("CHAT_BATCH_MAX", "64"))
+CHAT_MAX_QUERY_CHARS = int(os.getenv("CHAT_MAX_QUERY_CHARS", "1000"))
+
+
+# --- KB BATCHING ---
+class KBBatcher:
+    """
+    Collects KB searches from concurrent requests on the event loop and runs them as one
+    search_kb_batch() call on a single KB thread. A batch is sent when window seconds have
+    passed since its first search or it reaches max_size; searches arriving while a batch
+    is being scored simply wait for the next one, so batches grow with load.
+    """
+
+    def __init__(self, executor, window=CHAT_BATCH_WINDOW_MS / 1000, max_size=CHAT_BATCH_MAX):
+        self.executor = executor
+        self.window = window
+        self.max_size = max_size
+        self._pending = []       # (query, kb_data, future)
+        self._timer = None
+
+    async def search(self, query, kb_data):
+        """KB answer for the query, or None."""
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((query, kb_data, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch):
+        METRICS.inc("kb_batches_total")
+        METRICS.inc("kb_batched_queries_total", len(batch))
+        # A KB reload mid-window leaves searches for two versions in one batch
+        groups = {}
+        for query, kb_data, future in batch:
+            groups.setdefault(id(kb_data), (kb_data, []))[1].append((query, future))
+        loop = asyncio.get_running_loop()
+        for kb_data, entries in groups.values():
+            try:
+                answers = await loop.run_in_executor(self.executor, search_kb_batch, [q for q, _ in entries], kb_data)
+            except Exception as e:
+                for _, future in entries:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), answer in zip(entries, answers):
+                if not future.done():
+                    future.set_result(answer)
+
+
+def _generate(query, kb_data):
+    """{"answer", "source"} from generate_llm_response(); source is "llm" or "fallback"."""
+    outcome = {}
+    with METRICS.timer("chat_stage_seconds", stage="llm"):
+        answer = generate_llm_response(query, kb_data, outcome)
+    return {"answer": answer, "source": outcome["source"]}
+
+
+def _pump_stream(loop, queue, query, kb_data, outcome, stop):
+    """
+    Feed stream_llm_response() chunks from an LLM thread to the event loop; None ends the stream.
+    Setting stop (the client went away) closes the upstream stream at the next chunk.
+    """
+    chunks = stream_llm_response(query, kb_data, outcome)
+    try:
+        with METRICS.timer("chat_stage_seconds", stage="llm"):
+            for chunk in chunks:
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, chunk)
+    except Exception as e:
+        loop.call_soon_threadsafe(queue.put_nowait, e)
+    finally:
+        chunks.close()
+        loop.call_soon_threadsafe(queue.put_nowait, None)
+
+
+# --- SERVICE ---
+class ChatService:
+    """
+    The chat pipeline for async callers. KB searches are batched on one thread, LLM calls run
+    on LLM_MAX_CONCURRENCY threads (the same cap llm_client puts on upstream calls), and
+    identical questions in flight at the same time share one answer.
+    """
+
+    def __init__(self, get_kb=get_active_kb, batch_window=CHAT_BATCH_WINDOW_MS / 1000, batch_max=CHAT_BATCH_MAX,
+                 max_inflight=CHAT_SERVICE_MAX_INFLIGHT, token=CHAT_SERVICE_TOKEN):
+        self.get_kb = get_kb
+        self.max_inflight = max_inflight
+        self.token = token
+        self.inflight = 0
+        self.kb_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="chat-kb")
+        self.llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENCY, thread_name_prefix="chat-llm")
+        self.batcher = KBBatcher(self.kb_executor, batch_window, batch_max)
+        self._answering = {}     # cache key -> future of the answer being produced
+
+    async def answer(self, query):
+        """answer_query() without blocking the event loop: {"answer", "source", "cached"}."""
+        start = time.perf_counter()
+        kb_data = self.get_kb()
+        key, cached = lookup_answer(query, kb_data, start)
+        if cached is not None:
+            return {**cached, "cached": True}
+        if key in self._answering:
+            METRICS.inc("chat_coalesced_total")
+            result = await asyncio.shield(self._answering[key])
+            return {**result, "cached": True}
+
+        future = asyncio.get_running_loop().create_future()
+        self._answering[key] = future
+        try:
+            answer = await self.batcher.search(query, kb_data)
+            if answer:
+                result = {"answer": answer, "source": "kb"}
+            else:
+                result = await asyncio.get_running_loop().run_in_executor(self.llm_executor, _generate, query, kb_data)
+            store_answer(key, result, start)
+            future.set_result(result)
+            return {**result, "cached": False}
+        except Exception as e:
+            future.set_exception(e)
+            # Waiters re-raise it; this marks it as retrieved when nobody waited
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            del self._answering[key]
+
+    async def stream(self, query):
+        """stream_answer() without blocking the event loop: yields (chunk, source) pairs."""
+        start = time.perf_counter()
+        kb_data = self.get_kb()
+        key, cached = lookup_answer(query, kb_data, start)
+        if cached is not None:
+            yield cached["answer"], cached["source"]
+            return
+        answer = await self.batcher.search(query, kb_data)
+        if answer:
+            store_answer(key, {"answer": answer, "source": "kb"}, start)
+            yield answer, "kb"
+            return
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        outcome, stop = {}, threading.Event()
+        loop.run_in_executor(self.llm_executor, _pump_stream, loop, queue, query, kb_data, outcome, stop)
+        chunks = []
+        try:
+            while True:
+                chunk = await queue.get()
+                if chunk is None:
+                    break
+                if isinstance(chunk, Exception):
+                    raise chunk
+                if not chunks:
+                    METRICS.observe("chat_first_chunk_seconds", time.perf_counter() - start)
+                chunks.append(chunk)
+                # Set by the LLM thread before it queued the chunk
+                yield chunk, outcome["source"]
+        finally:
+            # Closed early by the caller or failed: stop the LLM thread reading the rest
+            stop.set()
+        store_answer(key, {"answer": "".join(chunks), "source": outcome["source"]}, start, outcome["complete"])
+
+    def shutdown(self):
+        self.kb_executor.shutdown(wait=False)
+        self.llm_executor.shutdown(wait=False)
+
+
+# --- HTTP ---
+class _ServiceHandler(tornado.web.RequestHandler):
+    admit = False            # counted against max_inflight
+
+    def initialize(self, service):
+        self.service = service
+        self._admitted = False
+
+    def prepare(self):
+        token = self.service.token
+        if token and not hmac.compare_digest(self.request.headers.get("Authorization", ""), f"Bearer {token}"):
+            raise tornado.web.HTTPError(401, reason="Missing or invalid token")
+        if self.admit:
+            if self.service.inflight >= self.service.max_inflight:
+                METRICS.inc("chat_rejected_total")
+                self.set_header("Retry-After", str(CHAT_SERVICE_RETRY_AFTER))
+                raise tornado.web.HTTPError(503, reason="Too many requests in flight")
+            self.service.inflight += 1
+            self._admitted = True
+
+    def on_finish(self):
+        if self._admitted:
+            self.service.inflight -= 1
+            self._admitted = False
+
+    def on_connection_close(self):
+        self.on_finish()
+
+    def write_error(self, status_code, **kwargs):
+        self.finish({"error": self._reason})
+
+    def json_body(self):
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="Body is not valid JSON")
+        if not isinstance(body, dict):
+            raise tornado.web.HTTPError(400, reason="Body must be a JSON object")
+        return body
+
+    def query_arg(self):
+        query = self.json_body().get("query")
+        if not isinstance(query, str) or not query.strip():
+            raise tornado.web.HTTPError(400, reason="query is required")
+        if len(query) > CHAT_MAX_QUERY_CHARS:
+            raise tornado.web.HTTPError(400, reason=f"query is longer than {CHAT_MAX_QUERY_CHARS} characters")
+        return query
+
+
+class ChatHandler(_ServiceHandler):
+    admit = True
+
+    async def post(self):
+        self.write(await self.service.answer(self.query_arg()))
+
+
+class ChatStreamHandler(_ServiceHandler):
+    admit = True
+
+    async def post(self):
+        query = self.query_arg()
+        self.set_header("Content-Type", "application/x-ndjson")
+        source = None
+        try:
+            # aclosing: a client that disconnects mid-answer also stops the LLM call behind it
+            async with contextlib.aclosing(self.service.stream(query)) as chunks:
+                async for chunk, source in chunks:
+                    self.write(json.dumps({"chunk": chunk}) + "\n")
+                    await self.flush()
+        except tornado.iostream.StreamClosedError:
+            return
+        except Exception as e:
+            # Headers are out; report the failure in-band
+            print(f"[CHAT SERVICE ERROR] stream failed: {e}")
+            self.write(json.dumps({"error": "Answer failed"}) + "\n")
+            return
+        self.write(json.dumps({"done": True, "source": source}) + "\n")
+
+
+class ComplaintHandler(_ServiceHandler):
+    async def post(self):
+        body = self.json_body()
+        description = body.get("description")
+        issue_type = body.get("issue_type")
+        if not isinstance(description, str) or not description.strip():
+            raise tornado.web.HTTPError(400, reason="description is required")
+        if issue_type not in ISSUE_TYPES:
+            raise tornado.web.HTTPError(400, reason=f"issue_type must be one of {', '.join(ISSUE_TYPES)}")
+        student_name = body.get("student_name") or ""
+        if not isinstance(student_name, str):
+            raise tornado.web.HTTPError(400, reason="student_name must be a string")
+        ticket_id = await asyncio.get_running_loop().run_in_executor(
+            None, submit_complaint, student_name, issue_type, description)
+        self.set_status(202)
+        self.write({"ticket_id": ticket_id})
+
+
+class HealthHandler(_ServiceHandler):
+    def get(self):
+        self.write({
+            "status": "ok",
+            "kb_version": self.service.get_kb().get("version"),
+            "inflight": self.service.inflight,
+            "llm_backends": llm_backend_status(),
+        })
+
+
+class MetricsHandler(_ServiceHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(METRICS.render_prometheus())
+
+
+def make_app(service):
+    args = {"service": service}
+    return tornado.web.Application([
+        (r"/v1/chat", ChatHandler, args),
+        (r"/v1/chat/stream", ChatStreamHandler, args),
+        (r"/v1/complaints", ComplaintHandler, args),
+        (r"/v1/health", HealthHandler, args),
+        (r"/metrics", MetricsHandler, args),
+    ])
+
+
+def _is_loopback(address):
+    if address == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(address).is_loopback
+    except ValueError:
+        return False
+
+
+async def serve(service, port=CHAT_SERVICE_PORT, address="127.0.0.1"):
+    """Serve until cancelled."""
+    server = make_app(service).listen(port, address=address, xheaders=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        server.stop()
+        service.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the chat pipeline over HTTP/JSON.")
+    parser.add_argument("--port", type=int, default=CHAT_SERVICE_PORT)
+    parser.add_argument("--address", default="127.0.0.1",
+                        help='interface to bind (default: loopback only; "" for all)')
+    args = parser.parse_args()
+    if not _is_loopback(args.address) and not CHAT_SERVICE_TOKEN:
+        parser.error("set CHAT_SERVICE_TOKEN to serve on a non-loopback address")
+
+    # Same KB setup as the Streamlit app: builders watch kb/, workers follow the published index
+    get_active_kb()
+    if KB_ROLE != "worker":
+        watch_knowledge_base()
+    start_metrics_exporter()
+    print(f"Chat service listening on {args.address or '*'}:{args.port}")
+    try:
+        asyncio.run(serve(ChatService(), args.port, args.address))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
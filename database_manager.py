@@ -1,17 +1,206 @@
 # database_manager.py
 
+import argparse
+import csv
+import os
 import sqlite3
+import sys
+import threading
+import time
+import weakref
+from collections import Counter
+from itertools import islice
 import bcrypt
+from cache_manager import TTLCache
 
 DB_NAME = "helpdesk.db"
 
-def init_db():
-    """Initialize database and create required tables if they don't exist."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+# Applied to every pooled connection. WAL lets readers run alongside the single
+# writer instead of blocking on the rollback journal.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-8000",
+)
+
+# sqlite3 keeps compiled statements per connection keyed by SQL text, so every
+# query below is a module constant and reused as a prepared statement.
+STATEMENT_CACHE_SIZE = 128
+
+# Connections finished threads handed back, kept for the next thread (e.g. the next
+# Streamlit rerun) instead of reopening the file and rebuilding its page cache
+POOL_MAX_IDLE = int(os.getenv("DB_POOL_MAX_IDLE", "8"))
+
+_local = threading.local()
+_pool_lock = threading.Lock()
+_pool = set()      # every connection the pool owns, leased or idle
+_idle = []         # (db_name, conn) not leased by any thread
+
+# Process-wide cache of complaint reads shared by every session. Writes made through
+# this module invalidate the affected entries; the TTL bounds how long a write made by
+# another process can go unseen.
+COMPLAINT_CACHE = TTLCache(
+    maxsize=int(os.getenv("COMPLAINT_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("COMPLAINT_CACHE_TTL", "30")),
+)
+TAG_ALL_COMPLAINTS = "complaints"
+
+# Short-lived cache of user rows for logins; register_user() invalidates its entry
+USER_CACHE = TTLCache(
+    maxsize=int(os.getenv("USER_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("USER_CACHE_TTL", "60")),
+)
+
+# bcrypt work factor for new password hashes; existing hashes keep the cost they were made with
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# --- CONNECTION MANAGEMENT ---
+
+class _Lease:
+    """
+    A thread's hold on a pooled connection, kept in thread-local storage. When the thread
+    ends its thread-local storage is dropped, and the finalizer hands the connection back.
+    """
+
+    def __init__(self, conn, db_name):
+        self.conn = conn
+        self.db_name = db_name
+        weakref.finalize(self, _release, conn, db_name)
+
+def _release(conn, db_name):
+    """Return a connection whose thread is done to the idle list, or close it."""
+    if conn.in_transaction:
+        conn.rollback()
+    with _pool_lock:
+        if conn in _pool and db_name == DB_NAME and len(_idle) < POOL_MAX_IDLE:
+            _idle.append((db_name, conn))
+            return
+        _pool.discard(conn)
+    conn.close()
+
+def _open_connection():
+    # Not tied to the opening thread: an idle connection is reused by the next thread.
+    # A lease still keeps each connection to one thread at a time.
+    conn = sqlite3.connect(DB_NAME, cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_connection():
+    """Return this thread's pooled connection, taking an idle one or opening one on first use."""
+    lease = getattr(_local, "lease", None)
+    if lease is not None and lease.db_name == DB_NAME:
+        return lease.conn
+
+    conn, stale = None, []
+    with _pool_lock:
+        while _idle and conn is None:
+            db_name, idle = _idle.pop()
+            if db_name == DB_NAME:
+                conn = idle
+            else:
+                _pool.discard(idle)
+                stale.append(idle)
+    for idle in stale:
+        idle.close()
+    if conn is None:
+        conn = _open_connection()
+        with _pool_lock:
+            _pool.add(conn)
+    # Replacing a lease for another DB_NAME releases (and closes) the old connection
+    _local.lease = _Lease(conn, DB_NAME)
+    return conn
 
-    # Users table
-    cursor.execute("""
+def close_connections():
+    """
+    Close the idle connections and this thread's (e.g. before switching DB_NAME or deleting
+    the file). Connections other threads are using are disowned and closed when those threads end.
+    """
+    with _pool_lock:
+        idle = [conn for _, conn in _idle]
+        _idle.clear()
+        _pool.clear()
+    for conn in idle:
+        conn.close()
+    _local.__dict__.clear()
+    # Cached reads may belong to the database being switched away from
+    COMPLAINT_CACHE.clear()
+    USER_CACHE.clear()
+
+# --- SQL ---
+
+SQL_INSERT_USER = "INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, ?, ?)"
+SQL_GET_USER = "SELECT username, email, password_hash, role FROM users WHERE username = ?"
+SQL_INSERT_COMPLAINT = (
+    "INSERT INTO complaints (student_name, issue_type, description, status, created_at, updated_at) "
+    "VALUES (?, ?, ?, 'pending', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+)
+SQL_ALL_COMPLAINTS = "SELECT * FROM complaints ORDER BY id DESC"
+SQL_USER_COMPLAINTS = "SELECT * FROM complaints WHERE student_name = ? ORDER BY id DESC"
+SQL_USER_COMPLAINTS_BY_STATUS = "SELECT * FROM complaints WHERE student_name = ? AND status = ? ORDER BY id DESC"
+SQL_UPDATE_COMPLAINT = "UPDATE complaints SET status = ?, admin_response = ? WHERE id = ?"
+SQL_COMPLAINT_OWNER = "SELECT student_name FROM complaints WHERE id = ?"
+SQL_IMPORT_COMPLAINT = (
+    "INSERT OR IGNORE INTO complaints "
+    "(student_name, issue_type, description, status, admin_response, created_at, updated_at, ticket_id) "
+    "VALUES (?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), COALESCE(?, ?, CURRENT_TIMESTAMP), ?)"
+)
+# Replaying a ticket that is already stored is a no-op, so queued writes can be retried safely
+SQL_INSERT_TICKETED_COMPLAINT = (
+    "INSERT OR IGNORE INTO complaints (ticket_id, student_name, issue_type, description, status, created_at, updated_at) "
+    "VALUES (?, ?, ?, ?, 'pending', ?, ?)"
+)
+SQL_COMPLAINT_BY_TICKET = "SELECT * FROM complaints WHERE ticket_id = ?"
+
+SQL_STATUS_COUNTS = "SELECT status, count FROM complaint_status_counts"
+
+SQL_INSERT_CHAT_MESSAGE = (
+    "INSERT INTO chat_messages (username, role, content, source, created_at) VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)"
+)
+SQL_LAST_CHAT_MESSAGE_ID = "SELECT MAX(id) FROM chat_messages WHERE username = ?"
+
+SQL_TOP_UNANSWERED = (
+    "SELECT query, count, last_asked_at FROM chat_unanswered_queries WHERE count > 0 ORDER BY count DESC LIMIT ?"
+)
+SQL_INSERT_COMPLAINT_ROLLUP = "INSERT INTO complaint_daily_counts (day, issue_type, status, count) VALUES (?, ?, ?, ?)"
+SQL_INSERT_CHAT_OUTCOME_ROLLUP = "INSERT INTO chat_daily_outcomes (day, source, count) VALUES (?, ?, ?)"
+SQL_INSERT_UNANSWERED_ROLLUP = "INSERT INTO chat_unanswered_queries (query, count, last_asked_at) VALUES (?, ?, ?)"
+
+DEFAULT_PAGE_SIZE = 20
+DEFAULT_CHAT_PAGE_SIZE = 20
+
+COMPLAINT_COLUMNS = ("id", "student_name", "issue_type", "description", "status",
+                     "admin_response", "created_at", "updated_at", "ticket_id")
+COMPLAINT_STATUSES = ("pending", "in progress", "resolved", "read")
+ISSUE_TYPES = ("Ragging", "Harassment", "Infrastructure", "Academics", "Other")
+# Where a chat answer came from, stored with each assistant message
+CHAT_SOURCES = ("kb", "llm", "fallback", "unanswered")
+# Dead-end replies (llm_handler.FALLBACK_MISS_MESSAGE, kb_manager.KB_MISS_MESSAGE and the app's
+# error reply), used to classify chats logged before answer sources were stored
+UNANSWERED_REPLIES = (
+    "Sorry, I could not find an answer in the knowledge base.",
+    "I'm still learning about the college.",
+    "Sorry, I could not find an answer.",
+)
+# Rows per fetchmany()/executemany() batch in bulk operations; memory stays at one batch
+BULK_BATCH_SIZE = 1000
+# SQLite's default limit on host parameters is 999 in older builds
+OWNER_LOOKUP_CHUNK = 500
+
+# --- SCHEMA MIGRATIONS ---
+# Each migration upgrades the schema by exactly one version and PRAGMA user_version
+# records the last one applied. Shipped migrations must never be edited: append a
+# new one instead. Migrations only add tables, columns, indexes and triggers, so
+# running them on a populated database keeps every existing row.
+
+def _column_names(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+def _migration_1_base_tables(conn):
+    """Original users/complaints schema (a no-op on databases that already have it)."""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             username TEXT UNIQUE,
@@ -20,9 +209,7 @@ def init_db():
             role TEXT CHECK(role IN ('student', 'admin'))
         )
     """)
-
-    # Complaints table
-    cursor.execute("""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS complaints (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             student_name TEXT,
@@ -33,90 +220,673 @@ def init_db():
         )
     """)
 
-    conn.commit()
-    conn.close()
+def _migration_2_timestamps(conn):
+    """Indexed created_at/updated_at columns plus the dashboard indexes."""
+    columns = _column_names(conn, "complaints")
+    # Rows filed before this migration have no known filing time and keep NULL
+    if "created_at" not in columns:
+        conn.execute("ALTER TABLE complaints ADD COLUMN created_at TEXT")
+    if "updated_at" not in columns:
+        conn.execute("ALTER TABLE complaints ADD COLUMN updated_at TEXT")
+    conn.execute("UPDATE complaints SET updated_at = created_at WHERE updated_at IS NULL")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_complaints_status_id ON complaints(status, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_complaints_student_status ON complaints(student_name, status)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_complaints_created_at ON complaints(created_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_complaints_updated_at ON complaints(updated_at)")
+
+    # Every writer gets updated_at maintained, not just update_complaint_status()
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_complaints_touch
+        AFTER UPDATE ON complaints
+        WHEN NEW.updated_at IS OLD.updated_at
+        BEGIN
+            UPDATE complaints SET updated_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+        END
+    """)
+
+def _migration_3_status_counts(conn):
+    """Per-status summary table kept current by triggers, so metrics never scan complaints."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS complaint_status_counts (
+            status TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("DELETE FROM complaint_status_counts")
+    conn.execute("""
+        INSERT INTO complaint_status_counts (status, count)
+        SELECT status, COUNT(*) FROM complaints WHERE status IS NOT NULL GROUP BY status
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_complaints_count_insert
+        AFTER INSERT ON complaints
+        BEGIN
+            INSERT INTO complaint_status_counts (status, count) VALUES (NEW.status, 1)
+            ON CONFLICT(status) DO UPDATE SET count = count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_complaints_count_update
+        AFTER UPDATE OF status ON complaints
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+            UPDATE complaint_status_counts SET count = count - 1 WHERE status = OLD.status;
+            INSERT INTO complaint_status_counts (status, count) VALUES (NEW.status, 1)
+            ON CONFLICT(status) DO UPDATE SET count = count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_complaints_count_delete
+        AFTER DELETE ON complaints
+        BEGIN
+            UPDATE complaint_status_counts SET count = count - 1 WHERE status = OLD.status;
+        END
+    """)
+
+def _migration_4_chat_messages(conn):
+    """Append-only chat log, read newest-first one page at a time per user."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS chat_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            role TEXT NOT NULL CHECK(role IN ('user', 'assistant')),
+            content TEXT NOT NULL,
+            created_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_messages_username_id ON chat_messages(username, id)")
+
+def _migration_5_ticket_ids(conn):
+    """Client-generated ticket ids, so a queued complaint is stored at most once however often it is replayed."""
+    if "ticket_id" not in _column_names(conn, "complaints"):
+        conn.execute("ALTER TABLE complaints ADD COLUMN ticket_id TEXT")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_complaints_ticket_id ON complaints(ticket_id)")
+
+def _migration_6_rollups(conn):
+    """
+    Trigger-maintained rollups for the analytics dashboard: complaints per day, issue type and
+    status; chat answers per day and source; and unanswered questions by how often they are asked.
+    """
+    if "source" not in _column_names(conn, "chat_messages"):
+        conn.execute("ALTER TABLE chat_messages ADD COLUMN source TEXT")
+    # Complaints filed before created_at existed, and chats without a source, count as 'unknown'
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS complaint_daily_counts (
+            day TEXT NOT NULL,
+            issue_type TEXT NOT NULL,
+            status TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, issue_type, status)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS chat_daily_outcomes (
+            day TEXT NOT NULL,
+            source TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, source)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS chat_unanswered_queries (
+            query TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0,
+            last_asked_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_unanswered_count ON chat_unanswered_queries(count)")
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_complaints_rollup_insert
+        AFTER INSERT ON complaints
+        BEGIN
+            INSERT INTO complaint_daily_counts (day, issue_type, status, count)
+            VALUES (COALESCE(date(NEW.created_at), 'unknown'), COALESCE(NEW.issue_type, ''), COALESCE(NEW.status, ''), 1)
+            ON CONFLICT(day, issue_type, status) DO UPDATE SET count = count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_complaints_rollup_update
+        AFTER UPDATE OF status, issue_type, created_at ON complaints
+        WHEN OLD.status IS NOT NEW.status OR OLD.issue_type IS NOT NEW.issue_type
+            OR date(OLD.created_at) IS NOT date(NEW.created_at)
+        BEGIN
+            UPDATE complaint_daily_counts SET count = count - 1
+            WHERE day = COALESCE(date(OLD.created_at), 'unknown') AND issue_type = COALESCE(OLD.issue_type, '')
+                AND status = COALESCE(OLD.status, '');
+            INSERT INTO complaint_daily_counts (day, issue_type, status, count)
+            VALUES (COALESCE(date(NEW.created_at), 'unknown'), COALESCE(NEW.issue_type, ''), COALESCE(NEW.status, ''), 1)
+            ON CONFLICT(day, issue_type, status) DO UPDATE SET count = count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_complaints_rollup_delete
+        AFTER DELETE ON complaints
+        BEGIN
+            UPDATE complaint_daily_counts SET count = count - 1
+            WHERE day = COALESCE(date(OLD.created_at), 'unknown') AND issue_type = COALESCE(OLD.issue_type, '')
+                AND status = COALESCE(OLD.status, '');
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_chat_rollup_outcome
+        AFTER INSERT ON chat_messages
+        WHEN NEW.role = 'assistant'
+        BEGIN
+            INSERT INTO chat_daily_outcomes (day, source, count)
+            VALUES (COALESCE(date(NEW.created_at), 'unknown'), COALESCE(NEW.source, 'unknown'), 1)
+            ON CONFLICT(day, source) DO UPDATE SET count = count + 1;
+        END
+    """)
+    # The question is the user's message just before the answer (append_chat_messages stores both at once)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_chat_rollup_unanswered
+        AFTER INSERT ON chat_messages
+        WHEN NEW.role = 'assistant' AND NEW.source = 'unanswered'
+        BEGIN
+            INSERT INTO chat_unanswered_queries (query, count, last_asked_at)
+            SELECT lower(trim(content)), 1, NEW.created_at FROM chat_messages
+            WHERE id = (SELECT MAX(id) FROM chat_messages WHERE username = NEW.username AND id < NEW.id)
+                AND role = 'user'
+            ON CONFLICT(query) DO UPDATE SET count = count + 1, last_asked_at = excluded.last_asked_at;
+        END
+    """)
+    _backfill_rollups(conn)
+
+MIGRATIONS = [
+    (1, _migration_1_base_tables),
+    (2, _migration_2_timestamps),
+    (3, _migration_3_status_counts),
+    (4, _migration_4_chat_messages),
+    (5, _migration_5_ticket_ids),
+    (6, _migration_6_rollups),
+]
+
+def get_schema_version(conn=None):
+    """Return the last migration version applied to the database."""
+    conn = conn or get_connection()
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate():
+    """Apply pending migrations in order, each in its own transaction."""
+    conn = get_connection()
+    for version, migration in MIGRATIONS:
+        if get_schema_version(conn) >= version:
+            continue
+        # IMMEDIATE takes the write lock up front, so two processes starting at
+        # once cannot both apply the same migration.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if get_schema_version(conn) < version:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return get_schema_version(conn)
+
+def init_db():
+    """Initialize database and bring its schema up to the latest version."""
+    migrate()
 
 # --- USER FUNCTIONS ---
 
 def register_user(username, email, password, role="student"):
     """Register a new user. Returns True if success, False if user/email exists."""
+    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode('utf-8')
     try:
-        conn = sqlite3.connect(DB_NAME)
-        cursor = conn.cursor()
-        password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-        cursor.execute("INSERT INTO users (username, email, password_hash, role) VALUES (?, ?, ?, ?)",
-                       (username, email, password_hash, role))
-        conn.commit()
+        with get_connection() as conn:
+            conn.execute(SQL_INSERT_USER, (username, email, password_hash, role))
         return True
     except sqlite3.IntegrityError:
         return False
     finally:
-        conn.close()
+        # A failed login may have cached "no such user"
+        USER_CACHE.invalidate_tags(f"user:{username}")
 
 def get_user(username):
-    """Fetch a user by username."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT username, email, password_hash, role FROM users WHERE username = ?", (username,))
-    row = cursor.fetchone()
-    conn.close()
-    if row:
-        return {
-            "username": row[0],
-            "email": row[1],
-            "password_hash": row[2],
-            "role": row[3]
-        }
-    return None
+    """Fetch a user by username (cached for USER_CACHE_TTL seconds)."""
+    def load():
+        row = get_connection().execute(SQL_GET_USER, (username,)).fetchone()
+        if row:
+            return {
+                "username": row[0],
+                "email": row[1],
+                "password_hash": row[2],
+                "role": row[3]
+            }
+        return None
+    user = USER_CACHE.get_or_load(username, load, tags=(f"user:{username}",))
+    return dict(user) if user else None
+
+# --- COMPLAINT CACHE ---
+# Admin and aggregate reads are tagged TAG_ALL_COMPLAINTS and per-student reads only with
+# the student, so a write refetches the admin views and that student's views; every other
+# student keeps their cached complaints.
+
+def _user_tag(username):
+    return f"complaints:user:{username}"
+
+def _cached(key, loader, tags=(TAG_ALL_COMPLAINTS,)):
+    return COMPLAINT_CACHE.get_or_load(key, loader, tags=tags)
+
+def invalidate_complaint_cache(*usernames):
+    """Drop cached complaint reads after a write: admin views plus the given students'."""
+    COMPLAINT_CACHE.invalidate_tags(TAG_ALL_COMPLAINTS, *(_user_tag(u) for u in usernames))
 
 # --- COMPLAINT FUNCTIONS ---
 
 def save_complaint(student_name, issue_type, description):
     """Save a new complaint into the database."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO complaints (student_name, issue_type, description, status) VALUES (?, ?, ?, 'pending')",
-        (student_name, issue_type, description)
-    )
-    conn.commit()
-    conn.close()
+    with get_connection() as conn:
+        conn.execute(SQL_INSERT_COMPLAINT, (student_name, issue_type, description))
+    invalidate_complaint_cache(student_name)
+
+def save_complaints_batch(complaints):
+    """
+    Store queued complaints, given as (ticket_id, student_name, issue_type, description, created_at)
+    tuples, with one executemany in a single transaction. Tickets already stored are skipped.
+    Returns the number of new rows.
+    """
+    rows = [(ticket, name, issue, description, created_at, created_at)
+            for ticket, name, issue, description, created_at in complaints]
+    with get_connection() as conn:
+        inserted = conn.executemany(SQL_INSERT_TICKETED_COMPLAINT, rows).rowcount
+    invalidate_complaint_cache(*{row[1] for row in rows})
+    return inserted
+
+def get_complaint_by_ticket(ticket_id):
+    """Fetch a complaint by the ticket id its submitter was given, or None if not stored yet."""
+    return get_connection().execute(SQL_COMPLAINT_BY_TICKET, (ticket_id,)).fetchone()
 
 def get_complaints():
     """Fetch all complaints from the database."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM complaints ORDER BY id DESC")
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+    return _cached(("all",), lambda: get_connection().execute(SQL_ALL_COMPLAINTS).fetchall())
 
 
 
 def get_user_complaints(username, status=None):
     """Fetch complaints of a specific student, optionally filtered by status."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
+    def load():
+        conn = get_connection()
+        if status:
+            return conn.execute(SQL_USER_COMPLAINTS_BY_STATUS, (username, status)).fetchall()
+        return conn.execute(SQL_USER_COMPLAINTS, (username,)).fetchall()
+    return _cached(("user", username, status), load, tags=(_user_tag(username),))
+
+def _complaint_filters(status=None, issue_type=None, since=None, until=None, exclude_status=None):
+    """Build the WHERE clause shared by the paginated and COUNT queries."""
+    clauses, params = [], []
     if status:
-        cursor.execute("SELECT * FROM complaints WHERE student_name = ? AND status = ? ORDER BY id DESC",
-                       (username, status))
-    else:
-        cursor.execute("SELECT * FROM complaints WHERE student_name = ? ORDER BY id DESC", (username,))
-    rows = cursor.fetchall()
-    conn.close()
-    return rows
+        clauses.append("status = ?")
+        params.append(status)
+    if exclude_status:
+        clauses.append("status != ?")
+        params.append(exclude_status)
+    if issue_type:
+        clauses.append("issue_type = ?")
+        params.append(issue_type)
+    if since:
+        clauses.append("created_at >= ?")
+        params.append(str(since))
+    if until:
+        # until is an inclusive day, created_at a 'YYYY-MM-DD HH:MM:SS' timestamp
+        clauses.append("created_at < date(?, '+1 day')")
+        params.append(str(until))
+    return clauses, params
+
+def get_complaints_page(status=None, issue_type=None, since=None, until=None,
+                        exclude_status=None, before_id=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    Fetch one page of complaints, newest first, using keyset pagination.
+    Pass the id of the last row of the previous page as before_id for the next page.
+    """
+    clauses, params = _complaint_filters(status, issue_type, since, until, exclude_status)
+    if before_id is not None:
+        clauses.append("id < ?")
+        params.append(before_id)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    params.append(limit)
+    return _cached(("page", where, tuple(params)), lambda: get_connection().execute(
+        f"SELECT * FROM complaints{where} ORDER BY id DESC LIMIT ?", params
+    ).fetchall())
+
+def count_complaints(status=None, issue_type=None, since=None, until=None, exclude_status=None):
+    """Count complaints matching the same filters as get_complaints_page()."""
+    clauses, params = _complaint_filters(status, issue_type, since, until, exclude_status)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    return _cached(("count", where, tuple(params)), lambda: get_connection().execute(
+        f"SELECT COUNT(*) FROM complaints{where}", params
+    ).fetchone()[0])
+
+def get_status_counts():
+    """Return {status: count} from the trigger-maintained summary table."""
+    return dict(_cached(("status_counts",), lambda: get_connection().execute(SQL_STATUS_COUNTS).fetchall()))
 
 def update_complaint_status(complaint_id, status, admin_response=""):
     """Update complaint status and add admin response."""
-    conn = sqlite3.connect(DB_NAME)
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE complaints SET status = ?, admin_response = ? WHERE id = ?",
-        (status, admin_response, complaint_id)
+    with get_connection() as conn:
+        owner = conn.execute(SQL_COMPLAINT_OWNER, (complaint_id,)).fetchone()
+        conn.execute(SQL_UPDATE_COMPLAINT, (status, admin_response, complaint_id))
+    invalidate_complaint_cache(*(owner or ()))
+# --- BULK OPERATIONS ---
+
+def update_complaint_statuses(updates):
+    """
+    Apply many (complaint_id, status, admin_response) updates with one executemany in a
+    single transaction. updates may be any iterable, including a generator.
+    Returns the number of complaints updated.
+    """
+    owners = set()
+    updated = 0
+    updates = iter(updates)
+    with get_connection() as conn:
+        for batch in iter(lambda: list(islice(updates, BULK_BATCH_SIZE)), []):
+            for _, status, _ in batch:
+                if status not in COMPLAINT_STATUSES:
+                    raise ValueError(f"Unknown complaint status: {status!r}")
+            ids = [complaint_id for complaint_id, _, _ in batch]
+            for start in range(0, len(ids), OWNER_LOOKUP_CHUNK):
+                chunk = ids[start:start + OWNER_LOOKUP_CHUNK]
+                owners.update(row[0] for row in conn.execute(
+                    f"SELECT DISTINCT student_name FROM complaints WHERE id IN ({','.join('?' * len(chunk))})", chunk))
+            cursor = conn.executemany(SQL_UPDATE_COMPLAINT,
+                                      [(status, response, complaint_id) for complaint_id, status, response in batch])
+            updated += cursor.rowcount
+    invalidate_complaint_cache(*owners)
+    return updated
+
+def update_matching_complaints(new_status, admin_response="", status=None, issue_type=None,
+                               since=None, until=None, exclude_status=None):
+    """Set status/response on every complaint matching the get_complaints_page() filters in one statement."""
+    if new_status not in COMPLAINT_STATUSES:
+        raise ValueError(f"Unknown complaint status: {new_status!r}")
+    clauses, params = _complaint_filters(status, issue_type, since, until, exclude_status)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    with get_connection() as conn:
+        owners = [row[0] for row in conn.execute(f"SELECT DISTINCT student_name FROM complaints{where}", params)]
+        updated = conn.execute(
+            f"UPDATE complaints SET status = ?, admin_response = ?{where}", [new_status, admin_response] + params
+        ).rowcount
+    invalidate_complaint_cache(*owners)
+    return updated
+
+def iter_complaints(batch_size=BULK_BATCH_SIZE, **filters):
+    """Yield lists of up to batch_size complaint rows, oldest first, reading the table with fetchmany()."""
+    clauses, params = _complaint_filters(**filters)
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    # A private cursor, so callers can keep using the pooled connection meanwhile
+    cursor = get_connection().execute(f"SELECT {', '.join(COMPLAINT_COLUMNS)} FROM complaints{where} ORDER BY id", params)
+    try:
+        for batch in iter(lambda: cursor.fetchmany(batch_size), []):
+            yield batch
+    finally:
+        cursor.close()
+
+def export_complaints_csv(out, **filters):
+    """Stream complaints to a CSV path or text file object. Returns the number of rows written."""
+    handle = open(out, "w", newline="", encoding="utf-8") if isinstance(out, (str, os.PathLike)) else out
+    try:
+        writer = csv.writer(handle)
+        writer.writerow(COMPLAINT_COLUMNS)
+        written = 0
+        for batch in iter_complaints(**filters):
+            writer.writerows(batch)
+            written += len(batch)
+        return written
+    finally:
+        if handle is not out:
+            handle.close()
+
+def export_complaints_parquet(out, **filters):
+    """Stream complaints to a Parquet path or binary file object, one row group per batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([("id", pa.int64())] + [(name, pa.string()) for name in COMPLAINT_COLUMNS[1:]])
+    written = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for batch in iter_complaints(**filters):
+            columns = list(zip(*batch))
+            writer.write_batch(pa.record_batch(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema))
+            written += len(batch)
+    return written
+
+def _import_row(record, line):
+    description = (record.get("description") or "").strip()
+    if not description:
+        raise ValueError(f"Record {line}: description is required")
+    status = record.get("status") or "pending"
+    if status not in COMPLAINT_STATUSES:
+        raise ValueError(f"Record {line}: unknown status {status!r}")
+    created_at = record.get("created_at") or None
+    return (record.get("student_name") or "", record.get("issue_type") or "Other", description, status,
+            record.get("admin_response") or "", created_at, record.get("updated_at") or None, created_at,
+            record.get("ticket_id") or None)
+
+def import_complaints(records):
+    """
+    Insert legacy complaint records (dicts with COMPLAINT_COLUMNS keys; id is ignored) in one
+    transaction, BULK_BATCH_SIZE rows per executemany. Missing timestamps default to now, and
+    records whose ticket_id is already stored are skipped, so re-importing an export is harmless.
+    Any invalid record rolls back the whole import. Returns the number of rows imported.
+    """
+    students = set()
+    imported = 0
+    records = enumerate(records, 1)
+    with get_connection() as conn:
+        for batch in iter(lambda: list(islice(records, BULK_BATCH_SIZE)), []):
+            rows = [_import_row(record, line) for line, record in batch]
+            imported += conn.executemany(SQL_IMPORT_COMPLAINT, rows).rowcount
+            students.update(row[0] for row in rows)
+    invalidate_complaint_cache(*students)
+    return imported
+
+def read_complaint_records(source, file_format=None):
+    """Yield complaint dicts from a CSV or Parquet path/file object without loading it whole."""
+    name = getattr(source, "name", source)
+    file_format = file_format or ("parquet" if str(name).lower().endswith(".parquet") else "csv")
+    if file_format == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=BULK_BATCH_SIZE):
+            yield from batch.to_pylist()
+        return
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, newline="", encoding="utf-8") as handle:
+            yield from csv.DictReader(handle)
+    else:
+        yield from csv.DictReader(source)
+
+def parse_id_list(text):
+    """Yield complaint ids from text like "12, 15-20 31" (ranges are inclusive)."""
+    for part in text.replace(",", " ").split():
+        low, _, high = part.partition("-")
+        if high:
+            yield from range(int(low), int(high) + 1)
+        else:
+            yield int(low)
+
+# --- CHAT HISTORY FUNCTIONS ---
+
+def append_chat_messages(username, messages):
+    """
+    Append [{"role", "content"}, ...] for a user in one transaction (e.g. a question and its answer).
+    Assistant messages may carry a "source" from CHAT_SOURCES for the analytics rollups.
+    """
+    rows = [(username, m["role"], m["content"], m.get("source")) for m in messages]
+    with get_connection() as conn:
+        conn.executemany(SQL_INSERT_CHAT_MESSAGE, rows)
+
+def get_chat_page(username, before_id=None, after_id=None, limit=DEFAULT_CHAT_PAGE_SIZE):
+    """
+    Fetch up to limit of a user's chat messages as (id, role, content, created_at), newest first.
+    before_id pages back through older messages; after_id hides everything up to that id.
+    """
+    clauses, params = ["username = ?"], [username]
+    if before_id is not None:
+        clauses.append("id < ?")
+        params.append(before_id)
+    if after_id is not None:
+        clauses.append("id > ?")
+        params.append(after_id)
+    params.append(limit)
+    return get_connection().execute(
+        f"SELECT id, role, content, created_at FROM chat_messages WHERE {' AND '.join(clauses)} "
+        "ORDER BY id DESC LIMIT ?", params
+    ).fetchall()
+
+def get_last_chat_message_id(username):
+    """Id of the user's newest chat message, or 0 if they have none."""
+    return get_connection().execute(SQL_LAST_CHAT_MESSAGE_ID, (username,)).fetchone()[0] or 0
+
+# --- ANALYTICS ROLLUPS ---
+# Summary tables kept current by the migration 6 triggers, so the dashboard reads a row per
+# day and category instead of scanning complaints or the chat log.
+
+def _rollup_since(since):
+    """WHERE clause limiting a rollup to days on or after since; undated rows are left out then."""
+    if since is None:
+        return "", []
+    return " WHERE day >= ? AND day != 'unknown'", [str(since)]
+
+def get_complaint_rollup(since=None):
+    """Complaint counts as (day, issue_type, status, count) rows, oldest day first."""
+    where, params = _rollup_since(since)
+    sql = f"SELECT day, issue_type, status, count FROM complaint_daily_counts{where} ORDER BY day"
+    return _cached(("rollup", where, tuple(params)), lambda: [
+        row for row in get_connection().execute(sql, params).fetchall() if row[3] > 0
+    ])
+
+def get_chat_outcomes(since=None):
+    """Chat answers as (day, source, count) rows, oldest day first; source is one of CHAT_SOURCES or 'unknown'."""
+    where, params = _rollup_since(since)
+    return get_connection().execute(
+        f"SELECT day, source, count FROM chat_daily_outcomes{where} ORDER BY day", params
+    ).fetchall()
+
+def get_top_unanswered_queries(limit=10):
+    """The most often asked questions that got no answer, as (query, count, last_asked_at)."""
+    return get_connection().execute(SQL_TOP_UNANSWERED, (limit,)).fetchall()
+
+def _backfill_rollups(conn, batch_size=BULK_BATCH_SIZE):
+    """
+    Rebuild every rollup table from complaints and chat_messages with one streaming pass over
+    each table (fetchmany batches); memory grows with the number of rollup rows, not source rows.
+    """
+    complaint_counts = Counter()
+    cursor = conn.execute(
+        "SELECT COALESCE(date(created_at), 'unknown'), COALESCE(issue_type, ''), COALESCE(status, '') FROM complaints"
     )
-    conn.commit()
-    conn.close()
+    for batch in iter(lambda: cursor.fetchmany(batch_size), []):
+        complaint_counts.update(batch)
+
+    outcomes, unanswered, last_asked = Counter(), Counter(), {}
+    questions = {}           # username -> their latest message if it is a question, else None
+    cursor = conn.execute(
+        "SELECT username, role, CASE WHEN role = 'user' THEN lower(trim(content)) ELSE content END, source, "
+        "COALESCE(date(created_at), 'unknown'), created_at FROM chat_messages ORDER BY id"
+    )
+    for batch in iter(lambda: cursor.fetchmany(batch_size), []):
+        for username, role, content, source, day, created_at in batch:
+            if role == "user":
+                questions[username] = content
+                continue
+            if source is None:
+                source = "unanswered" if content in UNANSWERED_REPLIES else "unknown"
+            outcomes[(day, source)] += 1
+            question = questions.pop(username, None)
+            if source == "unanswered" and question is not None:
+                unanswered[question] += 1
+                last_asked[question] = created_at
+
+    for table in ("complaint_daily_counts", "chat_daily_outcomes", "chat_unanswered_queries"):
+        conn.execute(f"DELETE FROM {table}")
+    conn.executemany(SQL_INSERT_COMPLAINT_ROLLUP, [(*key, count) for key, count in complaint_counts.items()])
+    conn.executemany(SQL_INSERT_CHAT_OUTCOME_ROLLUP, [(*key, count) for key, count in outcomes.items()])
+    conn.executemany(SQL_INSERT_UNANSWERED_ROLLUP,
+                     [(query, count, last_asked[query]) for query, count in unanswered.items()])
+    return sum(complaint_counts.values()), sum(outcomes.values())
+
+def rebuild_rollups():
+    """
+    Backfill job: recompute the rollups from existing data, e.g. after restoring a backup.
+    Writers wait on the database lock meanwhile. Returns (complaints, chat answers) counted.
+    """
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        counted = _backfill_rollups(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    invalidate_complaint_cache()
+    return counted
 
 
 # --- Initialize DB when imported ---
 init_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Complaint database tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_filters(sub, status_flag="--status"):
+        sub.add_argument(status_flag, dest="filter_status", help="only complaints with this status")
+        sub.add_argument("--issue-type")
+        sub.add_argument("--since", help="filed on or after YYYY-MM-DD")
+        sub.add_argument("--until", help="filed on or before YYYY-MM-DD")
+
+    export_parser = subparsers.add_parser("export", help="stream complaints to CSV or Parquet")
+    export_parser.add_argument("out", help="output file, or - for CSV on stdout")
+    export_parser.add_argument("--format", choices=["csv", "parquet"])
+    add_filters(export_parser)
+
+    import_parser = subparsers.add_parser("import", help="bulk import legacy complaint records")
+    import_parser.add_argument("path", help="CSV or Parquet file with complaint columns")
+    import_parser.add_argument("--format", choices=["csv", "parquet"])
+
+    update_parser = subparsers.add_parser("update-status", help="set the status of many complaints at once")
+    update_parser.add_argument("status", choices=COMPLAINT_STATUSES)
+    update_parser.add_argument("--response", default="")
+    update_parser.add_argument("--ids", help='complaint ids, e.g. "12,15-20"')
+    update_parser.add_argument("--ids-file", help="file with complaint ids, one per line")
+    add_filters(update_parser, "--where-status")
+
+    subparsers.add_parser("rebuild-rollups", help="recompute the analytics rollups from existing data")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "export":
+        filters = {"status": args.filter_status, "issue_type": args.issue_type,
+                   "since": args.since, "until": args.until}
+        fmt = args.format or ("parquet" if args.out.lower().endswith(".parquet") else "csv")
+        if fmt == "parquet":
+            count = export_complaints_parquet(args.out, **filters)
+        else:
+            count = export_complaints_csv(sys.stdout if args.out == "-" else args.out, **filters)
+        print(f"Exported {count} complaints in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+    elif args.command == "import":
+        count = import_complaints(read_complaint_records(args.path, args.format))
+        print(f"Imported {count} complaints in {time.perf_counter() - start:.2f}s")
+
+    elif args.command == "update-status":
+        if args.ids or args.ids_file:
+            text = args.ids if args.ids else open(args.ids_file, encoding="utf-8").read()
+            count = update_complaint_statuses((i, args.status, args.response) for i in parse_id_list(text))
+        elif any((args.filter_status, args.issue_type, args.since, args.until)):
+            count = update_matching_complaints(args.status, args.response, status=args.filter_status,
+                                               issue_type=args.issue_type, since=args.since, until=args.until)
+        else:
+            parser.error("update-status needs --ids, --ids-file or at least one filter")
+        print(f"Updated {count} complaints in {time.perf_counter() - start:.2f}s")
+
+    elif args.command == "rebuild-rollups":
+        complaints, answers = rebuild_rollups()
+        print(f"Rebuilt rollups from {complaints} complaints and {answers} chat answers "
+              f"in {time.perf_counter() - start:.2f}s")
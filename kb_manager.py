@@ -1,153 +1,1370 @@
 # kb_manager.py
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-
-# Example Knowledge Base (you can expand this)
-KB_DICT = {
-    "COURSE_DETAILS": {
-        "I_BTECH_I_SEM": [
-            {"code": "23BS1101", "name": "Linear Algebra & Calculus", "credits": 3, "marks": 100},
-            {"code": "23BS1103", "name": "Engineering Physics", "credits": 3, "marks": 100},
-            {"code": "23ES1103", "name": "Introduction to Programming", "credits": 3, "marks": 100},
-            {"code": "23ES1103", "name": "Basic Electrical & Electronics Engineering", "credits": 3, "marks": 100},
-            {"code": "23ES1104", "name": "Engineering Graphics", "credits": 3, "marks": 100},
-            {"code": "23ES1152", "name": "Engineering Physics Lab", "credits": 1, "marks": 100},
-            {"code": "23ES1152", "name": "Computer Programming Lab", "credits": 1.5, "marks": 100},
-            {"code": "23ES1153", "name": "IT Workshop", "credits": 1, "marks": 100},
-            {"code": "23ES1154", "name": "Electrical & Electronics Engineering Workshop", "credits": 1.5, "marks": 100},
-            {"code": "23MC1141", "name": "NSS/NCC/Scouts & Guides/Comm.scdy Service", "credits": 1.5, "marks": 100}
-        ],
-        "I_BTECH_II_SEM": [
-            {"code": "23HS1201", "name": "Communicative English", "credits": 2, "marks": 100},
-            {"code": "23BS1201", "name": "Differential Equations & Vector Calculus", "credits": 3, "marks": 100},
-            {"code": "23BS1202", "name": "Chemistry", "credits": 3, "marks": 100},
-            {"code": "23ES1201", "name": "Basic Civil & Mechanical Engineering", "credits": 3, "marks": 100},
-            {"code": "23AM3201", "name": "Data Structures", "credits": 3, "marks": 100},
-            {"code": "23HS1251", "name": "Communicative English Lab", "credits": 1, "marks": 100},
-            {"code": "23BS1251", "name": "Chemistry Lab", "credits": 1, "marks": 100},
-            {"code": "23ES1251", "name": "Engineering Workshop", "credits": 1.5, "marks": 100},
-            {"code": "23AM3251", "name": "Data Structures Lab", "credits": 1.5, "marks": 100},
-            {"code": "23MC1242", "name": "Health and Wellness Yoga and Sports", "credits": 0.5, "marks": 100}
-        ],
-        "II_BTECH_I_SEM": [
-            {"code": "23BS1305", "name": "Discrete Mathematics & Graph Theory (DMGT)", "credits": 3, "marks": 100},
-            {"code": "23HS1301", "name": "Universal Human Values (UHV)", "credits": 3, "marks": 100},
-            {"code": "23ES1305", "name": "Artificial Intelligence (AI)", "credits": 3, "marks": 100},
-            {"code": "23AM3301", "name": "Advanced Data Structures & Algorithms Analysis (ADSA)", "credits": 3, "marks": 100},
-            {"code": "23AM3302", "name": "Object Oriented Programming Through Java (JAVA)", "credits": 3, "marks": 100},
-            {"code": "23AM3351", "name": "ADSA Lab", "credits": 1.5, "marks": 100},
-            {"code": "23AM3352", "name": "JAVA Lab", "credits": 1.5, "marks": 100},
-            {"code": "23CS08355", "name": "Python Programming", "credits": 2, "marks": 100},
-            {"code": "23AC1301", "name": "Environmental Science (ES)", "credits": 0, "marks": 100}
-        ],
-        "II_BTECH_II_SEM": [
-            {"code": "23HS1403", "name": "Optimization Techniques (OT)", "credits": 2, "marks": 100},
-            {"code": "23BS1402", "name": "Probability & Statistics (P&S)", "credits": 3, "marks": 100},
-            {"code": "23AM3401", "name": "Machine Learning (ML)", "credits": 3, "marks": 100},
-            {"code": "23AM3402", "name": "Database Management Systems (DBMS)", "credits": 3, "marks": 100},
-            {"code": "23AM3403", "name": "Digital Logic & Computer Organization (DL&CO)", "credits": 3, "marks": 100},
-            {"code": "23AM3451", "name": "ML Lab", "credits": 1.5, "marks": 100},
-            {"code": "23AM3452", "name": "DBMS Lab", "credits": 1.5, "marks": 100},
-            {"code": "23CS48453", "name": "Full Stack Development - I (FSD-I)", "credits": 2, "marks": 100},
-            {"code": "23ES1451", "name": "Design Thinking & Innovation (DT&I)", "credits": 2, "marks": 100}
-        ]
-        # Continue same for III B.Tech etc.
-    },
-
-    "ACADEMIC_CALENDAR": {
-        "II_III_BTECH": {
-            "Classwork_Start": "30-06-2025",
-            "Mid1": "25-08-2025 to 30-08-2025",
-            "Dasara_Vacation": "29-09-2025 to 04-10-2025",
-            "Mid2": "03-11-2025 to 08-11-2025",
-            "End_Exams": "17-11-2025 to 29-11-2025",
-            "SecondSem_Classwork": "01-12-2025",
-            "Pongal_Vacation": "12-01-2026 to 17-01-2026",
-            "SecondSem_Mid1": "02-02-2026 to 07-02-2026",
-            "SecondSem_Mid2": "06-04-2026 to 11-04-2026",
-            "SecondSem_EndExams": "20-04-2026 to 02-05-2026",
-            "Internship": "04-05-2026 to 27-06-2026"
-        }
-    },
-
-    "FEE_STRUCTURE": {
-        "Management_Quota": 200000,
-        "Counseling_Quota": 77000,
-        "Exam_Fee_Sem": 1200
-    },
-
-    "STAFF_DETAILS": {
-        "Teaching": [
-            {"name": "Dr.B.Janakiramaiah", "role": "Professor & Head", "exp": "22 Years", "phone": "+91 9440586340", "email": "Janakiramaiah@pvpsiddhartha.ac.in"},
-            {"name": "Mrs.P.Hema Venkata Ramana", "role": "Assistant Professor", "exp": "11 Years", "phone": "+91 9491853599", "email": "pandirhema90@pvpsiddhartha.ac.in"},
-            {"name": "Mrs.P.Naga Mani", "role": "Assistant Professor", "exp": "13 Years", "phone": "+91 9177801240", "email": "pnagamani@pvpsiddhartha.ac.in"}
-            # continue same for others
-        ],
-        "Non_Teaching": [
-            {"name": "Ms.K.SARANYA Kumari", "role": "Office Assistant", "phone": "+91 9948699589", "email": "cmsoffice@pvpsiddhartha.ac.in"},
-            {"name": "Mr.T.Anil Kumar", "role": "Junior Programmer", "phone": "+91 9866414164", "email": "tanilkumar@pvpsit.ac.in"}
-            # continue same for others
-        ]
-    },
-
-    "EVENTS": {
-        "Hackathon": {
-            "name": "IDEA Hackathon (Full Stack Hackathon)",
-            "round": "Final",
-            "date": "27-09-2025",
-            "duration": "8 Hours",
-            "mode": "Offline",
-            "team_size": "3-4",
-            "eligibility": "2nd/3rd/4th Year CSE/CSM/CSD/IT/ECE/EEE/MEC/Civil"
-        },
-        "CreativeClub": [
-            {"name": "Story Fragmentation Challenge", "date": "27-09-2025", "time": "10:30 AM – 12:30 PM", "venue": "TBD", "eligibility": "Open to all", "fee": "Free"},
-            {"name": "Expressive on Spot", "date": "27-09-2025", "time": "2:00 PM – 3:00 PM", "venue": "247 Lab, First Floor", "eligibility": "All Departments", "fee": "Free"}
-        ]
-    }
+import argparse
+import csv
+import hashlib
+import heapq
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+from itertools import islice
+import numpy as np
+from scipy.sparse import csr_matrix, vstack
+
+# Minimum cosine similarity for a KB record to count as an answer
+SIMILARITY_THRESHOLD = 0.3
+KB_MISS_MESSAGE = "I'm still learning about the college."
+
+# search_knowledge_base_batch() vectorizes this many queries at a time and caps
+# each sparse score matrix at this many entries, keeping memory bounded
+BATCH_CHUNK_SIZE = 1024
+BATCH_MAX_CANDIDATES = 2_000_000
+
+# College information is edited as JSON/CSV files here, not in code
+KB_DIR = os.getenv("KB_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "kb"))
+KB_FILE_EXTENSIONS = (".json", ".csv")
+KB_RELOAD_DEBOUNCE_SECONDS = 0.5
+
+# Prebuilt, memory-mapped index artifacts live in KB_INDEX_DIR/<content hash>.
+# Bump INDEX_FORMAT_VERSION whenever the on-disk layout or document text changes.
+KB_INDEX_DIR = os.getenv("KB_INDEX_DIR", "kb_index")
+KB_INDEX_KEEP_VERSIONS = 2
+INDEX_FORMAT_VERSION = 2
+
+# Several app processes on one host: a single builder (python kb_manager.py build --watch)
+# publishes index versions by rewriting index_dir/CURRENT, and processes started with
+# KB_ROLE=worker memory-map the published version read-only instead of loading kb/.
+# The page cache then holds one copy of the index however many workers attach.
+KB_ROLE = os.getenv("KB_ROLE", "standalone")
+KB_CURRENT_FILE = "CURRENT"
+# How long a worker waits at startup for the builder's first version
+KB_ATTACH_TIMEOUT_SECONDS = float(os.getenv("KB_ATTACH_TIMEOUT", "60"))
 
+# Optional dense retrieval (KB_DENSE=1): hashed word and character n-gram embeddings,
+# blended with the TF-IDF score so paraphrases and misspellings still find their record
+DENSE_ENABLED = os.getenv("KB_DENSE", "0") == "1"
+DENSE_DIM = int(os.getenv("KB_DENSE_DIM", "256"))
+DENSE_ENCODER_VERSION = 1
+DENSE_NGRAM_SIZES = (3, 4)
+DENSE_NGRAM_WEIGHT = 0.6
+DENSE_NUMBER_WEIGHT = 0.5
+# Share of the hybrid score that comes from the dense cosine
+HYBRID_WEIGHT = float(os.getenv("KB_HYBRID_WEIGHT", "0.5"))
+# Candidates taken from each of the lexical and dense rankings before blending
+HYBRID_CANDIDATES = 50
+# Above this many records, dense search probes an IVF index instead of scanning every row
+DENSE_IVF_MIN_DOCS = int(os.getenv("KB_DENSE_IVF_MIN_DOCS", "10000"))
+DENSE_NPROBE = int(os.getenv("KB_DENSE_NPROBE", "16"))
+DENSE_KMEANS_ITERATIONS = 8
+DENSE_KMEANS_SAMPLE_PER_LIST = 40
+DENSE_CHUNK_ROWS = 1024
 
+# Fast path: questions naming exactly one record by its course code, name or KB key
+# ("23AM3401", "Exam_Fee_Sem", a staff name) are answered by hash lookup, before any scoring
+FAST_PATH_ENABLED = os.getenv("KB_FAST_PATH", "1") == "1"
+FAST_PATH_KEYS_VERSION = 1
+# Names longer than this many words are left to TF-IDF; longer queries are cut
+FAST_PATH_MAX_SPAN = 6
+FAST_PATH_MAX_QUERY_TOKENS = 32
+FAST_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+FAST_PATH_TITLES = frozenset({"dr", "mr", "mrs", "ms", "prof"})
+# Question words -> the record field they ask for, so the answer can name just that field
+FAST_PATH_INTENTS = {
+    "credit": "credits", "credits": "credits", "marks": "marks", "code": "code",
+    "phone": "phone", "mobile": "phone", "contact": "phone", "call": "phone",
+    "email": "email", "mail": "email", "experience": "exp",
+    "role": "role", "designation": "role", "position": "role",
+    "date": "date", "when": "date", "venue": "venue", "where": "venue",
+    "time": "time", "timing": "time", "timings": "time", "duration": "duration",
+    "fee": "fee", "fees": "fee", "cost": "fee", "eligibility": "eligibility", "eligible": "eligibility",
 }
 
-def load_knowledge_base():
+KEY_BOUNDARY = re.compile(r"_+|(?<=[a-z])(?=[A-Z0-9])")
+DENSE_TOKEN_PATTERN = re.compile(r"[^\W\d_]+|\d+")
+DENSE_STOPWORDS = frozenset(
+    "a an and are about at be can do does for from how i in is it me my of on or please tell "
+    "the to what when where which who whom why will with".split()
+)
+# Without a language model, words students use for things the KB names differently
+# are mapped onto the KB's word before hashing (applied to records and queries alike)
+DENSE_ALIASES = {
+    "holiday": "vacation", "holidays": "vacation", "vacations": "vacation", "break": "vacation",
+    "leave": "vacation", "leaves": "vacation", "dussehra": "dasara", "dasera": "dasara",
+    "sankranti": "pongal", "sankranthi": "pongal",
+    "test": "exam", "tests": "exam", "exams": "exam", "examination": "exam", "examinations": "exam",
+    "midterm": "mid", "midterms": "mid", "mids": "mid", "semester": "sem", "semesters": "sem",
+    "final": "end", "finals": "end",
+    "fees": "fee", "cost": "fee", "costs": "fee", "price": "fee", "tuition": "fee",
+    "teacher": "professor", "teachers": "professor", "lecturer": "professor", "lecturers": "professor",
+    "faculty": "staff", "mobile": "phone", "contact": "phone", "mail": "email",
+    "classes": "classwork", "begin": "start", "begins": "start", "starts": "start", "commence": "start",
+}
+
+# TfidfVectorizer's default token_pattern
+TOKEN_PATTERN = re.compile(r"(?u)\b\w\w+\b")
+
+# --- KB SOURCE FILES ---
+# Each file under KB_DIR is one section of the KB, named by its dotted path:
+#   COURSE_DETAILS.json          -> KB_DICT["COURSE_DETAILS"]
+#   STAFF_DETAILS.Teaching.csv   -> KB_DICT["STAFF_DETAILS"]["Teaching"] (one record per row)
+
+def _csv_value(text):
+    """CSV cells are strings; keep numbers numeric like their JSON counterparts."""
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+def read_kb_file(path):
+    """Parse one KB source file into its section value."""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            return [{k: _csv_value(v) for k, v in row.items() if v != ""} for row in csv.DictReader(f)]
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def read_kb_dir(kb_dir=KB_DIR):
+    """Load every JSON/CSV file in kb_dir into one KB dictionary."""
+    kb_dict = {}
+    for name in sorted(os.listdir(kb_dir)):
+        stem, ext = os.path.splitext(name)
+        if ext not in KB_FILE_EXTENSIONS or stem.startswith("."):
+            continue
+        *parents, leaf = stem.split(".")
+        section = kb_dict
+        for part in parents:
+            section = section.setdefault(part, {})
+        value = read_kb_file(os.path.join(kb_dir, name))
+        if isinstance(value, dict) and isinstance(section.get(leaf), dict):
+            section[leaf].update(value)
+        else:
+            section[leaf] = value
+    return kb_dict
+
+KB_DICT = read_kb_dir(KB_DIR) if os.path.isdir(KB_DIR) else {}
+
+@lru_cache(maxsize=4096)
+def _humanize(key):
+    """'SecondSem_Mid1' -> 'Second Sem Mid 1', so field names tokenize into words."""
+    return KEY_BOUNDARY.sub(" ", str(key)).strip()
+
+def _is_record(value, in_list):
+    """A record is one course, staff member or event: any dict in a list, or a dict with a name."""
+    return isinstance(value, dict) and (in_list or "name" in value)
+
+def iter_kb_records(kb_dict, path=()):
+    """
+    Yield (path, value) for every indexable record in the KB.
+    Lists and plain dicts are recursed into; records and scalar leaves are yielded whole.
+    """
+    items = kb_dict.items() if isinstance(kb_dict, dict) else enumerate(kb_dict)
+    for k, v in items:
+        if isinstance(v, (dict, list)) and not _is_record(v, isinstance(kb_dict, list)):
+            yield from iter_kb_records(v, path + (k,))
+        elif v is not None:
+            yield path + (k,), v
+
+def _record_section(path):
+    return " ".join(_humanize(p) for p in path if not isinstance(p, int))
+
+def _record_text(path, value):
+    """Field-aware document text: section words followed by 'field value' pairs."""
+    if isinstance(value, dict):
+        fields = " ".join(f"{_humanize(k)} {v}" for k, v in value.items())
+        return f"{_record_section(path[:-1])} {fields}"
+    return f"{_record_section(path)} {path[-1]} {value}"
+
+def _record_title(path, value):
+    """'Engineering Physics (I BTECH I SEM)' for a course, the record name or key otherwise."""
+    title = value.get("name", _humanize(path[-1]))
+    parent = next((p for p in reversed(path[:-1]) if not isinstance(p, int)), None)
+    if isinstance(path[-1], int) and parent:
+        title = f"{title} ({_humanize(parent)})"
+    return title
+
+def _record_answer(path, value):
+    """Compact answer payload shown to the student for one record."""
+    if isinstance(value, dict):
+        details = ", ".join(f"{_humanize(k)}: {v}" for k, v in value.items() if k != "name")
+        title = _record_title(path, value)
+        return f"{title} — {details}" if details else title
+    return f"{_humanize(path[-1])}: {value}"
+
+class QueryVectorizer:
     """
-    Returns the KB dictionary and prepares text corpus for search.
+    Query-side stand-in for the fitted TfidfVectorizer: the same lowercasing, token
+    pattern, tf * idf weighting and L2 norm, but loadable without scikit-learn.
     """
+
+    def __init__(self, vocabulary, idf):
+        self.vocabulary_ = vocabulary
+        self.idf_ = idf
+
+    def _counts(self, text):
+        vocabulary = self.vocabulary_
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        if isinstance(vocabulary, _MappedVocabulary):
+            return Counter(term for term in vocabulary.lookup(tokens) if term >= 0)
+        return Counter(vocabulary[t] for t in tokens if t in vocabulary)
+
+    def terms(self, text):
+        """Vectorize one text as (term ids, weights) without building a sparse matrix."""
+        counts = self._counts(text)
+        if not counts:
+            return np.array([], dtype=np.int64), np.array([])
+        terms = np.fromiter(counts, dtype=np.int64, count=len(counts))
+        weights = np.array([counts[t] for t in terms.tolist()], dtype=np.float64) * self.idf_[terms]
+        return terms, weights / np.linalg.norm(weights)
+
+    def transform(self, texts):
+        """Vectorize texts into a CSR matrix with one L2-normalized row per text."""
+        indptr, indices, data = [0], [], []
+        for text in texts:
+            counts = self._counts(text)
+            for term in sorted(counts):
+                indices.append(term)
+                data.append(counts[term])
+            indptr.append(len(indices))
+        indices = np.array(indices, dtype=np.int32)
+        rows = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+        data = np.array(data, dtype=np.float64) * self.idf_[indices]
+        norms = np.sqrt(np.bincount(rows, weights=data ** 2, minlength=len(indptr) - 1))
+        if len(data):
+            data /= norms[rows]
+        return csr_matrix((data, indices, np.array(indptr, dtype=np.int32)),
+                          shape=(len(indptr) - 1, len(self.vocabulary_)))
+
+class _StringTable(Sequence):
+    """Read-only list of strings backed by a (memory-mapped) UTF-8 blob and offsets."""
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+class _MappedVocabulary(Mapping):
+    """
+    Read-only term -> id mapping over memory-mapped arrays: sorted term hashes with their
+    ids, and the terms in id order. Unlike a dict it costs an attached process no memory
+    of its own.
+    """
+
+    def __init__(self, terms, hashes, ids):
+        self._terms = terms
+        self._hashes = hashes
+        self._ids = ids
+
+    def lookup(self, tokens):
+        """Term id of each token, or -1 for tokens not in the vocabulary."""
+        if not tokens or not len(self._hashes):
+            return [-1] * len(tokens)
+        hashes = np.array([_fast_hash(t) for t in tokens], dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self._hashes, hashes), len(self._hashes) - 1)
+        ids = np.where(self._hashes[pos] == hashes, self._ids[pos], -1).tolist()
+        # Confirm each hit against the stored term, so a hash collision cannot match
+        return [i if i >= 0 and self._terms[i] == t else -1 for i, t in zip(ids, tokens)]
+
+    def __getitem__(self, term):
+        term_id = self.lookup([term])[0]
+        if term_id < 0:
+            raise KeyError(term)
+        return term_id
+
+    def __iter__(self):
+        return iter(self._terms)
+
+    def __len__(self):
+        return len(self._terms)
+
+    def items(self):
+        return zip(self._terms, range(len(self._terms)))
+
+def kb_content_hash(kb_dict):
+    """Stable hash of the KB content and index format; an artifact is reused only on a match."""
+    payload = json.dumps([INDEX_FORMAT_VERSION, kb_dict], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def build_knowledge_base(kb_dict=None, dense=DENSE_ENABLED):
+    """
+    Fit the TF-IDF index in memory, one document per record
+    (course, staff member, event, calendar entry or fee).
+    With dense=True the records are also embedded for hybrid search.
+    The fast-path lookup table is built alongside.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    kb_dict = KB_DICT if kb_dict is None else kb_dict
     corpus = []
     mapping = []
+    paths = []
 
-    def flatten(d, prefix=""):
-        for k, v in d.items():
-            if isinstance(v, dict):
-                flatten(v, f"{prefix}{k}.")
-            else:
-                corpus.append(f"{prefix}{k}: {v}")
-                mapping.append(v)
+    for path, value in iter_kb_records(kb_dict):
+        corpus.append(_record_text(path, value))
+        mapping.append(_record_answer(path, value))
+        paths.append(".".join(str(p) for p in path))
 
-    flatten(KB_DICT)
-    vectorizer = TfidfVectorizer()
-    tfidf_matrix = vectorizer.fit_transform(corpus)
+    vectorizer = TfidfVectorizer(dtype=np.float64)
+    tfidf_matrix = vectorizer.fit_transform(corpus).tocsr()
+    tfidf_matrix.sort_indices()
+    inverted_index = build_inverted_index(tfidf_matrix)
 
     return {
-        "kb_dict": KB_DICT,
+        "kb_dict": kb_dict,
+        "version": kb_content_hash(kb_dict),
         "corpus": corpus,
         "mapping": mapping,
-        "vectorizer": vectorizer,
-        "tfidf_matrix": tfidf_matrix
+        "paths": paths,
+        "vectorizer": QueryVectorizer(vectorizer.vocabulary_, vectorizer.idf_),
+        "tfidf_matrix": tfidf_matrix,
+        "inverted_index": inverted_index,
+        "term_max_weight": _term_max_weights(inverted_index),
+        "idf": vectorizer.idf_,
+        "dense": build_dense_index(corpus) if dense else None,
+        "fast_path": build_fast_index(_numbered_records(kb_dict))
     }
 
-def search_knowledge_base(query, kb_data):
+def _write_string_table(directory, name, strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    np.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+    np.save(os.path.join(directory, f"{name}.blob.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+def _read_string_table(directory, name):
+    return _StringTable(np.load(os.path.join(directory, f"{name}.blob.npy"), mmap_mode="r"),
+                        np.load(os.path.join(directory, f"{name}.offsets.npy"), mmap_mode="r"))
+
+def _prune_index_versions(index_dir, keep):
+    """
+    Remove all but the newest `keep` artifact versions, never the published one
+    (open mmaps stay valid on POSIX).
+    """
+    current = published_index_version(index_dir)
+    versions = [os.path.join(index_dir, d) for d in os.listdir(index_dir) if not d.startswith(".")]
+    versions = sorted((v for v in versions if os.path.isdir(v)), key=os.path.getmtime, reverse=True)
+    for stale in versions[keep:]:
+        if stale != current:
+            shutil.rmtree(stale, ignore_errors=True)
+
+def write_index_artifact(kb_data, index_dir=KB_INDEX_DIR):
+    """
+    Write the index to index_dir/<content hash> and return that directory.
+    Files are written to a temporary directory first and renamed into place, so a
+    reader never sees a half-written version.
+    """
+    version_dir = os.path.join(index_dir, kb_data["version"][:16])
+    if os.path.exists(os.path.join(version_dir, "manifest.json")):
+        return version_dir
+    os.makedirs(index_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".build-", dir=index_dir)
+    try:
+        tfidf_matrix, inverted_index = kb_data["tfidf_matrix"], kb_data["inverted_index"]
+        arrays = {
+            "tfidf.data": tfidf_matrix.data, "tfidf.indices": tfidf_matrix.indices,
+            "tfidf.indptr": tfidf_matrix.indptr,
+            "inverted.data": inverted_index.data, "inverted.indices": inverted_index.indices,
+            "inverted.indptr": inverted_index.indptr,
+            "idf": kb_data["idf"], "term_max_weight": kb_data["term_max_weight"],
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+        for name in ("mapping", "paths", "corpus"):
+            _write_string_table(tmp_dir, name, kb_data[name])
+        # Raw records, so processes attached without kb/ can still resolve them
+        if kb_data["kb_dict"] is not None:
+            records = [json.dumps(v, ensure_ascii=False) for _, v in iter_kb_records(kb_data["kb_dict"])]
+        else:
+            records = kb_data["records"]
+        _write_string_table(tmp_dir, "records", records)
+        if kb_data.get("dense") is not None:
+            _write_dense(kb_data["dense"], tmp_dir)
+        if kb_data.get("fast_path") is not None:
+            _write_fast(kb_data["fast_path"], tmp_dir)
+
+        terms = [t for t, _ in sorted(kb_data["vectorizer"].vocabulary_.items(), key=lambda item: item[1])]
+        _write_string_table(tmp_dir, "vocabulary", terms)
+        hashes = np.array([_fast_hash(t) for t in terms], dtype=np.int64)
+        order = np.argsort(hashes, kind="stable")
+        np.save(os.path.join(tmp_dir, "vocabulary.hashes.npy"), hashes[order])
+        np.save(os.path.join(tmp_dir, "vocabulary.ids.npy"), order.astype(np.int32))
+        with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "format": INDEX_FORMAT_VERSION,
+                "version": kb_data["version"],
+                "n_docs": tfidf_matrix.shape[0],
+                "n_terms": tfidf_matrix.shape[1],
+                "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }, f, indent=2)
+        os.rename(tmp_dir, version_dir)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        # Another process published the same version first
+        if not os.path.exists(os.path.join(version_dir, "manifest.json")):
+            raise
+    _prune_index_versions(index_dir, KB_INDEX_KEEP_VERSIONS)
+    return version_dir
+
+def load_index_artifact(version_dir, kb_dict=None, dense=DENSE_ENABLED, read_only=False):
+    """
+    Memory-map a prebuilt index. Nothing is refitted and the arrays are not copied.
+    With dense=True, embeddings missing from the artifact are computed and added to it;
+    so is the fast-path table when kb_dict is given. With read_only=True the artifact is
+    used exactly as stored, embeddings included.
+    """
+    with open(os.path.join(version_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest["format"] != INDEX_FORMAT_VERSION:
+        raise ValueError(f"Unsupported KB index format {manifest['format']} in {version_dir}")
+
+    def array(name):
+        return np.load(os.path.join(version_dir, f"{name}.npy"), mmap_mode="r")
+
+    vocabulary = _MappedVocabulary(_read_string_table(version_dir, "vocabulary"),
+                                   array("vocabulary.hashes"), array("vocabulary.ids"))
+    n_docs, n_terms = manifest["n_docs"], manifest["n_terms"]
+    tfidf_matrix = csr_matrix((array("tfidf.data"), array("tfidf.indices"), array("tfidf.indptr")),
+                              shape=(n_docs, n_terms), copy=False)
+    inverted_index = csr_matrix((array("inverted.data"), array("inverted.indices"), array("inverted.indptr")),
+                                shape=(n_terms, n_docs), copy=False)
+    # Both were written sorted; setting the flag keeps scipy from re-sorting read-only arrays
+    tfidf_matrix.has_sorted_indices = True
+    inverted_index.has_sorted_indices = True
+    idf = array("idf")
+    corpus = _read_string_table(version_dir, "corpus")
+    dense_index = _read_dense(version_dir) if dense or read_only else None
+    if dense and not read_only:
+        if dense_index is None:
+            dense_index = build_dense_index(corpus)
+            try:
+                _write_dense(dense_index, version_dir)
+            except OSError as e:
+                print(f"[KB WARNING] Could not add embeddings to {version_dir}: {e}")
+    fast = _read_fast(version_dir)
+    if fast is None and kb_dict is not None and not read_only:
+        fast = build_fast_index(_numbered_records(kb_dict))
+        try:
+            _write_fast(fast, version_dir)
+        except OSError as e:
+            print(f"[KB WARNING] Could not add the fast-path table to {version_dir}: {e}")
+
+    return {
+        "kb_dict": kb_dict,
+        "version": manifest["version"],
+        "corpus": corpus,
+        "mapping": _read_string_table(version_dir, "mapping"),
+        "paths": _read_string_table(version_dir, "paths"),
+        "vectorizer": QueryVectorizer(vocabulary, idf),
+        "tfidf_matrix": tfidf_matrix,
+        "inverted_index": inverted_index,
+        "term_max_weight": array("term_max_weight"),
+        "idf": idf,
+        "dense": dense_index,
+        "fast_path": fast,
+        "records": _read_string_table(version_dir, "records")
+    }
+
+def load_knowledge_base(kb_dict=None, index_dir=KB_INDEX_DIR, dense=DENSE_ENABLED):
+    """
+    Returns the KB dictionary and its search index.
+    The index is memory-mapped from the prebuilt artifact for this KB's content hash
+    when one exists in index_dir; otherwise it is built and the artifact written for
+    the next start. Pass index_dir=None to build in memory only.
+    """
+    kb_dict = KB_DICT if kb_dict is None else kb_dict
+    if index_dir is None:
+        return build_knowledge_base(kb_dict, dense)
+
+    version_dir = os.path.join(index_dir, kb_content_hash(kb_dict)[:16])
+    if os.path.exists(os.path.join(version_dir, "manifest.json")):
+        return load_index_artifact(version_dir, kb_dict, dense)
+
+    kb_data = build_knowledge_base(kb_dict, dense)
+    try:
+        write_index_artifact(kb_data, index_dir)
+    except OSError as e:
+        print(f"[KB WARNING] Could not write index artifact to {index_dir}: {e}")
+    return kb_data
+
+# --- INCREMENTAL RELOAD ---
+
+def _tokenize(text):
+    """Token counts exactly as TfidfVectorizer's default analyzer would produce them."""
+    return Counter(TOKEN_PATTERN.findall(text.lower()))
+
+def _normalize_rows(matrix):
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    norms = np.sqrt(np.bincount(rows, weights=matrix.data ** 2, minlength=matrix.shape[0]))
+    norms[norms == 0] = 1.0
+    matrix.data /= norms[rows]
+
+def update_knowledge_base(kb_data, kb_dict):
+    """
+    Reindex kb_data for new KB content, tokenizing only added or changed records.
+    Unchanged rows are reused: a TF-IDF row divided by the IDF is proportional to its
+    term counts, so rows are reweighted with the new IDF instead of refitted. Scores
+    match a full rebuild: new terms are appended to the vocabulary, and terms no record
+    uses any more are dropped.
+    Returns (new kb_data, stats). The input kb_data is left untouched.
+    """
+    old_paths, old_corpus, old_mapping = kb_data["paths"], kb_data["corpus"], kb_data["mapping"]
+    old_kb = kb_data["kb_dict"] or {}
+    # Records of one top-level section are contiguous, so each maps to a row range
+    old_sections = {}
+    for i, path in enumerate(old_paths):
+        start, _ = old_sections.get(path.split(".", 1)[0], (i, i))
+        old_sections[path.split(".", 1)[0]] = (start, i + 1)
+
+    corpus, mapping, paths = [], [], []
+    reused, fresh, fresh_records = [], [], []
+    changed = 0
+
+    for section, section_value in kb_dict.items():
+        start, end = old_sections.get(str(section), (0, 0))
+        if end > start and old_kb.get(section) == section_value:
+            # Untouched section (e.g. a KB file that was not edited): reuse its rows as-is
+            for old in range(start, end):
+                reused.append((len(corpus), old))
+                corpus.append(old_corpus[old])
+                mapping.append(old_mapping[old])
+                paths.append(old_paths[old])
+            continue
+
+        old_rows = {old_paths[i]: i for i in range(start, end)}
+        for path, value in iter_kb_records({section: section_value}):
+            key = ".".join(str(p) for p in path)
+            text = _record_text(path, value)
+            old = old_rows.get(key)
+            if old is not None and old_corpus[old] == text:
+                reused.append((len(corpus), old))
+                mapping.append(old_mapping[old])
+            else:
+                fresh.append(len(corpus))
+                fresh_records.append((len(corpus), path, value))
+                changed += old is not None
+                mapping.append(_record_answer(path, value))
+            corpus.append(text)
+            paths.append(key)
+
+    vocabulary = dict(kb_data["vectorizer"].vocabulary_.items())
+    fresh_indptr, fresh_indices, fresh_data = [0], [], []
+    for doc in fresh:
+        counts = _tokenize(corpus[doc])
+        for term in counts:
+            vocabulary.setdefault(term, len(vocabulary))
+        for term_id, count in sorted((vocabulary[t], c) for t, c in counts.items()):
+            fresh_indices.append(term_id)
+            fresh_data.append(count)
+        fresh_indptr.append(len(fresh_indices))
+    n_terms = len(vocabulary)
+
+    old_matrix = kb_data["tfidf_matrix"]
+    kept = old_matrix[np.array([old for _, old in reused], dtype=np.int64)]
+    kept_counts = csr_matrix((kept.data / kb_data["idf"][kept.indices], kept.indices, kept.indptr),
+                             shape=(len(reused), n_terms))
+    fresh_counts = csr_matrix((np.array(fresh_data, dtype=np.float64), np.array(fresh_indices, dtype=np.int32),
+                               np.array(fresh_indptr, dtype=np.int32)), shape=(len(fresh), n_terms))
+    order = np.array([new for new, _ in reused] + fresh, dtype=np.int64)
+    counts = vstack([kept_counts, fresh_counts], format="csr")[np.argsort(order)]
+    counts.sort_indices()
+
+    # Drop terms of removed or edited records that no record uses now: left in, they would
+    # add to a query's norm and lower every score, and the vocabulary would only grow
+    df = np.bincount(counts.indices, minlength=n_terms)
+    used = df > 0
+    if not used.all():
+        new_ids = np.cumsum(used) - 1
+        counts = csr_matrix((counts.data, new_ids[counts.indices].astype(np.int32), counts.indptr),
+                            shape=(counts.shape[0], int(used.sum())))
+        vocabulary = {term: int(new_ids[i]) for term, i in vocabulary.items() if used[i]}
+        df = df[used]
+
+    # Same smoothed IDF as TfidfVectorizer: ln((1 + n) / (1 + df)) + 1
+    idf = np.log((1 + counts.shape[0]) / (1 + df)) + 1
+    counts.data *= idf[counts.indices]
+    _normalize_rows(counts)
+    inverted_index = build_inverted_index(counts)
+    dense = None
+    if kb_data.get("dense") is not None:
+        dense = _update_dense_index(kb_data["dense"], reused, fresh, corpus)
+    if kb_data.get("fast_path") is not None:
+        fast = _update_fast_index(kb_data["fast_path"], len(old_paths), reused, fresh_records)
+    else:
+        fast = build_fast_index(_numbered_records(kb_dict))
+
+    stats = {"added": len(fresh) - changed, "changed": changed,
+             "removed": len(old_paths) - len(reused) - changed,
+             "unchanged": len(reused), "tokenized": len(fresh)}
+    return {
+        "kb_dict": kb_dict,
+        "version": kb_content_hash(kb_dict),
+        "corpus": corpus,
+        "mapping": mapping,
+        "paths": paths,
+        "vectorizer": QueryVectorizer(vocabulary, idf),
+        "tfidf_matrix": counts,
+        "inverted_index": inverted_index,
+        "term_max_weight": _term_max_weights(inverted_index),
+        "idf": idf,
+        "dense": dense,
+        "fast_path": fast
+    }, stats
+
+_active_kb = None
+_reload_lock = threading.Lock()
+
+def get_active_kb():
+    """
+    The KB index currently serving queries. Reloads replace it with a single reference
+    assignment, so callers never block and keep a consistent snapshot for their query.
+    With KB_ROLE=worker it is the version the builder published last.
+    """
+    global _active_kb
+    if KB_ROLE == "worker":
+        return _attached_kb()
+    if _active_kb is None:
+        with _reload_lock:
+            if _active_kb is None:
+                _active_kb = load_knowledge_base()
+    return _active_kb
+
+def reload_knowledge_base(kb_dir=KB_DIR, index_dir=KB_INDEX_DIR):
+    """
+    Re-read kb_dir, reindex what changed and swap the new index in. The written artifact
+    is published for attached workers. Returns the update stats.
+    """
+    global _active_kb
+    with _reload_lock:
+        current = _active_kb
+        kb_dict = read_kb_dir(kb_dir)
+        if current is None:
+            _active_kb = load_knowledge_base(kb_dict, index_dir)
+            return {"added": len(_active_kb["paths"]), "changed": 0, "removed": 0, "unchanged": 0,
+                    "tokenized": len(_active_kb["paths"])}
+        if kb_content_hash(kb_dict) == current["version"]:
+            return {"added": 0, "changed": 0, "removed": 0, "unchanged": len(current["paths"]), "tokenized": 0}
+        updated, stats = update_knowledge_base(current, kb_dict)
+        _active_kb = updated
+    if index_dir is not None:
+        # Persist for the next cold start, outside the lock: queries already use the new index
+        try:
+            publish_index_version(write_index_artifact(updated, index_dir), index_dir)
+        except OSError as e:
+            print(f"[KB WARNING] Could not write index artifact to {index_dir}: {e}")
+    return stats
+
+def watch_knowledge_base(kb_dir=KB_DIR, index_dir=KB_INDEX_DIR, debounce=KB_RELOAD_DEBOUNCE_SECONDS):
+    """
+    Reload the KB whenever a JSON/CSV file in kb_dir changes, coalescing bursts of
+    events (editors often write a file several times) into one reload.
+    Returns the started watchdog observer.
+    """
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+
+    timer = None
+
+    def reload():
+        try:
+            stats = reload_knowledge_base(kb_dir, index_dir)
+            print(f"[KB] Reloaded {kb_dir}: {stats}")
+        except (OSError, ValueError) as e:
+            # e.g. a half-saved JSON file; keep serving the previous index
+            print(f"[KB WARNING] Reload of {kb_dir} failed, keeping current index: {e}")
+
+    class KBFileHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            nonlocal timer
+            paths = (event.src_path, getattr(event, "dest_path", ""))
+            # Open/close events fire for our own reads too; only writes matter
+            if event.event_type not in ("created", "modified", "deleted", "moved") or event.is_directory:
+                return
+            if not any(str(p).endswith(KB_FILE_EXTENSIONS) for p in paths):
+                return
+            if timer is not None:
+                timer.cancel()
+            timer = threading.Timer(debounce, reload)
+            timer.daemon = True
+            timer.start()
+
+    observer = Observer()
+    observer.schedule(KBFileHandler(), kb_dir, recursive=False)
+    observer.daemon = True
+    observer.start()
+    return observer
+
+# --- SHARED INDEX ---
+
+def publish_index_version(version_dir, index_dir=KB_INDEX_DIR):
+    """Make version_dir the version attached workers serve, by atomically replacing CURRENT."""
+    tmp_path = os.path.join(index_dir, f".{KB_CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(version_dir) + "\n")
+    os.replace(tmp_path, os.path.join(index_dir, KB_CURRENT_FILE))
+
+def published_index_version(index_dir=KB_INDEX_DIR):
+    """Directory of the published index version, or None if none was published."""
+    try:
+        with open(os.path.join(index_dir, KB_CURRENT_FILE), encoding="utf-8") as f:
+            name = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return os.path.join(index_dir, name) if name else None
+
+def attach_knowledge_base(index_dir=KB_INDEX_DIR):
+    """
+    Memory-map the published index version read-only: kb/ is not read and nothing is
+    built, so any number of processes share one copy of the index in the page cache.
     """
-    Search KB using TF-IDF similarity.
+    version_dir = published_index_version(index_dir)
+    if version_dir is None:
+        raise FileNotFoundError(f"No published KB index in {index_dir}; run python kb_manager.py build")
+    return load_index_artifact(version_dir, read_only=True)
+
+_attached_stat = None
+
+def _current_stat(index_dir):
+    try:
+        st = os.stat(os.path.join(index_dir, KB_CURRENT_FILE))
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns
+
+def _attached_kb():
+    """
+    get_active_kb() for workers. Every call stats CURRENT, so a newly published version
+    is served from the next query on in every worker. One caller attaches it while the
+    others keep answering from the previous version.
+    """
+    global _active_kb, _attached_stat
+    index_dir = KB_INDEX_DIR
+    if _active_kb is None:
+        deadline = time.monotonic() + KB_ATTACH_TIMEOUT_SECONDS
+        with _reload_lock:
+            while _active_kb is None:
+                stat = _current_stat(index_dir)
+                if stat is not None:
+                    _active_kb, _attached_stat = attach_knowledge_base(index_dir), stat
+                elif time.monotonic() > deadline:
+                    raise FileNotFoundError(f"No KB index was published in {index_dir} within "
+                                            f"{KB_ATTACH_TIMEOUT_SECONDS:.0f}s; is the builder running?")
+                else:
+                    time.sleep(0.2)
+        return _active_kb
+
+    stat = _current_stat(index_dir)
+    if stat is not None and stat != _attached_stat and _reload_lock.acquire(blocking=False):
+        try:
+            if stat != _attached_stat:
+                _active_kb, _attached_stat = attach_knowledge_base(index_dir), stat
+        except (OSError, ValueError) as e:
+            # e.g. the version was pruned between reading CURRENT and opening it; retry next query
+            print(f"[KB WARNING] Could not attach the published index in {index_dir}: {e}")
+        finally:
+            _reload_lock.release()
+    return _active_kb
+
+# --- FAST PATH ---
+
+def _numbered_records(kb_dict):
+    """(doc id, path, value) for every record, doc ids in index order."""
+    for doc, (path, value) in enumerate(iter_kb_records(kb_dict)):
+        yield doc, path, value
+
+def _fast_tokens(text):
+    return FAST_TOKEN_PATTERN.findall(str(text).lower())
+
+def _fast_hash(key):
+    """Signed 64-bit hash of a lookup key, stable across processes so it can be stored."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+def _fast_keys(path, value):
+    """
+    Lookup keys of one record: its code and name, the name without titles and initials
+    ('Dr.B.Janakiramaiah' -> 'janakiramaiah'), and its own KB key both humanized and as
+    written ('second sem mid 1', 'secondsem mid1').
+    """
+    variants = []
+    if isinstance(value, dict):
+        if value.get("code") is not None:
+            variants.append(_fast_tokens(value["code"]))
+        name = _fast_tokens(value.get("name", ""))
+        variants += [name, [t for t in name if t not in FAST_PATH_TITLES and len(t) > 1]]
+    if not isinstance(path[-1], int):
+        variants += [_fast_tokens(_humanize(path[-1])), _fast_tokens(path[-1])]
+    keys = set()
+    for tokens in variants:
+        key = " ".join(tokens)
+        if len(tokens) <= FAST_PATH_MAX_SPAN and len(key) >= 3:
+            keys.add(key)
+    return keys
+
+def _fast_index(hashes, docs):
+    order = np.argsort(hashes, kind="stable")
+    return {"hashes": hashes[order], "docs": docs[order]}
+
+def build_fast_index(records):
     """
-    vectorizer = kb_data["vectorizer"]
+    Sorted key hashes with the doc id each belongs to, from (doc, path, value) records.
+    A key shared by several records (e.g. a reused course code) keeps one entry per record.
+    """
+    hashes, docs = [], []
+    for doc, path, value in records:
+        for key in _fast_keys(path, value):
+            hashes.append(_fast_hash(key))
+            docs.append(doc)
+    return _fast_index(np.array(hashes, dtype=np.int64), np.array(docs, dtype=np.int32))
+
+def _update_fast_index(old_fast, n_old_docs, reused, fresh_records):
+    """Keep the entries of reused rows under their new doc ids and add those of fresh records."""
+    new_ids = np.full(n_old_docs, -1, dtype=np.int64)
+    if reused:
+        new_ids[[old for _, old in reused]] = [new for new, _ in reused]
+    docs = new_ids[old_fast["docs"]]
+    keep = docs >= 0
+    fresh = build_fast_index(fresh_records)
+    return _fast_index(np.concatenate([old_fast["hashes"][keep], fresh["hashes"]]),
+                       np.concatenate([docs[keep].astype(np.int32), fresh["docs"]]))
+
+def _write_fast(fast, directory):
+    for name in ("hashes", "docs"):
+        tmp_path = os.path.join(directory, f".fast.{name}.tmp.npy")
+        np.save(tmp_path, np.ascontiguousarray(fast[name]))
+        os.replace(tmp_path, os.path.join(directory, f"fast.{name}.npy"))
+    with open(os.path.join(directory, ".fast.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump({"keys": FAST_PATH_KEYS_VERSION}, f)
+    os.replace(os.path.join(directory, ".fast.json.tmp"), os.path.join(directory, "fast.json"))
+
+def _read_fast(directory):
+    """Memory-map the stored fast-path table, or None if missing or made by other key rules."""
+    try:
+        with open(os.path.join(directory, "fast.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    if meta != {"keys": FAST_PATH_KEYS_VERSION}:
+        return None
+    return {name: np.load(os.path.join(directory, f"fast.{name}.npy"), mmap_mode="r") for name in ("hashes", "docs")}
+
+def _fast_answer(tokens, doc, kb_data):
+    """The record's answer, narrowed to the field the question asks about when it has one."""
+    if kb_data.get("kb_dict") is None and kb_data.get("records") is None:
+        return kb_data["mapping"][doc]
+    value = get_kb_record(kb_data, doc)
+    if isinstance(value, dict):
+        for token in tokens:
+            field = FAST_PATH_INTENTS.get(token)
+            if field in value:
+                path = tuple(int(p) if p.isdigit() else p for p in kb_data["paths"][doc].split("."))
+                return f"{_record_title(path, value)} — {_humanize(field)}: {value[field]}"
+    return kb_data["mapping"][doc]
+
+def resolve_fast_path(query, kb_data):
+    """
+    Answer a question that names exactly one record, by hash lookup of every span of up to
+    FAST_PATH_MAX_SPAN query words. Longer matches win over the words inside them; if the
+    mentions point at different records, or a key is shared, the query is left to scoring.
+    Returns a result dict like search_knowledge_base_ranked() (score 1.0), or None.
+    """
+    fast = kb_data.get("fast_path")
+    if fast is None or not len(fast["hashes"]):
+        return None
+    tokens = _fast_tokens(query)[:FAST_PATH_MAX_QUERY_TOKENS]
+    spans = [(i, j) for i in range(len(tokens)) for j in range(i + 1, min(i + FAST_PATH_MAX_SPAN, len(tokens)) + 1)]
+    if not spans:
+        return None
+    span_hashes = np.array([_fast_hash(" ".join(tokens[i:j])) for i, j in spans], dtype=np.int64)
+    lo = np.searchsorted(fast["hashes"], span_hashes, side="left")
+    hi = np.searchsorted(fast["hashes"], span_hashes, side="right")
+
+    matched, covered = None, [False] * len(tokens)
+    for s in sorted(np.flatnonzero(hi > lo).tolist(), key=lambda s: spans[s][0] - spans[s][1]):
+        i, j = spans[s]
+        if any(covered[i:j]):
+            continue
+        covered[i:j] = [True] * (j - i)
+        docs = set(fast["docs"][lo[s]:hi[s]].tolist())
+        matched = docs if matched is None else matched & docs
+    if not matched or len(matched) != 1:
+        return None
+    doc = matched.pop()
+    return {"answer": _fast_answer(tokens, doc, kb_data), "score": 1.0, "path": kb_data["paths"][doc], "index": doc}
+
+# --- DENSE RETRIEVAL ---
+
+def _dense_tokens(text):
+    """Words of a record or query for the dense encoder: key boundaries split, stopwords dropped, aliases applied."""
+    words = DENSE_TOKEN_PATTERN.findall(KEY_BOUNDARY.sub(" ", text).lower())
+    return [DENSE_ALIASES.get(w, w) for w in words if w not in DENSE_STOPWORDS]
+
+def _feature_hash(feature):
+    """Stable across processes (unlike hash()), so stored embeddings match new queries."""
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % DENSE_DIM, 1.0 if h & 0x80000000 else -1.0
+
+@lru_cache(maxsize=65536)
+def _word_features(word):
+    """
+    Signed hashed features of one word: the word itself plus its character n-grams,
+    so 'vacations', 'vaction' and 'vacation' share most of their vector.
+    """
+    features = [(word, DENSE_NUMBER_WEIGHT if word.isdigit() else 1.0)]
+    if not word.isdigit():
+        padded = f"<{word}>"
+        ngrams = [padded[i:i + n] for n in DENSE_NGRAM_SIZES for i in range(len(padded) - n + 1)]
+        features += [(g, DENSE_NGRAM_WEIGHT / len(ngrams)) for g in ngrams]
+    buckets, values = [], []
+    for feature, weight in features:
+        bucket, sign = _feature_hash(feature)
+        buckets.append(bucket)
+        values.append(sign * weight)
+    return np.array(buckets, dtype=np.int64), np.array(values, dtype=np.float32)
+
+def _normalize_dense(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def _quantize(block):
+    """int8 codes and per-row float32 scales: row ~= codes * scale."""
+    scales = np.abs(block).max(axis=1) / 127
+    scales[scales == 0] = 1.0
+    return np.round(block / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+def encode_dense(texts):
+    """
+    Embed texts as L2-normalized rows of DENSE_DIM hashed features, stored as int8
+    codes plus a float32 scale per row (a quarter of float32's memory).
+    Returns (codes, scales).
+    """
+    vocabulary, indptr, indices = {}, [0], []
+    for text in texts:
+        indices.extend(vocabulary.setdefault(w, len(vocabulary)) for w in _dense_tokens(text))
+        indptr.append(len(indices))
+    doc_words = csr_matrix((np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int64),
+                            np.array(indptr, dtype=np.int64)), shape=(len(indptr) - 1, len(vocabulary)))
+    rows, cols, vals = [], [], []
+    for word, i in vocabulary.items():
+        buckets, values = _word_features(word)
+        rows.append(np.full(len(buckets), i))
+        cols.append(buckets)
+        vals.append(values)
+    word_features = csr_matrix(
+        (np.concatenate(vals) if vals else np.array([], dtype=np.float32),
+         (np.concatenate(rows) if rows else [], np.concatenate(cols) if cols else [])),
+        shape=(len(vocabulary), DENSE_DIM), dtype=np.float32,
+    )
+    sparse = (doc_words @ word_features).tocsr()
+    codes = np.empty((sparse.shape[0], DENSE_DIM), dtype=np.int8)
+    scales = np.empty(sparse.shape[0], dtype=np.float32)
+    for start in range(0, sparse.shape[0], DENSE_CHUNK_ROWS):
+        block = _normalize_dense(sparse[start:start + DENSE_CHUNK_ROWS].toarray())
+        codes[start:start + len(block)], scales[start:start + len(block)] = _quantize(block)
+    return codes, scales
+
+def encode_dense_query(text):
+    """encode_dense() for one query, as float32 for scoring."""
+    vector = np.zeros(DENSE_DIM, dtype=np.float32)
+    for word in _dense_tokens(text):
+        buckets, values = _word_features(word)
+        np.add.at(vector, buckets, values)
+    return _normalize_dense(vector)
+
+def _dense_rows(dense, docs):
+    """Dequantized float32 embeddings of the given rows."""
+    return dense["codes"][docs].astype(np.float32) * dense["scales"][docs, None]
+
+def _dense_scores(dense, docs, vector):
+    """Cosine of the given rows with vector; the scale is applied to the dot products, not the rows."""
+    return (dense["codes"][docs].astype(np.float32) @ vector) * dense["scales"][docs]
+
+def _dense_dot(codes, scales, vector):
+    """Cosine of every quantized row with vector, dequantizing a cache-sized chunk at a time."""
+    if not len(codes):
+        return np.array([], dtype=np.float32)
+    return np.concatenate([codes[start:start + DENSE_CHUNK_ROWS].astype(np.float32) @ vector
+                           for start in range(0, len(codes), DENSE_CHUNK_ROWS)]) * scales
+
+def _train_ivf(dense, n_lists, seed=0):
+    """Spherical k-means on a sample of the rows: returns unit-length float32 centroids."""
+    rng = np.random.default_rng(seed)
+    n_docs = len(dense["codes"])
+    n_sample = min(n_docs, n_lists * DENSE_KMEANS_SAMPLE_PER_LIST)
+    sample = _dense_rows(dense, np.sort(rng.choice(n_docs, n_sample, replace=False)))
+    centroids = sample[rng.choice(n_sample, n_lists, replace=False)]
+    for _ in range(DENSE_KMEANS_ITERATIONS):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        one_hot = csr_matrix((np.ones(n_sample, dtype=np.float32), (assign, np.arange(n_sample))),
+                             shape=(n_lists, n_sample))
+        sums = one_hot @ sample
+        empty = np.flatnonzero(np.bincount(assign, minlength=n_lists) == 0)
+        sums[empty] = sample[rng.choice(n_sample, len(empty))]
+        centroids = _normalize_dense(sums)
+    return centroids
+
+def _assign_lists(codes, centroids):
+    """Nearest centroid of every row, in chunks (the per-row scale does not change the argmax)."""
+    return np.concatenate([
+        np.argmax(codes[start:start + DENSE_CHUNK_ROWS].astype(np.float32) @ centroids.T, axis=1)
+        for start in range(0, len(codes), DENSE_CHUNK_ROWS)
+    ]).astype(np.int32)
+
+def _dense_index(codes, scales, centroids=None, assign=None):
+    """Wrap quantized embeddings (and optional IVF centroids/assignments) for searching."""
+    dense = {"codes": codes, "scales": scales, "centroids": centroids, "assign": assign, "lists": None}
+    if centroids is not None:
+        order = np.argsort(assign, kind="stable")
+        dense["lists"] = (order, np.searchsorted(assign[order], np.arange(len(centroids) + 1)))
+    return dense
+
+def build_dense_index(corpus, embeddings=None):
+    """Embed the corpus (unless embeddings are given) and add an IVF index once the KB is large."""
+    codes, scales = encode_dense(corpus) if embeddings is None else embeddings
+    dense = _dense_index(codes, scales)
+    if len(codes) < DENSE_IVF_MIN_DOCS:
+        return dense
+    centroids = _train_ivf(dense, int(np.sqrt(len(codes))))
+    return _dense_index(codes, scales, centroids, _assign_lists(codes, centroids))
+
+def _update_dense_index(old_dense, reused, fresh, corpus):
+    """Dense counterpart of update_knowledge_base(): reuse rows of unchanged records, embed the rest."""
+    codes = np.empty((len(corpus), DENSE_DIM), dtype=np.int8)
+    scales = np.empty(len(corpus), dtype=np.float32)
+    new_rows = np.array([new for new, _ in reused], dtype=np.int64)
+    old_rows = np.array([old for _, old in reused], dtype=np.int64)
+    codes[new_rows], scales[new_rows] = old_dense["codes"][old_rows], old_dense["scales"][old_rows]
+    if fresh:
+        codes[fresh], scales[fresh] = encode_dense([corpus[doc] for doc in fresh])
+    centroids = old_dense["centroids"]
+    if centroids is None or len(codes) < DENSE_IVF_MIN_DOCS:
+        return build_dense_index(corpus, (codes, scales))
+    # Keep the trained centroids; only new rows need assigning
+    assign = np.empty(len(codes), dtype=np.int32)
+    assign[new_rows] = old_dense["assign"][old_rows]
+    if fresh:
+        assign[fresh] = _assign_lists(codes[fresh], centroids)
+    return _dense_index(codes, scales, centroids, assign)
+
+def dense_index_bytes(dense):
+    """Memory taken by a dense index: codes, scales and any IVF arrays."""
+    return sum(a.nbytes for a in (dense["codes"], dense["scales"], dense["centroids"], dense["assign"])
+               if a is not None)
+
+def _write_dense(dense, directory):
+    arrays = {"dense.codes": dense["codes"], "dense.scales": dense["scales"]}
+    if dense["centroids"] is not None:
+        arrays.update({"dense.centroids": dense["centroids"], "dense.assign": dense["assign"]})
+    for name, array in arrays.items():
+        # Written beside the other files and renamed, so readers never see a partial array
+        tmp_path = os.path.join(directory, f".{name}.tmp.npy")
+        np.save(tmp_path, np.ascontiguousarray(array))
+        os.replace(tmp_path, os.path.join(directory, f"{name}.npy"))
+    with open(os.path.join(directory, ".dense.json.tmp"), "w", encoding="utf-8") as f:
+        json.dump({"encoder": DENSE_ENCODER_VERSION, "dim": DENSE_DIM}, f)
+    os.replace(os.path.join(directory, ".dense.json.tmp"), os.path.join(directory, "dense.json"))
+
+def _read_dense(directory):
+    """Memory-map stored embeddings, or None if missing or made by another encoder setup."""
+    try:
+        with open(os.path.join(directory, "dense.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    if meta != {"encoder": DENSE_ENCODER_VERSION, "dim": DENSE_DIM}:
+        return None
+
+    def array(name):
+        path = os.path.join(directory, f"{name}.npy")
+        return np.load(path, mmap_mode="r") if os.path.exists(path) else None
+
+    return _dense_index(array("dense.codes"), array("dense.scales"), array("dense.centroids"), array("dense.assign"))
+
+def dense_top_k(vector, dense, k):
+    """Best k (doc_id, cosine) pairs: a full scan, or the DENSE_NPROBE closest IVF lists."""
+    lists = dense["lists"]
+    if lists is None:
+        return _best(np.arange(len(dense["codes"])), _dense_dot(dense["codes"], dense["scales"], vector), k)
+    order, bounds = lists
+    centroid_scores = dense["centroids"] @ vector
+    nprobe = min(DENSE_NPROBE, len(centroid_scores))
+    probed = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+    candidates = np.sort(np.concatenate([order[bounds[c]:bounds[c + 1]] for c in probed]))
+    return _best(candidates, _dense_scores(dense, candidates, vector), k)
+
+def _hybrid_top_k(query, terms, weights, kb_data, k, threshold):
+    """
+    Blend lexical and dense similarity: candidates are the best HYBRID_CANDIDATES of each
+    ranking, and every candidate gets its exact TF-IDF cosine and dense cosine.
+    """
+    dense = kb_data["dense"]
+    vector = encode_dense_query(query)
+    # Exact cosines of every document sharing a term, sorted by doc id
+    lexical_docs, lexical_scores = _accumulate(terms, weights, kb_data["inverted_index"])
+    candidates = {doc for doc, _ in _best(lexical_docs, lexical_scores, HYBRID_CANDIDATES)}
+    candidates.update(doc for doc, _ in dense_top_k(vector, dense, HYBRID_CANDIDATES))
+    if not candidates:
+        return []
+    docs = np.array(sorted(candidates), dtype=np.int64)
+    lexical = _entry_lookup(lexical_docs, lexical_scores, docs) if len(lexical_docs) else np.zeros(len(docs))
+    semantic = _dense_scores(dense, docs, vector)
+    scores = (1 - HYBRID_WEIGHT) * lexical + HYBRID_WEIGHT * semantic
+    keep = scores > threshold
+    return _best(docs[keep], scores[keep], k)
+
+def build_inverted_index(tfidf_matrix):
+    """Postings per vocabulary term: row t of the result holds (doc ids, weights) for term t."""
+    inverted_index = tfidf_matrix.T.tocsr()
+    inverted_index.sort_indices()
+    return inverted_index
+
+def _term_max_weights(inverted_index):
+    """Largest weight each term has in any document (the MaxScore upper bound)."""
+    return inverted_index.max(axis=1).toarray().ravel()
+
+def get_kb_record(kb_data, index):
+    """
+    Resolve the raw KB value for a document index from its dotted path, or from the
+    artifact's stored records when the index was attached without the KB dict.
+    """
+    if kb_data["kb_dict"] is None:
+        return json.loads(kb_data["records"][index])
+    value = kb_data["kb_dict"]
+    for part in kb_data["paths"][index].split("."):
+        value = value[int(part)] if isinstance(value, list) else value[part]
+    return value
+
+def _split_essential(terms, weights, term_max_weight, threshold):
+    """
+    MaxScore split of query terms. Common terms whose best-case contributions sum
+    to at most the threshold cannot lift a document over it on their own, so only
+    the remaining 'essential' terms are used to generate candidates.
+    Returns (essential positions, non-essential positions) into terms.
+    """
+    bounds = weights * term_max_weight[terms]
+    order = np.argsort(bounds)
+    n_optional = np.searchsorted(np.cumsum(bounds[order]), threshold, side="right")
+    return order[n_optional:], order[:n_optional]
+
+def _accumulate(terms, weights, inverted_index):
+    """Sum the postings of the given terms into (candidate doc ids, partial scores)."""
+    if len(terms) == 0:
+        return np.array([], dtype=np.int64), np.array([])
+    indptr, indices, data = inverted_index.indptr, inverted_index.indices, inverted_index.data
+    docs = np.concatenate([indices[indptr[t]:indptr[t + 1]] for t in terms])
+    contributions = np.concatenate([data[indptr[t]:indptr[t + 1]] * w for t, w in zip(terms, weights)])
+    n_docs = inverted_index.shape[1]
+    if len(docs) * 8 > n_docs:
+        # Postings cover a good share of the KB: a dense accumulator beats sorting
+        scores = np.bincount(docs, weights=contributions, minlength=n_docs)
+        candidates = np.flatnonzero(scores)
+        return candidates, scores[candidates]
+    candidates, inverse = np.unique(docs, return_inverse=True)
+    return candidates, np.bincount(inverse, weights=contributions)
+
+def _postings_lookup(inverted_index, term, docs):
+    """Weight of term in each of docs (0 where absent), by binary search in its postings."""
+    lo, hi = inverted_index.indptr[term], inverted_index.indptr[term + 1]
+    if lo == hi or len(docs) == 0:
+        return np.zeros(len(docs))
+    postings = inverted_index.indices[lo:hi]
+    docs = docs.astype(postings.dtype, copy=False)
+    pos = np.minimum(np.searchsorted(postings, docs), hi - lo - 1)
+    return np.where(postings[pos] == docs, inverted_index.data[lo:hi][pos], 0.0)
+
+def _top_k(terms, weights, kb_data, k, threshold):
+    """
+    Score only documents in the postings of the query's essential terms and return
+    the best k as (doc_id, score) pairs. Rows are L2-normalized, so the dot product
+    is the cosine.
+    """
+    inverted_index, term_max_weight = kb_data["inverted_index"], kb_data["term_max_weight"]
+    essential, optional = _split_essential(terms, weights, term_max_weight, threshold)
+    candidates, scores = _accumulate(terms[essential], weights[essential], inverted_index)
+    if len(optional):
+        # Drop candidates that stay under the threshold even if every common term matched
+        optional_bound = float(np.dot(weights[optional], term_max_weight[terms[optional]]))
+        keep = scores + optional_bound > threshold
+        candidates, scores = candidates[keep], scores[keep]
+        for t, w in zip(terms[optional], weights[optional]):
+            scores = scores + w * _postings_lookup(inverted_index, t, candidates)
+    keep = scores > threshold
+    return _best(candidates[keep], scores[keep], k)
+
+def _best(candidates, scores, k):
+    """Best k (doc_id, score) pairs, highest score first."""
+    if len(scores) > 4 * k:
+        top = np.argpartition(-scores, k)[:k]
+        candidates, scores = candidates[top], scores[top]
+    return [(doc, score) for score, doc in heapq.nlargest(k, zip(scores.tolist(), candidates.tolist()))]
+
+def _ranked_results(hits, kb_data):
+    mapping, paths = kb_data["mapping"], kb_data["paths"]
+    return [
+        {"answer": mapping[doc], "score": score, "path": paths[doc], "index": doc}
+        for doc, score in hits
+    ]
+
+def search_knowledge_base_ranked(query, kb_data, k=5, threshold=SIMILARITY_THRESHOLD):
+    """
+    Rank KB records for a query using the inverted index, blended with dense
+    similarity when the KB has embeddings. Returns up to k dicts with answer,
+    score, path and index, best first, keeping only scores above the threshold.
+    """
+    terms, weights = kb_data["vectorizer"].terms(query)
+    if kb_data.get("dense") is not None:
+        return _ranked_results(_hybrid_top_k(query, terms, weights, kb_data, k, threshold), kb_data)
+    return _ranked_results(_top_k(terms, weights, kb_data, k, threshold), kb_data)
+
+def _split_query_matrix(query_matrix, term_max_weight, threshold):
+    """Apply _split_essential() row by row: returns (essential, non-essential) query matrices."""
+    essential = np.zeros(query_matrix.nnz, dtype=bool)
+    indptr, indices, data = query_matrix.indptr, query_matrix.indices, query_matrix.data
+    for row in range(query_matrix.shape[0]):
+        lo, hi = indptr[row], indptr[row + 1]
+        keep, _ = _split_essential(indices[lo:hi], data[lo:hi], term_max_weight, threshold)
+        essential[lo + keep] = True
+    parts = []
+    for mask in (essential, ~essential):
+        part = csr_matrix((np.where(mask, data, 0.0), indices.copy(), indptr.copy()), shape=query_matrix.shape)
+        part.eliminate_zeros()
+        parts.append(part)
+    return parts
+
+def _candidate_budget_slices(query_matrix, postings_lengths, max_candidates):
+    """Split a chunk of query rows so each slice's score matrix stays under max_candidates entries."""
+    estimates = (query_matrix != 0).astype(np.int64) @ postings_lengths
+    start, total = 0, 0
+    for row, estimate in enumerate(estimates):
+        if total and total + estimate > max_candidates:
+            yield start, row
+            start, total = row, 0
+        total += estimate
+    yield start, query_matrix.shape[0]
+
+def _entry_lookup(entry_keys, values, keys):
+    """Values of a sorted-key sparse matrix at the given keys (0 where absent)."""
+    pos = np.minimum(np.searchsorted(entry_keys, keys), len(entry_keys) - 1)
+    return np.where(entry_keys[pos] == keys, values[pos], 0.0)
+
+def _score_slice(essential, optional, kb_data, entry_keys, threshold):
+    """
+    One sparse product over the essential terms yields every (query, doc) candidate;
+    non-essential term weights are then looked up for the surviving pairs only.
+    Returns (rows, docs, scores) above the threshold, ordered by row.
+    """
+    scores = (essential @ kb_data["inverted_index"]).tocoo()
+    rows, docs, values = scores.row, scores.col, scores.data
+
+    # Drop pairs that stay under the threshold even if every common term matched
+    term_max_weight = kb_data["term_max_weight"]
+    bounds = csr_matrix((optional.data * term_max_weight[optional.indices], optional.indices, optional.indptr),
+                        shape=optional.shape)
+    keep = values + np.asarray(bounds.sum(axis=1)).ravel()[rows] > threshold
+    order = np.argsort(rows[keep], kind="stable")
+    rows, docs, values = rows[keep][order], docs[keep][order], values[keep][order]
+
+    # Expand each pair by its query's non-essential terms and add their weights
+    counts = np.diff(optional.indptr)[rows]
+    if counts.sum():
+        pair = np.repeat(np.arange(len(rows)), counts)
+        offsets = np.arange(len(pair)) - np.repeat(np.cumsum(counts) - counts, counts)
+        entry = optional.indptr[rows[pair]] + offsets
+        tfidf_matrix = kb_data["tfidf_matrix"]
+        doc_weights = _entry_lookup(
+            entry_keys, tfidf_matrix.data,
+            docs[pair].astype(np.int64) * tfidf_matrix.shape[1] + optional.indices[entry]
+        )
+        values = values + np.bincount(pair, weights=optional.data[entry] * doc_weights, minlength=len(rows))
+
+    keep = values > threshold
+    return rows[keep], docs[keep], values[keep]
+
+def search_knowledge_base_batch(queries, kb_data, k=5, threshold=SIMILARITY_THRESHOLD,
+                                chunk_size=BATCH_CHUNK_SIZE, max_candidates=BATCH_MAX_CANDIDATES):
+    """
+    Rank KB records for many queries at once.
+    Queries are vectorized chunk_size at a time and scored with one sparse matrix
+    product per slice, sized so no slice holds more than max_candidates candidates.
+    Returns one list per query, shaped like search_knowledge_base_ranked().
+    Scoring is lexical only, even when the KB has embeddings.
+    """
+    vectorizer, inverted_index = kb_data["vectorizer"], kb_data["inverted_index"]
+    postings_lengths = np.diff(inverted_index.indptr)
+    # (doc * n_terms + term) for every TF-IDF entry: sorted, since rows have sorted indices
     tfidf_matrix = kb_data["tfidf_matrix"]
-    mapping = kb_data["mapping"]
+    entry_keys = (np.repeat(np.arange(tfidf_matrix.shape[0], dtype=np.int64), np.diff(tfidf_matrix.indptr))
+                  * tfidf_matrix.shape[1] + tfidf_matrix.indices)
+    queries = iter(queries)
+    results = []
+    while True:
+        chunk = list(islice(queries, chunk_size))
+        if not chunk:
+            return results
+        query_matrix = vectorizer.transform(chunk)
+        essential, optional = _split_query_matrix(query_matrix, kb_data["term_max_weight"], threshold)
+        for start, end in _candidate_budget_slices(essential, postings_lengths, max_candidates):
+            rows, docs, scores = _score_slice(essential[start:end], optional[start:end], kb_data, entry_keys, threshold)
+            bounds = np.searchsorted(rows, np.arange(end - start + 1))
+            for row in range(end - start):
+                lo, hi = bounds[row], bounds[row + 1]
+                results.append(_ranked_results(_best(docs[lo:hi], scores[lo:hi], k), kb_data))
+
+def search_knowledge_base(query, kb_data, fast_path=FAST_PATH_ENABLED):
+    """
+    Search KB using TF-IDF similarity. Returns the best answer or KB_MISS_MESSAGE.
+    Questions naming a single record are answered by the fast path first.
+    """
+    if fast_path:
+        hit = resolve_fast_path(query, kb_data)
+        if hit is not None:
+            return hit["answer"]
+    results = search_knowledge_base_ranked(query, kb_data, k=1)
+    if results:
+        return results[0]["answer"]
+    return KB_MISS_MESSAGE
+
 
-    query_vec = vectorizer.transform([query])
-    similarities = cosine_similarity(query_vec, tfidf_matrix).flatten()
-    best_idx = similarities.argmax()
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Knowledge base index tools")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="build and publish the index artifact for KB_DICT")
+    build_parser.add_argument("--index-dir", default=KB_INDEX_DIR)
+    build_parser.add_argument("--dense", action="store_true", default=DENSE_ENABLED,
+                              help="also store embeddings for hybrid search (default: KB_DENSE)")
+    build_parser.add_argument("--watch", action="store_true",
+                              help="keep running as the builder: republish whenever a file in kb/ changes")
+    args = parser.parse_args()
 
-    if similarities[best_idx] > 0.3:
-        return mapping[best_idx]
-    return "I'm still learning about the college."
+    if args.command == "build":
+        start = time.perf_counter()
+        kb_data = build_knowledge_base(KB_DICT, args.dense)
+        version_dir = write_index_artifact(kb_data, args.index_dir)
+        publish_index_version(version_dir, args.index_dir)
+        print(f"Published {version_dir}: {len(kb_data['mapping'])} records, "
+              f"{len(kb_data['vectorizer'].vocabulary_)} terms in {time.perf_counter() - start:.2f}s")
+        if args.watch:
+            _active_kb = kb_data
+            watch_knowledge_base(KB_DIR, args.index_dir)
+            print(f"Watching {KB_DIR} for changes (Ctrl+C to stop)")
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                pass
@@ -0,0 +1,233 @@
+# llm_client.py
+import json
+import os
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import retry, retry_if_exception, stop_after_attempt, stop_after_delay, wait_random_exponential
+
+# --- SETTINGS ---
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "3"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "15"))
+# No retry starts once this long has passed since the first attempt
+LLM_RETRY_DEADLINE_SECONDS = float(os.getenv("LLM_RETRY_DEADLINE_SECONDS", "10"))
+LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "4"))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+RETRY_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+# One keep-alive pool per process, sized so every allowed request gets a connection.
+# The semaphore caps in-flight calls so a slow upstream cannot pin every script thread.
+_session = None
+_session_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+
+class LLMError(Exception):
+    """The upstream LLM call failed after all retries."""
+
+
+class RetryableLLMError(LLMError):
+    """Transient upstream failure (connection error, timeout, 429/5xx)."""
+
+
+class CircuitOpenError(LLMError):
+    """The backend's circuit is open, so the call was not attempted."""
+
+
+# --- CIRCUIT BREAKER ---
+class CircuitBreaker:
+    """
+    Stops calling a failing upstream. After failure_threshold consecutive failures the
+    circuit opens and calls are refused for reset_timeout seconds; then one half-open
+    probe is let through, and its outcome closes the circuit or re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout=BREAKER_RESET_SECONDS, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self.successes = 0
+        self.total_failures = 0
+        self.rejected = 0
+        self.trips = 0
+
+    def allow(self):
+        """True if a call may go upstream now; refused calls are counted."""
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+            if self._state == self.CLOSED:
+                return True
+            # A probe whose caller never reported back does not block the next one forever
+            now = self._clock()
+            if self._state == self.HALF_OPEN and (not self._probing or now - self._probe_started >= self.reset_timeout):
+                self._probing = True
+                self._probe_started = now
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self._failures = 0
+            self._probing = False
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self.total_failures += 1
+            self._failures += 1
+            self._probing = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.trips += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+    def state(self):
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def stats(self):
+        """State and counters for the admin dashboard."""
+        state = self.state()
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": state,
+                "consecutive_failures": self._failures,
+                "successes": self.successes,
+                "failures": self.total_failures,
+                "rejected": self.rejected,
+                "trips": self.trips,
+            }
+
+    def call(self, fn, *args, **kwargs):
+        """Run fn through the breaker; raises CircuitOpenError while the circuit is open."""
+        if not self.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+def get_session():
+    """Process-wide requests.Session with a connection pool of LLM_MAX_CONCURRENCY."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=LLM_MAX_CONCURRENCY)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def close_session():
+    """Drop pooled connections, e.g. on shutdown or in tests."""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+def _is_retryable(exc):
+    return isinstance(exc, RetryableLLMError)
+
+
+_retrying = retry(
+    retry=retry_if_exception(_is_retryable),
+    wait=wait_random_exponential(multiplier=LLM_BACKOFF_SECONDS, max=LLM_BACKOFF_MAX_SECONDS),
+    stop=stop_after_attempt(LLM_MAX_ATTEMPTS) | stop_after_delay(LLM_RETRY_DEADLINE_SECONDS),
+    reraise=True,
+)
+
+
+def _send(url, payload, headers, stream):
+    """One POST; transient failures become RetryableLLMError, others LLMError."""
+    try:
+        response = get_session().post(url, json=payload, headers=headers, stream=stream,
+                                      timeout=(LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT))
+    except requests.ReadTimeout as e:
+        # The upstream has the prompt and may still be generating; a retry would pay for it twice
+        raise LLMError(f"No response from {url} within {LLM_READ_TIMEOUT:g}s") from e
+    except (requests.ConnectionError, requests.Timeout) as e:
+        raise RetryableLLMError(str(e)) from e
+    except requests.RequestException as e:
+        raise LLMError(str(e)) from e
+
+    if response.status_code in RETRY_STATUS_CODES:
+        response.close()
+        raise RetryableLLMError(f"HTTP {response.status_code} from {url}")
+    if response.status_code >= 400:
+        response.close()
+        raise LLMError(f"HTTP {response.status_code} from {url}")
+    return response
+
+
+def post_json(url, payload, headers=None):
+    """POST and return the decoded JSON body, retrying transient failures with jittered backoff."""
+    @_retrying
+    def attempt():
+        response = _send(url, payload, headers, stream=False)
+        try:
+            return response.json()
+        except ValueError as e:
+            raise LLMError(f"Invalid JSON from {url}") from e
+
+    with _slots:
+        return attempt()
+
+
+def _decode_line(line):
+    """Parse one streamed line: newline-delimited JSON or an SSE 'data:' event."""
+    line = line.decode("utf-8").strip()
+    if line.startswith("data:"):
+        line = line[5:].strip()
+    if not line or line == "[DONE]":
+        return None
+    return json.loads(line)
+
+
+def stream_json(url, payload, headers=None):
+    """
+    POST with a streamed response and yield each decoded JSON chunk as it arrives.
+    Only establishing the stream is retried; a failure mid-stream raises LLMError.
+    """
+    with _slots:
+        response = _retrying(_send)(url, payload, headers, stream=True)
+        try:
+            for line in response.iter_lines():
+                chunk = _decode_line(line)
+                if chunk is not None:
+                    yield chunk
+        except (requests.RequestException, ValueError) as e:
+            raise LLMError(f"Stream from {url} broke off: {e}") from e
+        finally:
+            response.close()
@@ -1,10 +1,48 @@
 # llm_handler.py
 import os
-import requests
+import re
+import threading
+import time
+from collections import Counter
+import numpy as np
+from kb_manager import search_knowledge_base_ranked, get_kb_record
+from llm_client import post_json, stream_json, CircuitBreaker, CircuitOpenError
+from metrics_manager import METRICS
 
 # Gemini API Key from environment variable
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 GEMINI_API_URL = "https://api.generative.google/v1beta2/models/text-bison-001:generate"
+# Same request body; the reply arrives as one {"candidates": [...]} JSON object per line
+GEMINI_STREAM_URL = os.getenv("GEMINI_STREAM_URL", GEMINI_API_URL.replace(":generate", ":streamGenerate"))
+
+# Local model server speaking the Ollama /api/generate protocol
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "llama3")
+
+FALLBACK_MISS_MESSAGE = "Sorry, I could not find an answer in the knowledge base."
+
+# Only the top-ranked KB records go into the prompt, within a rough token budget
+PROMPT_TOP_K = int(os.getenv("LLM_PROMPT_TOP_K", "8"))
+PROMPT_TOKEN_BUDGET = int(os.getenv("LLM_PROMPT_TOKEN_BUDGET", "1500"))
+CHARS_PER_TOKEN = 4
+
+_kb_lines_cache = {}
+_kb_lines_lock = threading.Lock()
+
+# Offline fallback matcher: BM25 over KB lines, with trigram spelling correction
+# Words split at underscores, camelCase and digits: "SecondSem_Mid1" -> second, sem, mid, 1
+FALLBACK_TOKEN_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+|[^\W\d_A-Za-z]+")
+FALLBACK_STOPWORDS = frozenset(
+    "a an and are about can do does for from how i in is it me my of on or please tell "
+    "the to what when where which who whom why with".split()
+)
+FALLBACK_MIN_COVERAGE = 0.5
+FALLBACK_MIN_SIMILARITY = 0.5
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_fallback_index_cache = {}
+_fallback_index_lock = threading.Lock()
 
 def flatten_for_prompt(kb_dict, prefix=""):
     """
@@ -22,48 +60,304 @@ def flatten_for_prompt(kb_dict, prefix=""):
         lines.append(f"{prefix[:-1]}: {kb_dict}")
     return lines
 
-def generate_llm_response(query, kb_data=None):
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) for prompt budgeting."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+def get_kb_lines(kb_data):
+    """
+    flatten_for_prompt() lines for every KB record, computed once per KB version.
+    Returns (all lines, per-record lists of lines indexed like the KB documents).
     """
-    Generate response using Gemini API.
-    Falls back to KB if Gemini fails.
+    version = kb_data.get("version")
+    cached = _kb_lines_cache.get(version)
+    if cached is None:
+        with _kb_lines_lock:
+            cached = _kb_lines_cache.get(version)
+            if cached is None:
+                paths = kb_data["paths"]
+                per_record = [flatten_for_prompt(get_kb_record(kb_data, i), f"{paths[i]}.")
+                              for i in range(len(paths))]
+                cached = ([line for lines in per_record for line in lines], per_record)
+                # Only the current version is ever asked for again
+                _kb_lines_cache.clear()
+                _kb_lines_cache[version] = cached
+    return cached
+
+def build_prompt(query, kb_data=None, k=PROMPT_TOP_K, token_budget=PROMPT_TOKEN_BUDGET):
     """
-    # Flatten KB
-    kb_lines = flatten_for_prompt(kb_data.get("kb_dict", {})) if kb_data else []
-    prompt_text = "\n".join(kb_lines) + "\n\nUser Query: " + query
+    Prompt with the query and the KB records the retriever ranks most relevant to it,
+    best first, stopping before the token budget is exceeded.
+    """
+    suffix = "\n\nUser Query: " + query
+    if not kb_data:
+        return suffix.lstrip()
+    _, per_record = get_kb_lines(kb_data)
+    used = estimate_tokens(suffix)
+    context = []
+    for result in search_knowledge_base_ranked(query, kb_data, k=k, threshold=0.0):
+        lines = per_record[result["index"]]
+        cost = sum(estimate_tokens(line) for line in lines)
+        if used + cost > token_budget:
+            break
+        context.extend(lines)
+        used += cost
+    return "\n".join(context) + suffix
+
+# --- BACKENDS ---
+def _candidate_text(data):
+    candidates = data.get("candidates") if isinstance(data, dict) else None
+    if candidates:
+        return candidates[0].get("content", "")
+    return None
 
-    # Gemini API request
-    headers = {
+def _gemini_headers():
+    return {
         "Authorization": f"Bearer {GEMINI_API_KEY}",
         "Content-Type": "application/json"
     }
-    payload = {
-        "prompt": prompt_text,
+
+def _gemini_payload(prompt):
+    return {
+        "prompt": prompt,
         "temperature": 0.7,
         "max_output_tokens": 512
     }
 
-    try:
-        response = requests.post(GEMINI_API_URL, json=payload, headers=headers, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-        if "candidates" in data and data["candidates"]:
-            return data["candidates"][0].get("content", "Sorry, I could not generate an answer.")
-        else:
-            # Fallback
-            return fallback_kb_response(query, kb_lines)
-    except Exception as e:
-        print(f"[LLM ERROR] Gemini API failed: {e}")
-        # Fallback to KB only
-        return fallback_kb_response(query, kb_lines)
-
-def fallback_kb_response(query, kb_lines):
-    """
-    Simple KB-based fallback if LLM fails.
-    Returns best match line or generic message.
-    """
-    query_lower = query.lower()
-    matches = [line for line in kb_lines if query_lower in line.lower()]
+def _gemini_generate(prompt):
+    return _candidate_text(post_json(GEMINI_API_URL, _gemini_payload(prompt), _gemini_headers()))
+
+def _gemini_stream(prompt):
+    for data in stream_json(GEMINI_STREAM_URL, _gemini_payload(prompt), _gemini_headers()):
+        yield _candidate_text(data)
+
+def _ollama_generate(prompt):
+    data = post_json(OLLAMA_URL, {"model": OLLAMA_MODEL, "prompt": prompt, "stream": False})
+    return data.get("response")
+
+def _ollama_stream(prompt):
+    for data in stream_json(OLLAMA_URL, {"model": OLLAMA_MODEL, "prompt": prompt, "stream": True}):
+        yield data.get("response")
+
+# Each backend has its own circuit breaker, so an outage is skipped instead of waited out
+BACKENDS = {
+    "gemini": {"generate": _gemini_generate, "stream": _gemini_stream, "breaker": CircuitBreaker("gemini")},
+    "ollama": {"generate": _ollama_generate, "stream": _ollama_stream, "breaker": CircuitBreaker("ollama")},
+}
+
+# Tried in order, e.g. LLM_BACKENDS=ollama,gemini for local-first answers
+LLM_BACKENDS = [name.strip() for name in os.getenv("LLM_BACKENDS", "gemini").split(",") if name.strip() in BACKENDS]
+METRICS.set_info(llm_backends=",".join(LLM_BACKENDS), ollama_model=OLLAMA_MODEL)
+
+def llm_backend_status():
+    """Circuit state and counters of every configured backend, in the order they are tried."""
+    return [BACKENDS[name]["breaker"].stats() for name in LLM_BACKENDS]
+
+# --- GENERATION ---
+def generate_llm_response(query, kb_data=None, outcome=None):
+    """
+    Generate response using the configured LLM backends.
+    Falls back to KB if every backend fails or has an open circuit.
+    If given, the outcome dict receives the answer's "source": "llm", or "fallback" for the KB fallback.
+    """
+    outcome = {} if outcome is None else outcome
+    outcome["source"] = "llm"
+    prompt_text = build_prompt(query, kb_data)
+
+    for name in LLM_BACKENDS:
+        backend = BACKENDS[name]
+        start = time.perf_counter()
+        try:
+            text = backend["breaker"].call(backend["generate"], prompt_text)
+        except CircuitOpenError:
+            METRICS.inc("llm_skipped_total", backend=name)
+            continue
+        except Exception as e:
+            print(f"[LLM ERROR] {name} failed: {e}")
+            METRICS.inc("llm_errors_total", backend=name)
+            METRICS.observe("llm_request_seconds", time.perf_counter() - start, backend=name, outcome="failure")
+            continue
+        METRICS.observe("llm_request_seconds", time.perf_counter() - start, backend=name, outcome="success")
+        if text:
+            return text
+    # Fallback to KB only
+    outcome["source"] = "fallback"
+    return _kb_fallback(query, kb_data)
+
+def stream_llm_response(query, kb_data=None, outcome=None):
+    """
+    Like generate_llm_response(), but yields the answer in chunks as the backend streams them.
+    A backend that fails before producing any text is skipped; the KB answer is the last resort.
+    If given, the outcome dict receives the "source" as generate_llm_response() reports it, and
+    "complete": False when a backend broke off mid-answer, so the text yielded so far is cut
+    short and must not be cached.
+    """
+    outcome = {} if outcome is None else outcome
+    outcome["source"] = "llm"
+    outcome["complete"] = True
+    prompt_text = build_prompt(query, kb_data)
+
+    for name in LLM_BACKENDS:
+        backend = BACKENDS[name]
+        breaker = backend["breaker"]
+        if not breaker.allow():
+            METRICS.inc("llm_skipped_total", backend=name)
+            continue
+        start = time.perf_counter()
+        produced = False
+        result = None
+        try:
+            for text in backend["stream"](prompt_text):
+                if text:
+                    produced = True
+                    yield text
+            result = "success"
+        except Exception as e:
+            print(f"[LLM ERROR] {name} stream failed: {e}")
+            METRICS.inc("llm_errors_total", backend=name)
+            result = "failure"
+        finally:
+            # result stays None if the reader stopped consuming mid-answer
+            METRICS.observe("llm_request_seconds", time.perf_counter() - start, backend=name, outcome=result or "abandoned")
+            if result == "failure":
+                breaker.record_failure()
+            elif result == "success" or produced:
+                breaker.record_success()
+        if produced:
+            # Text already went out, so another backend cannot take over a broken-off answer
+            if result == "failure":
+                METRICS.inc("llm_truncated_total", backend=name)
+                outcome["complete"] = False
+            return
+    outcome["source"] = "fallback"
+    yield _kb_fallback(query, kb_data)
+
+# --- FALLBACK INDEX ---
+def _fallback_tokens(text):
+    return [token.lower() for token in FALLBACK_TOKEN_PATTERN.findall(text)]
+
+def _trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def build_fallback_index(kb_lines):
+    """
+    Precompute everything fallback_kb_response() needs: token postings with BM25 weights
+    per line and a trigram index over the vocabulary for misspelled query words.
+    """
+    postings = {}
+    lengths = np.zeros(len(kb_lines), dtype=np.float32)
+    for line_id, line in enumerate(kb_lines):
+        tokens = _fallback_tokens(line)
+        lengths[line_id] = len(tokens)
+        for token, tf in Counter(tokens).items():
+            postings.setdefault(token, ([], []))
+            postings[token][0].append(line_id)
+            postings[token][1].append(tf)
+
+    n_lines = max(len(kb_lines), 1)
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(float(lengths.mean()) if len(kb_lines) else 1.0, 1.0))
+    index = {}
+    for token, (ids, tfs) in postings.items():
+        ids = np.array(ids, dtype=np.int32)
+        tfs = np.array(tfs, dtype=np.float32)
+        idf = np.log(1 + (n_lines - len(ids) + 0.5) / (len(ids) + 0.5))
+        index[token] = (ids, tfs * (BM25_K1 + 1) / (tfs + norm[ids]), idf)
+
+    vocabulary = list(index)
+    trigram_postings = {}
+    for term_id, token in enumerate(vocabulary):
+        for gram in _trigrams(token):
+            trigram_postings.setdefault(gram, []).append(term_id)
+    max_idf = max((entry[2] for entry in index.values()), default=1.0)
+    return {"lines": kb_lines, "postings": index, "vocabulary": vocabulary,
+            "trigrams": trigram_postings, "max_idf": max_idf}
+
+def get_fallback_index(kb_data):
+    """build_fallback_index() over the KB's prompt lines, built on first use per KB version."""
+    version = kb_data.get("version")
+    cached = _fallback_index_cache.get(version)
+    if cached is None:
+        with _fallback_index_lock:
+            cached = _fallback_index_cache.get(version)
+            if cached is None:
+                cached = build_fallback_index(get_kb_lines(kb_data)[0])
+                _fallback_index_cache.clear()
+                _fallback_index_cache[version] = cached
+    return cached
+
+def _closest_terms(token, index, limit=2):
+    """Vocabulary terms whose trigram Jaccard similarity to token clears FALLBACK_MIN_SIMILARITY."""
+    grams = _trigrams(token)
+    shared = Counter()
+    for gram in grams:
+        shared.update(index["trigrams"].get(gram, ()))
+    vocabulary = index["vocabulary"]
+    scored = []
+    for term_id, common in shared.items():
+        # A padded token of n characters has n trigrams
+        similarity = common / (len(grams) + len(vocabulary[term_id]) - common)
+        if similarity >= FALLBACK_MIN_SIMILARITY:
+            scored.append((similarity, vocabulary[term_id]))
+    return sorted(scored, reverse=True)[:limit]
+
+def fallback_kb_matches(query, index, k=5):
+    """
+    Rank KB lines for query with BM25, touching only the postings of the query's words
+    (or their closest spellings). Returns up to k (line, score) pairs, best first, and
+    nothing if the matched words carry less than FALLBACK_MIN_COVERAGE of the query's weight.
+    """
+    tokens = [t for t in _fallback_tokens(query) if t not in FALLBACK_STOPWORDS]
+    if not tokens or not index["lines"]:
+        return []
+    postings = index["postings"]
+    ids, weights = [], []
+    wanted = matched = 0.0
+    for token in dict.fromkeys(tokens):
+        entry = postings.get(token)
+        if entry is not None:
+            wanted += entry[2]
+            matched += entry[2]
+            ids.append(entry[0])
+            weights.append(entry[1] * entry[2])
+            continue
+        wanted += index["max_idf"]
+        if len(token) < 4:
+            continue
+        closest = _closest_terms(token, index)
+        if closest:
+            matched += closest[0][0] * index["max_idf"]
+        for similarity, term in closest:
+            term_ids, term_weights, idf = postings[term]
+            ids.append(term_ids)
+            weights.append(term_weights * idf * similarity)
+    if not ids or matched < FALLBACK_MIN_COVERAGE * wanted:
+        return []
+
+    candidates, inverse = np.unique(np.concatenate(ids), return_inverse=True)
+    scores = np.bincount(inverse, weights=np.concatenate(weights))
+    top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k] if len(scores) > k else np.arange(len(scores))
+    top = top[np.lexsort((candidates[top], -scores[top]))]
+    lines = index["lines"]
+    return [(lines[candidates[i]], float(scores[i])) for i in top]
+
+def _kb_fallback(query, kb_data):
+    if not kb_data:
+        return FALLBACK_MISS_MESSAGE
+    with METRICS.timer("chat_stage_seconds", stage="fallback"):
+        answer = fallback_kb_response(query, get_kb_lines(kb_data)[0], get_fallback_index(kb_data))
+    METRICS.inc("fallback_total", result="miss" if answer == FALLBACK_MISS_MESSAGE else "hit")
+    return answer
+
+def fallback_kb_response(query, kb_lines, index=None):
+    """
+    KB-based fallback if LLM fails.
+    Returns the best matching line or a generic message.
+    """
+    if index is None:
+        index = build_fallback_index(kb_lines)
+    matches = fallback_kb_matches(query, index, k=1)
     if matches:
-        return matches[0]
+        return matches[0][0]
     else:
-        return "Sorry, I could not find an answer in the knowledge base."
+        return FALLBACK_MISS_MESSAGE
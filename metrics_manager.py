@@ -0,0 +1,300 @@
+# metrics_manager.py
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- SETTINGS ---
+METRICS_LOG = os.getenv("METRICS_LOG", "metrics.jsonl")
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "60"))
+# Past this size the log is rotated to <log>.1, replacing the previous rotation
+METRICS_LOG_MAX_BYTES = int(os.getenv("METRICS_LOG_MAX_BYTES", str(8 << 20)))
+# Percentiles are taken over the most recent samples of each series
+METRICS_WINDOW = int(os.getenv("METRICS_WINDOW", "1000"))
+# Set to serve the Prometheus text format on http://<host>:<port>/metrics
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# The endpoint has no auth, so it listens on loopback unless told otherwise ("0.0.0.0" for all)
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+
+# Latency buckets in seconds, from a cached answer up to a slow LLM call
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+class Histogram:
+    """Cumulative bucket counts for Prometheus, plus a window of recent samples for percentiles."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=METRICS_WINDOW):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def summary(self):
+        """Count, mean and p50/p95/p99 in milliseconds."""
+        ordered = sorted(self.recent)
+        result = {"count": self.count, "mean_ms": round(self.sum / self.count * 1000, 3) if self.count else 0.0}
+        for p in (50, 95, 99):
+            result[f"p{p}_ms"] = round(_percentile(ordered, p) * 1000, 3) if ordered else 0.0
+        return result
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters and latency histograms, keyed by name and labels.
+
+    Every Streamlit session records into the same registry. snapshot() feeds the admin
+    tab and the periodic JSONL log; render_prometheus() the text endpoint.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._counters = {}     # name -> {label key: value}
+        self._histograms = {}   # name -> {label key: Histogram}
+        self._help = {}
+        self._info = {}
+        self.started_at = clock()
+
+    def describe(self, name, text):
+        """HELP text for a metric in the Prometheus output."""
+        self._help[name] = text
+
+    def set_info(self, **values):
+        """Context attached to every snapshot, e.g. the KB version or the LLM backends."""
+        with self._lock:
+            self._info.update({k: str(v) for k, v in values.items()})
+
+    def inc(self, name, value=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the duration of the with-block, also when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def counter_total(self, name, **labels):
+        """Sum of every series of a counter whose labels include the given ones."""
+        wanted = set(labels.items())
+        with self._lock:
+            return sum(v for key, v in self._counters.get(name, {}).items() if wanted <= set(key))
+
+    # --- EXPORT ---
+    def snapshot(self):
+        """Plain-dict view of every series, with latency percentiles in milliseconds."""
+        with self._lock:
+            return {
+                "ts": round(self._clock(), 3),
+                "uptime_s": round(self._clock() - self.started_at, 1),
+                "info": dict(self._info),
+                "counters": [
+                    {"name": name, "labels": dict(key), "value": value}
+                    for name, series in sorted(self._counters.items())
+                    for key, value in sorted(series.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(key), **histogram.summary()}
+                    for name, series in sorted(self._histograms.items())
+                    for key, histogram in sorted(series.items())
+                ],
+            }
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            if self._info:
+                lines += ["# TYPE app_info gauge", f"app_info{_format_labels(sorted(self._info.items()))} 1"]
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_snapshot(self, path=METRICS_LOG, max_bytes=METRICS_LOG_MAX_BYTES):
+        """Append one snapshot line to the JSONL metrics log, rotating it first if it is full."""
+        line = json.dumps(self.snapshot()) + "\n"
+        try:
+            if os.path.getsize(path) + len(line) > max_bytes:
+                os.replace(path, path + ".1")
+        except FileNotFoundError:
+            pass
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started_at = self._clock()
+
+
+METRICS = MetricsRegistry()
+METRICS.describe("chat_stage_seconds", "Time spent in each stage of answering a chat question.")
+METRICS.describe("chat_query_seconds", "End-to-end time to answer a chat question, by answer source.")
+METRICS.describe("chat_first_chunk_seconds", "Time until the first chunk of a streamed LLM answer.")
+METRICS.describe("chat_queries_total", "Chat questions answered, by where the answer came from.")
+METRICS.describe("kb_lookups_total", "Knowledge base searches, by result: fast_path (exact lookup), hit (scored) or miss.")
+METRICS.describe("answer_cache_total", "Answer cache lookups, by hit or miss.")
+METRICS.describe("llm_request_seconds", "Duration of calls to each LLM backend.")
+METRICS.describe("llm_errors_total", "Failed LLM backend calls.")
+METRICS.describe("llm_truncated_total", "Streamed LLM answers cut short by a backend failing mid-answer (not cached).")
+METRICS.describe("llm_skipped_total", "LLM backend calls skipped because the circuit was open.")
+METRICS.describe("fallback_total", "Offline KB fallback answers, by whether a line matched.")
+METRICS.describe("kb_batches_total", "KB search batches run by the chat service.")
+METRICS.describe("kb_batched_queries_total", "Questions searched in chat service KB batches.")
+METRICS.describe("chat_coalesced_total", "Chat service questions answered by joining an identical question in flight.")
+METRICS.describe("chat_rejected_total", "Chat service requests refused with 503 because too many were in flight.")
+
+
+def _tail_lines(path, limit, block=1 << 16):
+    """The last limit lines of a file (all of them if limit is None), reading back from its end."""
+    try:
+        with open(path, "rb") as f:
+            if limit is None:
+                return f.read().splitlines()
+            end = f.seek(0, os.SEEK_END)
+            data = b""
+            # One more line break than needed, so the partial first line can be dropped
+            while end > 0 and data.count(b"\n") <= limit:
+                start = max(0, end - block)
+                f.seek(start)
+                data = f.read(end - start) + data
+                end = start
+    except FileNotFoundError:
+        return []
+    return data.splitlines()[-limit:] if limit else []
+
+
+def read_metrics_log(path=METRICS_LOG, limit=None):
+    """
+    Snapshots from the JSONL metrics log and its rotation, oldest first (the last limit of
+    them if given). Only the tail needed is read, however large the log has grown.
+    """
+    lines = _tail_lines(path, limit)
+    if limit is None or len(lines) < limit:
+        lines = _tail_lines(path + ".1", None if limit is None else limit - len(lines)) + lines
+    snapshots = []
+    for line in lines:
+        try:
+            snapshots.append(json.loads(line))
+        except ValueError:
+            continue
+    return snapshots
+
+
+# --- BACKGROUND EXPORT ---
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+
+def _flush_loop(interval, path):
+    while True:
+        time.sleep(interval)
+        try:
+            METRICS.write_snapshot(path)
+        except OSError as e:
+            print(f"[METRICS ERROR] Could not write {path}: {e}")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = METRICS.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_exporter(interval=METRICS_FLUSH_SECONDS, path=METRICS_LOG, port=METRICS_PORT, host=METRICS_HOST):
+    """
+    Once per process: append a snapshot to the metrics log every interval seconds (and at
+    exit), and if port is set, serve /metrics for Prometheus from a daemon thread.
+    """
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+    if interval > 0:
+        threading.Thread(target=_flush_loop, args=(interval, path), name="metrics-log", daemon=True).start()
+        atexit.register(METRICS.write_snapshot, path)
+    if port:
+        try:
+            server = ThreadingHTTPServer((host, port), _MetricsHandler)
+        except OSError as e:
+            # e.g. another Streamlit worker already serves the port
+            print(f"[METRICS ERROR] Could not serve /metrics on {host}:{port}: {e}")
+            return
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
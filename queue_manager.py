@@ -0,0 +1,371 @@
+# queue_manager.py
+import atexit
+import glob
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+import database_manager
+
+# --- SETTINGS ---
+SPOOL_DIR = os.getenv("COMPLAINT_SPOOL_DIR", "complaint_spool")
+# Flushing to the OS survives a process crash; fsync also survives power loss, at a latency cost
+SPOOL_FSYNC = os.getenv("COMPLAINT_SPOOL_FSYNC", "0") == "1"
+SPOOL_SEGMENT_BYTES = int(os.getenv("COMPLAINT_SPOOL_SEGMENT_BYTES", str(1 << 20)))
+WRITE_BATCH_SIZE = int(os.getenv("COMPLAINT_WRITE_BATCH_SIZE", "256"))
+WRITE_RETRY_SECONDS = 0.5
+# A locked or busy database is waited out for as long as it takes, backing off up to this
+WRITE_RETRY_MAX_SECONDS = float(os.getenv("COMPLAINT_WRITE_RETRY_MAX_SECONDS", "30"))
+# Any other failure is retried this many times, then the batch one complaint at a time, and
+# complaints that still fail go to the dead-letter file instead of blocking the queue
+WRITE_MAX_ATTEMPTS = int(os.getenv("COMPLAINT_WRITE_MAX_ATTEMPTS", "5"))
+DEAD_LETTER_FILE = "dead-letter.jsonl"
+
+# Spool segments are named spool-<pid>-<n>.jsonl, so a restarted process can tell
+# its dead predecessors' segments (to replay) from those of live sibling workers.
+SEGMENT_PATTERN = "spool-*-*.jsonl"
+
+
+def new_ticket_id():
+    """Short random id handed to the submitter before the complaint reaches the database."""
+    return secrets.token_hex(6).upper()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _segment_pid(path):
+    return int(os.path.basename(path).split("-")[1])
+
+
+def _is_transient(exc):
+    """Lock contention clears up once the other writer commits; any other failure would repeat."""
+    message = str(exc).lower()
+    return isinstance(exc, sqlite3.OperationalError) and ("locked" in message or "busy" in message)
+
+
+def _backoff(waits):
+    return min(WRITE_RETRY_SECONDS * 2 ** min(waits, 16), WRITE_RETRY_MAX_SECONDS)
+
+
+def _append_dead_letters(spool_dir, failures, fsync=False):
+    """Append (entry, error) pairs to the dead-letter file."""
+    lines = "".join(json.dumps({**entry, "error": str(error)}) + "\n" for entry, error in failures)
+    with open(os.path.join(spool_dir, DEAD_LETTER_FILE), "a", encoding="utf-8") as f:
+        f.write(lines)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+
+
+def replay_dead_letters(spool_dir=SPOOL_DIR):
+    """
+    Store dead-lettered complaints again, one at a time, e.g. after fixing their data or the
+    schema. Complaints that fail again go back to the dead-letter file; ticket ids keep one
+    stored earlier from being stored twice. Returns (stored, failed).
+    """
+    path = os.path.join(spool_dir, DEAD_LETTER_FILE)
+    # Claim the file, so complaints dead-lettered meanwhile start a new one. Claims left by
+    # a replay that crashed are picked up too.
+    claims = []
+    for claim in glob.glob(os.path.join(spool_dir, "dead-letter-replay-*-*.jsonl")):
+        pid = int(os.path.basename(claim).split("-")[3])
+        if pid == os.getpid() or not _pid_alive(pid):
+            claims.append(claim)
+    claim = os.path.join(spool_dir, f"dead-letter-replay-{os.getpid()}-{time.time_ns()}.jsonl")
+    try:
+        os.replace(path, claim)
+        claims.append(claim)
+    except FileNotFoundError:
+        pass
+
+    stored, failures = 0, []
+    for claim in claims:
+        with open(claim, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                entry.pop("error", None)
+                try:
+                    database_manager.save_complaints_batch([_complaint_row(entry)])
+                    stored += 1
+                except Exception as e:
+                    failures.append((entry, e))
+    if failures:
+        _append_dead_letters(spool_dir, failures)
+    for claim in claims:
+        os.remove(claim)
+    return stored, len(failures)
+
+
+def count_dead_letters(spool_dir=SPOOL_DIR):
+    """Complaints in the dead-letter file, across every process sharing the spool directory."""
+    try:
+        with open(os.path.join(spool_dir, DEAD_LETTER_FILE), encoding="utf-8") as f:
+            return sum(1 for _ in f)
+    except FileNotFoundError:
+        return 0
+
+
+def _complaint_row(entry):
+    return (entry["ticket_id"], entry["student_name"], entry["issue_type"], entry["description"], entry["created_at"])
+
+
+def _read_segment(path):
+    """Complaint tuples from a spool segment; a torn last line from a crash is skipped."""
+    complaints = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            complaints.append(_complaint_row(entry))
+    return complaints
+
+
+class ComplaintWriter:
+    """
+    Background group-commit writer for complaints.
+
+    submit() appends the complaint to a local spool file and returns its ticket id at once;
+    a single writer thread stores everything queued so far with one executemany per
+    transaction. Spooled complaints that never reached the database (e.g. after a crash)
+    are replayed on the next start; ticket ids make the replay idempotent. A locked database
+    is retried until it frees up; a batch that keeps failing otherwise is retried row by row,
+    and rows that still fail are moved to the dead-letter file (see replay_dead_letters()).
+    """
+
+    def __init__(self, spool_dir=SPOOL_DIR, batch_size=WRITE_BATCH_SIZE, fsync=SPOOL_FSYNC,
+                 segment_bytes=SPOOL_SEGMENT_BYTES):
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._drained = threading.Condition(self._lock)
+        self._queue = deque()
+        self._pending = {}        # segment number -> queued complaints not yet committed
+        self._segment = 0
+        self._spool = None
+        self._thread = None
+        self._stopping = False
+        self.submitted = 0
+        self.committed = 0
+        self.batches = 0
+        self.replayed = 0
+        self.errors = 0
+        self.dead_lettered = 0
+
+    # --- LIFECYCLE ---
+    def start(self):
+        """Replay leftover spool segments of dead processes, then start the writer thread."""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self.replayed = self._replay()
+        self._open_segment()
+        self._thread = threading.Thread(target=self._run, name="complaint-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=10.0):
+        """Commit everything queued, then stop the writer thread."""
+        self.flush(timeout)
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        with self._lock:
+            if self._spool is not None:
+                self._spool.close()
+                self._spool = None
+                if self.committed + self.dead_lettered == self.submitted:
+                    os.remove(self._segment_path(self._segment))
+
+    def _segment_path(self, segment):
+        return os.path.join(self.spool_dir, f"spool-{os.getpid()}-{segment}.jsonl")
+
+    def _open_segment(self):
+        self._segment += 1
+        self._pending[self._segment] = 0
+        self._spool = open(self._segment_path(self._segment), "a", encoding="utf-8")
+
+    def _replay(self):
+        replayed = 0
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, SEGMENT_PATTERN))):
+            if _segment_pid(path) != os.getpid() and _pid_alive(_segment_pid(path)):
+                continue
+            complaints = _read_segment(path)
+            for start in range(0, len(complaints), self.batch_size):
+                replayed += database_manager.save_complaints_batch(complaints[start:start + self.batch_size])
+            os.remove(path)
+        return replayed
+
+    # --- SUBMISSION ---
+    def submit(self, student_name, issue_type, description):
+        """Durably queue a complaint and return its ticket id."""
+        entry = {
+            "ticket_id": new_ticket_id(),
+            "student_name": student_name,
+            "issue_type": issue_type,
+            "description": description,
+            # Same UTC format as SQLite's CURRENT_TIMESTAMP
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            if self._spool is None:
+                raise RuntimeError("ComplaintWriter is not running")
+            self._spool.write(line)
+            self._spool.flush()
+            if self.fsync:
+                os.fsync(self._spool.fileno())
+            segment = self._segment
+            self._pending[segment] += 1
+            if self._spool.tell() >= self.segment_bytes:
+                self._spool.close()
+                self._open_segment()
+            self._queue.append((segment, entry))
+            self.submitted += 1
+            self._wakeup.notify()
+        return entry["ticket_id"]
+
+    def flush(self, timeout=None):
+        """
+        Block until every complaint submitted so far is committed (or dead-lettered).
+        Returns False on timeout.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while self.committed + self.dead_lettered < self.submitted:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._drained.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": len(self._queue),
+                "submitted": self.submitted,
+                "committed": self.committed,
+                "batches": self.batches,
+                "replayed": self.replayed,
+                "errors": self.errors,
+                "dead_lettered": self.dead_lettered,
+            }
+
+    # --- WRITER THREAD ---
+    def _run(self):
+        attempts = 0       # failures of the batch at the head of the queue, lock waits aside
+        waits = 0          # locked/busy failures in a row
+        while True:
+            with self._lock:
+                while not self._queue and not self._stopping:
+                    self._wakeup.wait()
+                if not self._queue and self._stopping:
+                    return
+                # Everything that queued up during the previous commit goes in this one
+                batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            try:
+                database_manager.save_complaints_batch(_complaint_row(e) for _, e in batch)
+            except Exception as e:
+                transient = _is_transient(e)
+                attempts += not transient
+                with self._lock:
+                    self.errors += 1
+                    if transient or attempts < WRITE_MAX_ATTEMPTS:
+                        # Still spooled: put the batch back and retry instead of dropping it
+                        self._queue.extendleft(reversed(batch))
+                if transient:
+                    waits += 1
+                    print(f"[QUEUE ERROR] Database busy, retrying complaint batch: {e}")
+                    time.sleep(_backoff(waits))
+                    continue
+                if attempts < WRITE_MAX_ATTEMPTS:
+                    print(f"[QUEUE ERROR] Complaint batch failed, retrying: {e}")
+                    time.sleep(WRITE_RETRY_SECONDS)
+                    continue
+                print(f"[QUEUE ERROR] Complaint batch failed {attempts} times, storing it row by row: {e}")
+                self._committed(batch, self._save_rows(batch))
+                attempts = waits = 0
+                continue
+            attempts = waits = 0
+            self._committed(batch)
+
+    def _save_rows(self, batch):
+        """
+        Store a batch one complaint at a time, waiting out a locked database; returns how many
+        failed for good and went to the dead-letter file.
+        """
+        failures = []
+        for _, entry in batch:
+            waits = 0
+            while True:
+                try:
+                    database_manager.save_complaints_batch([_complaint_row(entry)])
+                    break
+                except Exception as e:
+                    if _is_transient(e):
+                        waits += 1
+                        time.sleep(_backoff(waits))
+                        continue
+                    print(f"[QUEUE ERROR] Complaint {entry['ticket_id']} moved to the dead-letter file: {e}")
+                    failures.append((entry, e))
+                    break
+        if failures:
+            _append_dead_letters(self.spool_dir, failures, self.fsync)
+        return len(failures)
+
+    def _committed(self, batch, dead=0):
+        done = []
+        with self._lock:
+            for segment, _ in batch:
+                self._pending[segment] -= 1
+            for segment, count in list(self._pending.items()):
+                if count == 0 and segment != self._segment:
+                    del self._pending[segment]
+                    done.append(segment)
+            self.committed += len(batch) - dead
+            self.dead_lettered += dead
+            self.batches += 1
+            self._drained.notify_all()
+        # Closed segments whose complaints are all stored (or dead-lettered) are no longer needed for replay
+        for segment in done:
+            os.remove(self._segment_path(segment))
+
+
+# --- PROCESS-WIDE WRITER ---
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_complaint_writer():
+    """The process's ComplaintWriter, started (and its spool replayed) on first use."""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ComplaintWriter().start()
+                atexit.register(_writer.stop)
+    return _writer
+
+
+def submit_complaint(student_name, issue_type, description):
+    """Queue a complaint for the background writer; returns the ticket id to show the student."""
+    return get_complaint_writer().submit(student_name, issue_type, description)
@@ -0,0 +1,89 @@
+# tests/test_kb_manager.py
+import copy
+
+import pytest
+
+from common import synthetic_kb
+
+import kb_manager
+
+RECORDS = 2000
+
+
+@pytest.fixture(scope="module")
+def kb():
+    """(kb_dict, kb_data, queries) for a synthetic KB, built once for the module."""
+    kb_dict, targets = synthetic_kb(RECORDS)
+    queries = [q for q, _ in targets[:200]] + ["fee", "when is the quiz night", "zzqx nonsense"]
+    return kb_dict, kb_manager.build_knowledge_base(kb_dict), queries
+
+
+def ranked(kb_data, query):
+    return [(r["path"], round(r["score"], 9)) for r in kb_manager.search_knowledge_base_ranked(query, kb_data)]
+
+
+def assert_matches_rebuild(updated, kb_dict, queries):
+    rebuilt = kb_manager.build_knowledge_base(kb_dict)
+    assert sorted(updated["vectorizer"].vocabulary_) == sorted(rebuilt["vectorizer"].vocabulary_)
+    for query in queries:
+        assert ranked(updated, query) == ranked(rebuilt, query), query
+
+
+def rename_first_event(kb_dict, name):
+    kb_dict = copy.deepcopy(kb_dict)
+    kb_dict["EVENTS"]["Club"][0]["name"] = name
+    return kb_dict
+
+
+# --- INCREMENTAL REINDEX ---
+def test_update_with_edit_matches_full_rebuild(kb):
+    kb_dict, kb_data, queries = kb
+    edited = rename_first_event(kb_dict, "Zyxwvut Quiz Night")
+    updated, stats = kb_manager.update_knowledge_base(kb_data, edited)
+    assert stats["tokenized"] == 1 and stats["changed"] == 1
+    assert kb_manager.search_knowledge_base("when is Zyxwvut Quiz Night", updated).startswith("Zyxwvut Quiz Night")
+    assert_matches_rebuild(updated, edited, queries + ["when is Zyxwvut Quiz Night"])
+
+
+def test_update_drops_terms_no_record_uses(kb):
+    kb_dict, kb_data, queries = kb
+    first = rename_first_event(kb_dict, "Zyxwvut Quiz Night")
+    updated, _ = kb_manager.update_knowledge_base(kb_data, first)
+    second = rename_first_event(kb_dict, "Plughbert Quiz Night")
+    updated, _ = kb_manager.update_knowledge_base(updated, second)
+    assert "zyxwvut" not in updated["vectorizer"].vocabulary_
+    assert_matches_rebuild(updated, second, queries + ["zyxwvut plughbert", "plughbert quiz night date"])
+
+
+def test_update_with_added_and_removed_records_matches_full_rebuild(kb):
+    kb_dict, kb_data, queries = kb
+    changed = copy.deepcopy(kb_dict)
+    removed = changed["EVENTS"]["Club"].pop(1)
+    changed["EVENTS"]["Club"].append({"name": "Qwertyuiop Film Screening", "date": "01-02-2026", "venue": "Library"})
+    updated, _ = kb_manager.update_knowledge_base(kb_data, changed)
+    assert_matches_rebuild(updated, changed, queries + [f"when is {removed['name']}", "qwertyuiop film"])
+
+
+def test_update_leaves_input_untouched(kb):
+    kb_dict, kb_data, queries = kb
+    before = [ranked(kb_data, q) for q in queries[:20]]
+    kb_manager.update_knowledge_base(kb_data, rename_first_event(kb_dict, "Zyxwvut Quiz Night"))
+    assert [ranked(kb_data, q) for q in queries[:20]] == before
+
+
+# --- BATCHED SEARCH ---
+def test_batch_matches_ranked_search(kb):
+    _, kb_data, queries = kb
+    batched = kb_manager.search_knowledge_base_batch(queries, kb_data, k=3)
+    for query, results in zip(queries, batched):
+        want = kb_manager.search_knowledge_base_ranked(query, kb_data, k=3)
+        assert [(r["path"], round(r["score"], 9)) for r in results] == \
+               [(r["path"], round(r["score"], 9)) for r in want], query
+
+
+def test_batch_matches_scored_single_query_search(kb):
+    _, kb_data, queries = kb
+    batched = kb_manager.search_knowledge_base_batch(queries, kb_data, k=1)
+    for query, results in zip(queries, batched):
+        want = kb_manager.search_knowledge_base(query, kb_data, fast_path=False)
+        assert (results[0]["answer"] if results else kb_manager.KB_MISS_MESSAGE) == want, query
@@ -0,0 +1,68 @@
+# tests/test_kb_shared.py
+import pytest
+
+from common import synthetic_kb
+
+import kb_manager
+
+QUIZ = {"name": "Zyxwvut Quiz Night", "date": "01-02-2026", "venue": "Library"}
+
+
+@pytest.fixture
+def published(tmp_path):
+    """(kb_dict, builder's kb_data, queries, index_dir) with the builder's index published."""
+    kb_dict, targets = synthetic_kb(1000)
+    kb_data = kb_manager.build_knowledge_base(kb_dict)
+    kb_manager.publish_index_version(kb_manager.write_index_artifact(kb_data, str(tmp_path)), str(tmp_path))
+    return kb_dict, kb_data, [q for q, _ in targets[:100]] + ["fee", "zzqx nonsense"], str(tmp_path)
+
+
+@pytest.fixture
+def worker(monkeypatch, published):
+    """kb_manager acting as a worker process attached to the published index."""
+    monkeypatch.setattr(kb_manager, "KB_ROLE", "worker")
+    monkeypatch.setattr(kb_manager, "KB_INDEX_DIR", published[3])
+    monkeypatch.setattr(kb_manager, "_active_kb", None)
+    monkeypatch.setattr(kb_manager, "_attached_stat", None)
+    return published
+
+
+def ranked(kb_data, query):
+    return [(r["path"], round(r["score"], 9)) for r in kb_manager.search_knowledge_base_ranked(query, kb_data)]
+
+
+def test_attached_index_answers_like_the_builder(published):
+    _, kb_data, queries, index_dir = published
+    attached = kb_manager.attach_knowledge_base(index_dir)
+    assert attached["version"] == kb_data["version"]
+    for query in queries:
+        assert ranked(attached, query) == ranked(kb_data, query), query
+        assert kb_manager.search_knowledge_base(query, attached) == kb_manager.search_knowledge_base(query, kb_data)
+
+
+def test_attached_index_is_read_only(published):
+    attached = kb_manager.attach_knowledge_base(published[3])
+    with pytest.raises(ValueError):
+        attached["tfidf_matrix"].data[0] = 0
+
+
+def test_worker_serves_the_next_published_version(worker):
+    kb_dict, kb_data, _, index_dir = worker
+    assert kb_manager.get_active_kb()["version"] == kb_data["version"]
+
+    kb_dict = dict(kb_dict, EVENTS={"Club": kb_dict["EVENTS"]["Club"] + [QUIZ]})
+    updated, _ = kb_manager.update_knowledge_base(kb_data, kb_dict)
+    kb_manager.publish_index_version(kb_manager.write_index_artifact(updated, index_dir), index_dir)
+
+    active = kb_manager.get_active_kb()
+    assert active["version"] == updated["version"]
+    assert kb_manager.search_knowledge_base("when is Zyxwvut Quiz Night", active).startswith("Zyxwvut Quiz Night")
+
+
+def test_worker_without_a_published_index_fails(monkeypatch, tmp_path):
+    monkeypatch.setattr(kb_manager, "KB_ROLE", "worker")
+    monkeypatch.setattr(kb_manager, "KB_INDEX_DIR", str(tmp_path))
+    monkeypatch.setattr(kb_manager, "KB_ATTACH_TIMEOUT_SECONDS", 0)
+    monkeypatch.setattr(kb_manager, "_active_kb", None)
+    with pytest.raises(FileNotFoundError):
+        kb_manager.get_active_kb()
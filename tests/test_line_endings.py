@@ -0,0 +1,26 @@
+# tests/test_line_endings.py
+import os
+
+from conftest import ROOT
+
+# Python sources and requirements.txt use CRLF line endings throughout the repo (see .gitattributes)
+CRLF_SUFFIXES = (".py",)
+CRLF_FILES = ("requirements.txt",)
+
+
+def crlf_files():
+    for directory, subdirs, files in os.walk(ROOT):
+        subdirs[:] = [d for d in subdirs if not d.startswith((".", "__")) and d not in ("kb", "kb_index")]
+        for name in files:
+            if name.endswith(CRLF_SUFFIXES) or os.path.relpath(os.path.join(directory, name), ROOT) in CRLF_FILES:
+                yield os.path.join(directory, name)
+
+
+def test_sources_use_crlf():
+    bare = []
+    for path in crlf_files():
+        with open(path, "rb") as f:
+            data = f.read()
+        if data.count(b"\n") != data.count(b"\r\n"):
+            bare.append(os.path.relpath(path, ROOT))
+    assert not bare, f"LF line endings in {', '.join(sorted(bare))}"